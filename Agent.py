@@ -1,46 +1,9 @@
 import chess.engine
 import random
 from reconchess import *
-import os
-
-STOCKFISH_ENV_VAR = 'STOCKFISH_EXECUTABLE'
-
-def parse_window(window_str):
-    """
-    Parses the window description into a dictionary:
-    {'c8': '?', 'd8': '?', ..., 'd7': 'n'}
-    """
-    window = {}
-    entries = window_str.strip().split(';')
-    for entry in entries:
-        if entry:
-            square, piece = entry.split(':')
-            window[square] = piece
-    return window
-
-def fen_matches_window(fen, window):
-    """
-    Checks if the given FEN matches the window observation.
-    '?' means the square must be empty.
-    Any other piece letter must match exactly.
-    """
-    board = chess.Board(fen)
-    for square_str, expected_piece in window.items():
-        square = chess.parse_square(square_str)
-        piece = board.piece_at(square)
-
-        if expected_piece == '?':
-            if piece is not None:
-                return False  # Expected empty square
-        else:
-            if piece is None or piece.symbol() != expected_piece:
-                return False  # Piece mismatch
-    return True
-
-def filter_fens_by_window(fens, window_str):
-    window = parse_window(window_str)
-    consistent_fens = [fen for fen in fens if fen_matches_window(fen, window)]
-    return sorted(consistent_fens)
+from engine_pool import get_engine_pool, get_stockfish_path
+from time_manager import TimeManager
+from move_plan import MovePlan
 
 def get_king_capture_move(board:chess.Board, move_actions: List[chess.Move],color:bool):
     for move in move_actions:
@@ -123,31 +86,25 @@ class TroutBot(Player):
     """
     TroutBot uses the Stockfish chess engine to choose moves. In order to run TroutBot you'll need to download
     Stockfish from https://stockfishchess.org/download/ and create an environment variable called STOCKFISH_EXECUTABLE
-    that is the path to the downloaded Stockfish executable.
+    that is the path to the downloaded Stockfish executable. Without it, TroutBot plays with the built-in evaluator.
     """
 
     def __init__(self):
         self.board = None
         self.color = None
         self.my_piece_captured_square = None
+        self.time_manager = TimeManager()
+        # move searched in choose_sense, reused by choose_move if the sense result leaves it valid
+        self.plan = None
 
-        # make sure stockfish environment variable exists
-        if STOCKFISH_ENV_VAR not in os.environ:
-            raise KeyError(
-                'TroutBot requires an environment variable called "{}" pointing to the Stockfish executable'.format(
-                    STOCKFISH_ENV_VAR))
-
-        # make sure there is actually a file
-        stockfish_path = os.environ[STOCKFISH_ENV_VAR]
-        if not os.path.exists(stockfish_path):
-            raise ValueError('No stockfish executable found at "{}"'.format(stockfish_path))
-
-        # initialize the stockfish engine
-        self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path, setpgrp=True)
+        # lease from the process-wide pool of warm stockfish engines, found through STOCKFISH_EXECUTABLE;
+        # without an executable the pool hands out the built-in evaluator instead
+        self.engine = get_engine_pool(get_stockfish_path())
 
     def handle_game_start(self, color: Color, board: chess.Board, opponent_name: str):
         self.board = board
         self.color = color
+        self.time_manager = TimeManager()
 
     def handle_opponent_move_result(self, captured_my_piece: bool, capture_square: Optional[Square]):
         # if the opponent captured our piece, remove it from our board.
@@ -157,12 +114,20 @@ class TroutBot(Player):
 
     def choose_sense(self, sense_actions: List[Square], move_actions: List[chess.Move], seconds_left: float) -> \
             Optional[Square]:
+        self.time_manager.start_turn(seconds_left)
+        self.plan = None
+
         # if our piece was just captured, sense where it was captured
         if self.my_piece_captured_square:
             return self.my_piece_captured_square
 
         # if we might capture a piece when we move, sense where the capture will occur
-        future_move = self.choose_move(move_actions, seconds_left)
+        future_move = self.king_capture_move()
+        if future_move is None:
+            result = self.search_move(seconds_left)
+            if result is not None and result.move is not None:
+                self.plan = MovePlan(self.board, result)
+                future_move = result.move
         if future_move is not None and self.board.piece_at(future_move.to_square) is not None:
             return future_move.to_square
 
@@ -173,12 +138,43 @@ class TroutBot(Player):
         return random.choice(sense_actions)
 
     def handle_sense_result(self, sense_result: List[Tuple[Square, Optional[chess.Piece]]]):
+        # the planned move is searched again only if the sense result changed a square it depends on
+        if self.plan is not None and not self.plan.survives(self.board, sense_result):
+            self.plan = None
+
         # add the pieces in the sense result to our board
         for square, piece in sense_result:
             self.board.set_piece_at(square, piece)
 
     def choose_move(self, move_actions: List[chess.Move], seconds_left: float) -> Optional[chess.Move]:
         # if we might be able to take the king, try to
+        king_capture = self.king_capture_move()
+        if king_capture is not None:
+            return king_capture
+
+        # otherwise play the move planned while sensing, or search again
+        plan, self.plan = self.plan, None
+        if plan is not None:
+            return plan.move
+        result = self.search_move(seconds_left)
+        if result is not None:
+            return result.move
+
+        # no clock left for a search: a cheap random move rather than a pass
+        if not self.time_manager.budget(seconds_left).samples:
+            return self.random_move(move_actions)
+
+        # if all else fails, pass
+        return None
+
+    def random_move(self, move_actions: List[chess.Move]) -> Optional[chess.Move]:
+        # a move legal on our board if there is one, otherwise any move the game allows
+        self.board.turn = self.color
+        legal_moves = [move for move in self.board.legal_moves if move in move_actions]
+        candidates = legal_moves or move_actions
+        return random.choice(candidates) if candidates else None
+
+    def king_capture_move(self) -> Optional[chess.Move]:
         enemy_king_square = self.board.king(not self.color)
         if enemy_king_square:
             # if there are any ally pieces that can take king, execute one of those moves
@@ -186,19 +182,21 @@ class TroutBot(Player):
             if enemy_king_attackers:
                 attacker_square = enemy_king_attackers.pop()
                 return chess.Move(attacker_square, enemy_king_square)
+        return None
 
-        # otherwise, try to move with the stockfish chess engine
+    def search_move(self, seconds_left: float) -> Optional[chess.engine.PlayResult]:
+        # try to move with the stockfish chess engine, if the clock still allows a search
+        budget = self.time_manager.budget(seconds_left)
+        if not budget.samples:
+            return None
         try:
             self.board.turn = self.color
             self.board.clear_stack()
-            result = self.engine.play(self.board, chess.engine.Limit(time=0.5))
-            return result.move
+            return self.engine.play(self.board, budget.search)
         except chess.engine.EngineTerminatedError:
             print('Stockfish Engine died')
         except chess.engine.EngineError:
             print('Stockfish Engine bad state at "{}"'.format(self.board.fen()))
-
-        # if all else fails, pass
         return None
 
     def handle_move_result(self, requested_move: Optional[chess.Move], taken_move: Optional[chess.Move],
@@ -209,8 +207,5 @@ class TroutBot(Player):
 
     def handle_game_end(self, winner_color: Optional[Color], win_reason: Optional[WinReason],
                         game_history: GameHistory):
-        try:
-            # if the engine is already terminated then this call will throw an exception
-            self.engine.quit()
-        except chess.engine.EngineTerminatedError:
-            pass
\ No newline at end of file
+        # the engine pool is shared with other games in this process and closed when it exits
+        pass
\ No newline at end of file
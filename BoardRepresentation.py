@@ -1,15 +1,22 @@
 import chess
 
-def print_board_from_fen(fen):
+def board_rows(fen):
     board = chess.Board(fen)
+    rows = []
     for rank in range(8, 0, -1):
         row = []
         for file in range(8):
             square = chess.square(file, rank - 1)
             piece = board.piece_at(square)
             row.append(piece.symbol() if piece else '.')
-        print(' '.join(row))
+        rows.append(' '.join(row))
+    return rows
+
+def print_board_from_fen(fen):
+    for row in board_rows(fen):
+        print(row)
 
-# No prompt strings, just input and output
-fen_input = input().strip()
-print_board_from_fen(fen_input)
+if __name__ == "__main__":
+    # No prompt strings, just input and output
+    fen_input = input().strip()
+    print_board_from_fen(fen_input)
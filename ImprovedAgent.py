@@ -1,46 +1,8 @@
 import chess.engine
 import random
 from reconchess import *
-import os
-
-STOCKFISH_ENV_VAR = 'STOCKFISH_EXECUTABLE'
-
-def parse_window(window_str):
-    """
-    Parses the window description into a dictionary:
-    {'c8': '?', 'd8': '?', ..., 'd7': 'n'}
-    """
-    window = {}
-    entries = window_str.strip().split(';')
-    for entry in entries:
-        if entry:
-            square, piece = entry.split(':')
-            window[square] = piece
-    return window
-
-def fen_matches_window(fen, window):
-    """
-    Checks if the given FEN matches the window observation.
-    '?' means the square must be empty.
-    Any other piece letter must match exactly.
-    """
-    board = chess.Board(fen)
-    for square_str, expected_piece in window.items():
-        square = chess.parse_square(square_str)
-        piece = board.piece_at(square)
-
-        if expected_piece == '?':
-            if piece is not None:
-                return False  # Expected empty square
-        else:
-            if piece is None or piece.symbol() != expected_piece:
-                return False  # Piece mismatch
-    return True
-
-def filter_fens_by_window(fens, window_str):
-    window = parse_window(window_str)
-    consistent_fens = [fen for fen in fens if fen_matches_window(fen, window)]
-    return sorted(consistent_fens)
+from engine_pool import get_engine_pool, get_stockfish_path
+from time_manager import TimeManager
 
 def get_king_capture_move(board:chess.Board, move_actions: List[chess.Move],color:bool):
     for move in move_actions:
@@ -67,8 +29,8 @@ def generate_all_possible_moves(board:chess.Board):
         if not is_illegal_castle(board, move):
             possible_moves.add(move)
 
-    # 4. Output sorted list of moves
-    return sorted(possible_moves)
+    # 4. Output sorted list of moves, in UCI order as Move objects do not compare
+    return sorted(possible_moves, key=lambda move: move.uci())
     
 def generate_next_fens(board:chess.Board):
     next_fens = set()
@@ -123,31 +85,23 @@ class TroutBot(Player):
     """
     TroutBot uses the Stockfish chess engine to choose moves. In order to run TroutBot you'll need to download
     Stockfish from https://stockfishchess.org/download/ and create an environment variable called STOCKFISH_EXECUTABLE
-    that is the path to the downloaded Stockfish executable.
+    that is the path to the downloaded Stockfish executable. Without it, TroutBot plays with the built-in evaluator.
     """
 
     def __init__(self):
         self.board = None
         self.color = None
         self.my_piece_captured_square = None
+        self.time_manager = TimeManager()
 
-        # make sure stockfish environment variable exists
-        if STOCKFISH_ENV_VAR not in os.environ:
-            raise KeyError(
-                'TroutBot requires an environment variable called "{}" pointing to the Stockfish executable'.format(
-                    STOCKFISH_ENV_VAR))
-
-        # make sure there is actually a file
-        stockfish_path = os.environ[STOCKFISH_ENV_VAR]
-        if not os.path.exists(stockfish_path):
-            raise ValueError('No stockfish executable found at "{}"'.format(stockfish_path))
-
-        # initialize the stockfish engine
-        self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path, setpgrp=True)
+        # lease from the process-wide pool of warm stockfish engines, found through STOCKFISH_EXECUTABLE;
+        # without an executable the pool hands out the built-in evaluator instead
+        self.engine = get_engine_pool(get_stockfish_path())
 
     def handle_game_start(self, color: Color, board: chess.Board, opponent_name: str):
         self.board = board
         self.color = color
+        self.time_manager = TimeManager()
 
     def handle_opponent_move_result(self, captured_my_piece: bool, capture_square: Optional[Square]):
         # if the opponent captured our piece, remove it from our board.
@@ -156,6 +110,10 @@ class TroutBot(Player):
             self.board.remove_piece_at(capture_square)
 
     def choose_sense(self, sense_actions: List[Square], move_actions: List[chess.Move], seconds_left: float) -> Optional[Square]:
+        # out of time to think: sense at random
+        if not self.time_manager.start_turn(seconds_left).sense_beliefs:
+            return random.choice(sense_actions)
+
         # 1. If we were just captured, sense where it happened
         if self.my_piece_captured_square and self.my_piece_captured_square in sense_actions:
             return self.my_piece_captured_square
@@ -190,11 +148,15 @@ class TroutBot(Player):
                 attacker_square = enemy_king_attackers.pop()
                 return chess.Move(attacker_square, enemy_king_square)
 
-        # otherwise, try to move with the stockfish chess engine
+        # otherwise, try to move with the stockfish chess engine, if the clock still allows a search
+        budget = self.time_manager.budget(seconds_left)
+        if not budget.samples:
+            # no clock left for a search: a cheap random move rather than a pass
+            return self.random_move(move_actions)
         try:
             self.board.turn = self.color
             self.board.clear_stack()
-            result = self.engine.play(self.board, chess.engine.Limit(time=0.5))
+            result = self.engine.play(self.board, budget.search)
             return result.move
         except chess.engine.EngineTerminatedError:
             print('Stockfish Engine died')
@@ -204,6 +166,13 @@ class TroutBot(Player):
         # if all else fails, pass
         return None
 
+    def random_move(self, move_actions: List[chess.Move]) -> Optional[chess.Move]:
+        # a move legal on our board if there is one, otherwise any move the game allows
+        self.board.turn = self.color
+        legal_moves = [move for move in self.board.legal_moves if move in move_actions]
+        candidates = legal_moves or move_actions
+        return random.choice(candidates) if candidates else None
+
     def handle_move_result(self, requested_move: Optional[chess.Move], taken_move: Optional[chess.Move],
                            captured_opponent_piece: bool, capture_square: Optional[Square]):
         # if a move was executed, apply it to our board
@@ -212,8 +181,5 @@ class TroutBot(Player):
 
     def handle_game_end(self, winner_color: Optional[Color], win_reason: Optional[WinReason],
                         game_history: GameHistory):
-        try:
-            # if the engine is already terminated then this call will throw an exception
-            self.engine.quit()
-        except chess.engine.EngineTerminatedError:
-            pass
\ No newline at end of file
+        # the engine pool is shared with other games in this process and closed when it exits
+        pass
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 import chess
 import chess.engine
+from engine_pool import get_engine_pool
 
 def get_stockfish_path():
     if os.name == 'nt':  # Windows
@@ -24,9 +25,7 @@ def choose_move(fen):
     if king_capture:
         return king_capture.uci()
 
-    engine = chess.engine.SimpleEngine.popen_uci(get_stockfish_path(), setpgrp=True)
-    result = engine.play(board, chess.engine.Limit(time=0.5))
-    engine.quit()
+    result = get_engine_pool(get_stockfish_path()).play(board, chess.engine.Limit(time=0.5))
 
     return result.move.uci()
 
@@ -1,6 +1,12 @@
 import chess
 import chess.engine
+import numpy as np
 import os
+import sys
+from async_evaluator import get_evaluator, vote_settled
+from move_scoring import choose_by_score
+from belief_store import BeliefStore
+from king_capture import king_attackers
 
 def get_stockfish_path():
     if os.name == 'nt':
@@ -16,25 +22,34 @@ def find_king_capture(board):
                 return move.uci()
     return None
 
-def evaluate_moves(fens):
-    engine = chess.engine.SimpleEngine.popen_uci(get_stockfish_path(), setpgrp=True)
-    move_frequency = {}
+def first_king_capture(boards, beliefs:BeliefStore):
+    # The boards with a king capture are found on bitboards all at once, then the first of them is scanned
+    # as before, so the answer is still the first capture on the first such board in input order
+    white = beliefs.turn == chess.WHITE
+    attackers = np.where(white, king_attackers(beliefs, chess.WHITE)[0], king_attackers(beliefs, chess.BLACK)[0])
+    found = np.flatnonzero(attackers)
+    return find_king_capture(boards[found[0]]) if len(found) else None
 
-    for fen in fens:
-        board = chess.Board(fen)
+def evaluate_moves(fens, multipv=False):
+    boards = [chess.Board(fen) for fen in fens]
+    beliefs = BeliefStore.from_boards(boards)
 
-        # Priority 1: Capture opponent king if possible
-        king_capture = find_king_capture(board)
-        if king_capture:
-            engine.quit()
-            return king_capture
+    # Priority 1: Capture opponent king if possible
+    king_capture = first_king_capture(boards, beliefs)
+    if king_capture:
+        return king_capture
 
-        # Otherwise: ask Stockfish
-        best_move = engine.play(board, chess.engine.Limit(time=0.1)).move.uci()
+    # With multipv: score every move legal on some board on all of them, pick the best on average
+    if multipv:
+        candidates = {move for board in boards for move in board.legal_moves}
+        move = choose_by_score(get_evaluator(get_stockfish_path()), boards, chess.engine.Limit(time=0.1), candidates)
+        return move.uci() if move else None
 
-        move_frequency[best_move] = move_frequency.get(best_move, 0) + 1
+    # Otherwise: ask Stockfish, most typical boards first, and stop searching once no remaining vote can change the winner
+    ordered = [boards[i] for i in beliefs.representative_order()]
+    votes = get_evaluator(get_stockfish_path()).vote(ordered, chess.engine.Limit(time=0.1), decided=vote_settled)
+    move_frequency = {move.uci(): count for move, count in votes.items()}
 
-    engine.quit()
     return resolve_majority_vote(move_frequency)
 
 def resolve_majority_vote(move_counts):
@@ -51,7 +66,7 @@ def main():
     num_boards = int(input())
     fens = [input().strip() for _ in range(num_boards)]
 
-    selected_move = evaluate_moves(fens)
+    selected_move = evaluate_moves(fens, multipv='--multipv' in sys.argv[1:])
     if selected_move:
         print(selected_move)
 
@@ -1,6 +1,6 @@
 import chess
 
-def generate_all_possible_moves(fen):
+def all_possible_moves(fen):
     board = chess.Board(fen)
     possible_moves = set()
 
@@ -9,9 +9,13 @@ def generate_all_possible_moves(fen):
 
     possible_moves.add('0000')
 
+    return sorted(possible_moves)
+
+def generate_all_possible_moves(fen):
     # Debugging: print actual output lines
-    for move in sorted(possible_moves):
+    for move in all_possible_moves(fen):
         print(move)
 
-fen_input = input().strip()
-generate_all_possible_moves(fen_input)
+if __name__ == "__main__":
+    fen_input = input().strip()
+    generate_all_possible_moves(fen_input)
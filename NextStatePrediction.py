@@ -1,20 +1,20 @@
 import chess
 
-def generate_next_fens(fen):
+def next_fens(fen):
     board = chess.Board(fen)
-    next_fens = set()
+    fens = set()
 
-    for move in board.pseudo_legal_moves:
-        new_board = board.copy()
-        new_board.push(move)
-        next_fens.add(new_board.fen())
+    for move in list(board.pseudo_legal_moves) + [chess.Move.null()]:
+        board.push(move)
+        fens.add(board.fen())
+        board.pop()
 
-    new_board = board.copy()
-    new_board.push(chess.Move.null())
-    next_fens.add(new_board.fen())
+    return sorted(fens)
 
-    for f in sorted(next_fens):
+def generate_next_fens(fen):
+    for f in next_fens(fen):
         print(f)
 
-fen_input = input().strip()
-generate_next_fens(fen_input)
+if __name__ == "__main__":
+    fen_input = input().strip()
+    generate_next_fens(fen_input)
@@ -24,7 +24,7 @@ def fen_matches_window(fen, window):
                 return False
     return True
 
-def filter_fens_by_window(fens, window_str):
+def consistent_fens_for_window(fens, window_str):
     window = parse_window(window_str)
     consistent_fens = []
 
@@ -32,12 +32,16 @@ def filter_fens_by_window(fens, window_str):
         if fen_matches_window(fen, window):
             consistent_fens.append(fen)
 
-    for fen in sorted(consistent_fens):
+    return sorted(consistent_fens)
+
+def filter_fens_by_window(fens, window_str):
+    for fen in consistent_fens_for_window(fens, window_str):
         print(fen)
 
-# Read input — no prompts
-N = int(input())
-fens = [input().strip() for _ in range(N)]
-window_description = input().strip()
+if __name__ == "__main__":
+    # Read input — no prompts
+    N = int(input())
+    fens = [input().strip() for _ in range(N)]
+    window_description = input().strip()
 
-filter_fens_by_window(fens, window_description)
+    filter_fens_by_window(fens, window_description)
@@ -0,0 +1,266 @@
+import asyncio
+import atexit
+import os
+import sys
+import threading
+from collections import Counter
+import chess.engine
+from engine_pool import get_stockfish_path, use_builtin_engine, get_builtin_engine
+from eval_cache import get_eval_cache, lookup, lookup_analysis
+from engine_supervisor import ENGINE_FAILURES, WATCHDOG_GRACE, RESTART_DELAY, MAX_RESTART_DELAY
+from fallback_evaluator import FallbackEvaluator, is_fallback
+
+# number of engine processes searching concurrently, defaults to the number of cores
+EVAL_ENGINES_ENV_VAR = 'RBC_EVAL_ENGINES'
+
+
+def vote_decided(counts:Counter, remaining):
+    """True once the leading move cannot be caught, or tied, by the searches still running."""
+    if not counts:
+        return False
+    top = counts.most_common(2)
+    runner_up = top[1][1] if len(top) > 1 else 0
+    return top[0][1] - runner_up > remaining
+
+
+def vote_settled(counts:Counter, remaining):
+    """
+    True once the searches still running cannot change the winner of a
+    majority vote whose ties go to the alphabetically first move.
+    """
+    if not counts:
+        return False
+    leader = min(counts, key=lambda move: (-counts[move], move.uci()))
+    lead = counts[leader]
+    # a move nobody voted for yet could take every remaining vote and come first alphabetically
+    if remaining >= lead:
+        return False
+    for move, count in counts.items():
+        if move != leader and (count + remaining, leader.uci()) >= (lead, move.uci()):
+            return False
+    return True
+
+
+class AsyncEvaluator:
+    """
+    Searches several boards at once, one per engine process, using the
+    asyncio engine API on an event loop running in a background thread.
+    Callers stay synchronous: vote() fans the boards out over the engines
+    and stops at a deadline or as soon as the vote is decided, cancelling
+    the searches still running. Searches and analyse_many() analyses found
+    in `cache` (see eval_cache) are answered without an engine. An engine that dies, or runs `grace`
+    seconds past its time limit, is replaced in the background and its
+    search answered by `fallback` instead.
+    """
+
+    def __init__(self, path, engines=None, options=None, cache=None, fallback=None, grace=WATCHDOG_GRACE):
+        if engines is None:
+            engines = int(os.environ.get(EVAL_ENGINES_ENV_VAR, 0)) or os.cpu_count() or 1
+        self.path = path
+        self.size = engines
+        self.options = options or {}
+        self.cache = cache
+        self.fallback = fallback if fallback is not None else FallbackEvaluator()
+        self.grace = grace
+        self.restarting = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='async-evaluator', daemon=True)
+        self.thread.start()
+        self.protocols = []
+        self.closed = False
+        try:
+            self._call(self._start(engines))
+        except BaseException:
+            self.close()
+            raise
+
+    def _call(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def _open(self):
+        _, protocol = await chess.engine.popen_uci(self.path, setpgrp=True)
+        if self.options:
+            await protocol.configure(self.options)
+        self.protocols.append(protocol)
+        return protocol
+
+    async def _start(self, engines):
+        self.idle = asyncio.Queue()
+        for protocol in await asyncio.gather(*(self._open() for _ in range(engines))):
+            self.idle.put_nowait(protocol)
+
+    async def _replace(self, protocol):
+        try:
+            protocol.transport.kill()
+        except Exception:
+            pass
+        delay = RESTART_DELAY
+        while not self.closed:
+            try:
+                self.idle.put_nowait(await self._open())
+                break
+            except Exception as e:
+                print('Warning: restarting engine "{}" failed ({}), retrying in {:.1f}s'.format(self.path, e, delay),
+                      file=sys.stderr)
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, MAX_RESTART_DELAY)
+        self.restarting -= 1
+
+    async def _run(self, task, limit, fallback):
+        """
+        Awaits task(protocol) on an idle engine, or returns fallback() if
+        that engine fails or every engine is being restarted.
+        """
+        if self.idle.empty() and self.restarting >= self.size:
+            return fallback()
+        protocol = await self.idle.get()
+        timeout = None if limit is None or limit.time is None else limit.time + self.grace
+        try:
+            result = await asyncio.wait_for(task(protocol), timeout)
+        except asyncio.CancelledError:
+            self.idle.put_nowait(protocol)
+            raise
+        except ENGINE_FAILURES as e:
+            print('Warning: engine "{}" failed ({}), restarting it and using the fallback evaluator'.format(
+                self.path, type(e).__name__), file=sys.stderr)
+            self.protocols.remove(protocol)
+            self.restarting += 1
+            asyncio.get_running_loop().create_task(self._replace(protocol))
+            return fallback()
+        self.idle.put_nowait(protocol)
+        return result
+
+    async def _search(self, board, limit, **kwargs):
+        key, cached = lookup(self.cache, board, limit, self.path, **kwargs)
+        if cached is not None:
+            return cached
+        result = await self._run(lambda protocol: protocol.play(board, limit, **kwargs), limit,
+                                 lambda: self.fallback.play(board, limit, **kwargs))
+        if key is not None and not is_fallback(result):
+            self.cache.put(key, result.move)
+        return result
+
+    async def _vote(self, boards, limit, root_moves, deadline, decided):
+        loop = asyncio.get_running_loop()
+        end = None if deadline is None else loop.time() + deadline
+        pending = set()
+        for board, moves in zip(boards, root_moves):
+            pending.add(loop.create_task(self._search(board, limit, root_moves=moves)))
+
+        counts = Counter()
+        while pending:
+            timeout = None if end is None else max(0.0, end - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                if task.exception() is None and task.result().move is not None:
+                    counts[task.result().move] += 1
+            if decided(counts, len(pending)):
+                break
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return counts
+
+    async def _analyse(self, board, limit, multipv, root_moves):
+        key, cached = lookup_analysis(self.cache, board, limit, multipv, self.path, root_moves=root_moves)
+        if cached is not None:
+            return cached
+        infos = await self._run(lambda protocol: protocol.analyse(board, limit, multipv=multipv, root_moves=root_moves),
+                                limit, lambda: self.fallback.analyse(board, limit, multipv=multipv, root_moves=root_moves))
+        if key is not None and not any(is_fallback(info) for info in infos):
+            self.cache.put_analysis(key, infos)
+        return infos
+
+    async def _analyse_many(self, boards, limit, multipv, root_moves, deadline):
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(self._analyse(board, limit, multipv, moves))
+                 for board, moves in zip(boards, root_moves)]
+        done, pending = await asyncio.wait(tasks, timeout=deadline) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return [task.result() if task in done and task.exception() is None else None for task in tasks]
+
+    def vote(self, boards, limit, root_moves=None, deadline=None, decided=vote_decided) -> Counter:
+        """
+        Counter of the best move found on each board. root_moves, if given,
+        holds the moves to search for each board (None for all of them).
+        Searches still running after `deadline` seconds, or once
+        decided(counts, remaining) is true, are cancelled and not counted.
+        """
+        boards = [board.copy(stack=False) for board in boards]
+        if root_moves is None:
+            root_moves = [None] * len(boards)
+        return self._call(self._vote(boards, limit, root_moves, deadline, decided))
+
+    def analyse_many(self, boards, limit, multipv=1, root_moves=None, deadline=None):
+        """
+        List of the `multipv` principal variations (InfoDicts) found on
+        each board, searched concurrently. Boards whose search failed or was
+        still running after `deadline` seconds get None.
+        """
+        boards = [board.copy(stack=False) for board in boards]
+        if root_moves is None:
+            root_moves = [None] * len(boards)
+        return self._call(self._analyse_many(boards, limit, multipv, root_moves, deadline))
+
+    def play(self, board, limit, **kwargs):
+        """Single search, same as SimpleEngine.play()."""
+        return self._call(self._search(board.copy(stack=False), limit, **kwargs))
+
+    def analyse(self, board, limit, **kwargs):
+        """Single analysis, same as SimpleEngine.analyse()."""
+        board = board.copy(stack=False)
+        return self._call(self._run(lambda protocol: protocol.analyse(board, limit, **kwargs), limit,
+                                    lambda: self.fallback.analyse(board, limit, **kwargs)))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        async def quit_all():
+            await asyncio.gather(*(protocol.quit() for protocol in self.protocols), return_exceptions=True)
+
+        if self.protocols:
+            try:
+                self._call(quit_all(), timeout=10)
+            except Exception:
+                pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+_evaluators = {}
+_evaluators_lock = threading.Lock()
+
+
+def get_evaluator(path=None, engines=None) -> AsyncEvaluator:
+    """
+    The process-wide evaluator for a Stockfish executable, started on first
+    use. Without the executable, the built-in evaluator is returned instead.
+    """
+    if path is None:
+        path = get_stockfish_path()
+    if use_builtin_engine(path):
+        return get_builtin_engine()
+    with _evaluators_lock:
+        evaluator = _evaluators.get(path)
+        if evaluator is None or evaluator.closed:
+            evaluator = _evaluators[path] = AsyncEvaluator(path, engines, cache=get_eval_cache())
+        return evaluator
+
+
+def close_evaluators():
+    with _evaluators_lock:
+        evaluators = list(_evaluators.values())
+        _evaluators.clear()
+    for evaluator in evaluators:
+        evaluator.close()
+
+
+# same exit hook as engine_pool: close before the interpreter joins threads
+getattr(threading, '_register_atexit', atexit.register)(close_evaluators)
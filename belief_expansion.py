@@ -0,0 +1,161 @@
+import chess
+import numpy as np
+from reconchess.utilities import without_opponent_pieces, is_illegal_castle
+from belief_store import BeliefStore, CASTLING_LOST, encode_board, ep_square_of, records_from_rows
+
+# Zobrist tables: one random key per (piece column, square), side to move,
+# castling byte and en passant square. Fixed seed so keys are stable across
+# processes.
+_rng = np.random.default_rng(0x52424331)
+ZOBRIST_PIECES = [[int(key) for key in row] for row in _rng.integers(0, 2**63, size=(12, 64), dtype=np.int64)]
+ZOBRIST_TURN = int(_rng.integers(0, 2**63, dtype=np.int64))
+ZOBRIST_CASTLING = [int(key) for key in _rng.integers(0, 2**63, size=16, dtype=np.int64)]
+ZOBRIST_EP = [int(key) for key in _rng.integers(0, 2**63, size=64, dtype=np.int64)] + [0]  # index -1 = no ep
+
+
+def zobrist_key(row):
+    """Full Zobrist key of an encode_board() row. Clocks are not part of the key."""
+    pieces, turn, castling, ep = row[0], row[1], row[2], row[3]
+    key = ZOBRIST_TURN if turn else 0
+    key ^= ZOBRIST_CASTLING[castling] ^ ZOBRIST_EP[ep]
+    for column, bb in enumerate(pieces):
+        table = ZOBRIST_PIECES[column]
+        while bb:
+            lsb = bb & -bb
+            key ^= table[lsb.bit_length() - 1]
+            bb ^= lsb
+    return key
+
+
+def zobrist_delta(parent, child):
+    """Key difference between two rows, touching only the squares that changed."""
+    delta = ZOBRIST_TURN ^ ZOBRIST_CASTLING[parent[2]] ^ ZOBRIST_CASTLING[child[2]]
+    delta ^= ZOBRIST_EP[parent[3]] ^ ZOBRIST_EP[child[3]]
+    for column, (before, after) in enumerate(zip(parent[0], child[0])):
+        changed = before ^ after
+        if changed:
+            table = ZOBRIST_PIECES[column]
+            while changed:
+                lsb = changed & -changed
+                delta ^= table[lsb.bit_length() - 1]
+                changed ^= lsb
+    return delta
+
+
+def candidate_moves(board:chess.Board):
+    """Every move the side to move could have made in RBC: pseudolegal moves, the null move and RBC castling."""
+    moves = list(board.pseudo_legal_moves)
+    moves.append(chess.Move.null())
+
+    castle_board = without_opponent_pieces(board)
+    for move in castle_board.generate_castling_moves():
+        if not is_illegal_castle(board, move) and move not in moves:
+            moves.append(move)
+    return moves
+
+
+def capture_moves(board:chess.Board, capture_square):
+    """
+    Moves of the side to move that capture the piece on `capture_square`,
+    found from the attackers of that square instead of full move generation.
+    As in reconchess, the capture square of an en passant capture is the
+    square of the captured pawn. Castling never captures.
+    """
+    moves = []
+    mover = board.turn
+    if board.occupied_co[not mover] & chess.BB_SQUARES[capture_square]:
+        promotes = chess.BB_SQUARES[capture_square] & chess.BB_BACKRANKS
+        for attacker in board.attackers(mover, capture_square):
+            if promotes and board.pawns & chess.BB_SQUARES[attacker]:
+                for promotion in (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT):
+                    moves.append(chess.Move(attacker, capture_square, promotion))
+            else:
+                moves.append(chess.Move(attacker, capture_square))
+
+    # en passant: the captured pawn sits one rank behind the ep square
+    ep_square = board.ep_square
+    if ep_square is not None and ep_square == capture_square + (8 if mover == chess.WHITE else -8) \
+            and board.pawns & chess.BB_SQUARES[capture_square]:
+        for attacker in chess.scan_forward(board.pawns & board.occupied_co[mover] & chess.BB_PAWN_ATTACKS[not mover][ep_square]):
+            moves.append(chess.Move(attacker, ep_square))
+    return moves
+
+
+def _child_row(board:chess.Board, castling):
+    """encode_board() for a board that was just pushed, reusing the parent's castling byte."""
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    pawns, knights, bishops, rooks, queens, kings = \
+        board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings
+    pieces = (pawns & white, knights & white, bishops & white, rooks & white, queens & white, kings & white,
+              pawns & black, knights & black, bishops & black, rooks & black, queens & black, kings & black)
+    return (pieces, board.turn, castling, ep_square_of(board),
+            min(board.halfmove_clock, 0xFFFF), min(board.fullmove_number, 0xFFFF))
+
+
+def expand_board(board:chess.Board, seen, rows, keys, moves=None, weight=None, weights=None):
+    """
+    Appends every child of `board` whose Zobrist key is not yet in `seen`
+    (a dict of key -> child index) to `rows` (encode_board() tuples) and
+    `keys`. The board is walked with push/pop and left unchanged. When
+    `weights` is given, `weight` is split evenly over the children and
+    summed into the weights of children that were already seen.
+    """
+    parent = encode_board(board)
+    parent_key = zobrist_key(parent)
+    castling = parent[2]
+    if moves is None:
+        moves = candidate_moves(board)
+    if weights is not None:
+        share = weight / len(moves)
+
+    for move in moves:
+        board.push(move)
+        if move:
+            child = _child_row(board, castling & ~(CASTLING_LOST[move.from_square] | CASTLING_LOST[move.to_square]))
+        else:
+            child = _child_row(board, castling)
+        board.pop()
+
+        key = parent_key ^ zobrist_delta(parent, child)
+        index = seen.get(key)
+        if index is None:
+            seen[key] = len(rows)
+            rows.append(child)
+            keys.append(key)
+            if weights is not None:
+                weights.append(share)
+        elif weights is not None:
+            weights[index] += share
+
+
+def expand_beliefs(store:BeliefStore, return_keys=False, capture_square=None, return_parents=False):
+    """
+    All positions reachable by one opponent move from any belief in `store`,
+    deduplicated across the whole set by Zobrist key. With `capture_square`,
+    only the moves capturing there (see capture_moves()) are followed.
+    Weights of a weighted store are carried over to the children.
+    `return_parents` adds the index of the belief each child came from;
+    children are then only merged within the same parent.
+    """
+    seen = {}
+    rows = []
+    keys = []
+    parents = []
+    weights = None if store.weights is None else []
+    for index, (board, weight) in enumerate(zip(store.boards(), store.weight_array())):
+        moves = None if capture_square is None else capture_moves(board, capture_square)
+        if moves is None or moves:
+            if return_parents:
+                seen = {}
+            before = len(rows)
+            expand_board(board, seen, rows, keys, moves, float(weight), weights)
+            parents.extend([index] * (len(rows) - before))
+
+    children = BeliefStore(records_from_rows(rows), None if weights is None else np.array(weights))
+    result = (children,)
+    if return_keys:
+        result += (np.array(keys, dtype=np.uint64),)
+    if return_parents:
+        result += (np.array(parents, dtype=np.int64),)
+    return result if len(result) > 1 else children
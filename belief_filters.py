@@ -0,0 +1,132 @@
+import chess
+import numpy as np
+from belief_store import BeliefStore, CASTLING_MASKS, piece_index
+
+
+def parse_window(window_str):
+    """
+    Parses the window description into a dictionary:
+    {'c8': '?', 'd8': '?', ..., 'd7': 'n'}
+    """
+    window = {}
+    entries = window_str.strip().split(';')
+    for entry in entries:
+        if entry:
+            square, piece = entry.split(':')
+            window[square] = piece
+    return window
+
+
+def compile_sense_result(sense_result):
+    """
+    Compiles a sense result [(square, piece or None), ...] into
+    (window, expected): the bitboard of every sensed square and, per piece
+    column of the belief store, the sensed squares that must hold that piece.
+    A belief is consistent when (pieces & window) == expected in every column.
+    """
+    window = 0
+    expected = [0] * 12
+    for square, piece in sense_result:
+        window |= chess.BB_SQUARES[square]
+        if piece is not None:
+            expected[piece_index(piece.piece_type, piece.color)] |= chess.BB_SQUARES[square]
+    return np.uint64(window), np.array(expected, dtype=np.uint64)
+
+
+def compile_window(window):
+    """Same as compile_sense_result() for a parse_window() dictionary, '?' meaning empty."""
+    sense_result = []
+    for square_str, symbol in window.items():
+        piece = None if symbol == '?' else chess.Piece.from_symbol(symbol)
+        sense_result.append((chess.parse_square(square_str), piece))
+    return compile_sense_result(sense_result)
+
+
+def window_mask(store:BeliefStore, compiled):
+    """Boolean mask of the beliefs that agree with a compiled window."""
+    window, expected = compiled
+    return np.all((store.pieces & window) == expected, axis=1)
+
+
+def filter_by_sense(store:BeliefStore, sense_result):
+    """Keeps only the beliefs that agree with every square of the sense result."""
+    return store.select(window_mask(store, compile_sense_result(sense_result)))
+
+
+def move_result_mask(store:BeliefStore, color, requested_move, taken_move, captured_opponent_piece, capture_square):
+    """
+    Boolean mask of the beliefs in which our `requested_move` would have
+    been revised to `taken_move` with the reported capture, following
+    reconchess.utilities.revise_move(). Our own pieces are the same in
+    every belief, so only the opponent's pieces decide; a belief that has
+    drifted and lacks the moving piece is a mismatch.
+    """
+    keep = np.ones(len(store), dtype=bool)
+    if requested_move is None or not store:
+        return keep
+
+    theirs = store.occupied_co(not color)
+    ep = store.records['ep']
+    from_square = requested_move.from_square
+    ours = piece_index(chess.PAWN, color)
+    moving = (store.pieces[:, ours:ours + 6] & np.uint64(chess.BB_SQUARES[from_square])) != 0
+    holders = np.flatnonzero(moving.any(axis=1))
+    if not len(holders):
+        return np.zeros(len(store), dtype=bool)
+    piece_type = int(np.flatnonzero(moving[holders[0]])[0]) + 1
+    keep &= moving[:, piece_type - 1]
+
+    if captured_opponent_piece:
+        keep &= (theirs & np.uint64(chess.BB_SQUARES[capture_square])) != 0
+        if taken_move is not None and capture_square != taken_move.to_square:
+            # en passant: the captured pawn is behind the target square
+            keep &= ep == taken_move.to_square
+    elif taken_move is not None:
+        keep &= (theirs & np.uint64(chess.BB_SQUARES[taken_move.to_square])) == 0
+
+    castling = piece_type == chess.KING and chess.square_distance(from_square, requested_move.to_square) > 1
+    if castling:
+        rook_square = chess.square(7 if requested_move.to_square > from_square else 0, chess.square_rank(from_square))
+        right = np.uint8(1 << CASTLING_MASKS.index(chess.BB_SQUARES[rook_square]))
+        can_castle = ((store.records['castling'] & right) != 0) & \
+            ((theirs & np.uint64(chess.between(from_square, rook_square))) == 0)
+        keep &= can_castle if taken_move is not None else ~can_castle
+    elif taken_move is not None:
+        # nothing stood between the piece and where it stopped
+        keep &= (theirs & np.uint64(chess.between(from_square, taken_move.to_square))) == 0
+        if piece_type == chess.PAWN and taken_move.to_square != requested_move.to_square:
+            # a pawn push stops short of a piece it cannot take
+            beyond = taken_move.to_square + (8 if color == chess.WHITE else -8)
+            keep &= (theirs & np.uint64(chess.BB_SQUARES[beyond])) != 0
+    elif piece_type == chess.PAWN:
+        to_square = requested_move.to_square
+        if chess.square_file(from_square) == chess.square_file(to_square):
+            # blocked right in front
+            ahead = from_square + (8 if color == chess.WHITE else -8)
+            keep &= (theirs & np.uint64(chess.BB_SQUARES[ahead])) != 0
+        else:
+            # a diagonal with nothing to take
+            keep &= ((theirs & np.uint64(chess.BB_SQUARES[to_square])) == 0) & (ep != to_square)
+    return keep
+
+
+def filter_by_move_result(store:BeliefStore, color, requested_move, taken_move, captured_opponent_piece, capture_square):
+    """Keeps only the beliefs consistent with the result of our own move."""
+    return store.select(move_result_mask(store, color, requested_move, taken_move,
+                                         captured_opponent_piece, capture_square))
+
+
+def fen_matches_window(fen, window):
+    """
+    Checks if the given FEN matches the window observation.
+    '?' means the square must be empty.
+    Any other piece letter must match exactly.
+    """
+    return bool(window_mask(BeliefStore.from_fens([fen]), compile_window(window))[0])
+
+
+def filter_fens_by_window(fens, window_str):
+    compiled = compile_window(parse_window(window_str))
+    keep = window_mask(BeliefStore.from_fens(fens), compiled)
+    consistent_fens = [fen for fen, ok in zip(fens, keep) if ok]
+    return sorted(consistent_fens)
@@ -0,0 +1,183 @@
+"""
+Binary belief-set files. A file is a 64-byte header followed by the
+BELIEF_DTYPE records, then, for a weighted set, one float64 weight per
+record. Records are fixed width, so a file is loaded with np.memmap
+without parsing anything, and processes that map the same file share its
+pages instead of copying them.
+
+    python belief_io.py import positions.txt positions.rbcb
+    python belief_io.py export positions.rbcb [positions.txt]
+    python belief_io.py info positions.rbcb
+"""
+import sys
+import chess
+import numpy as np
+from belief_store import BeliefStore, BELIEF_DTYPE, ALL_FIELDS, records_from_rows, encode_board
+
+MAGIC = b'RBCBELF\x00'
+# bumped whenever BELIEF_DTYPE or the layout below changes; older readers refuse newer files
+FORMAT_VERSION = 1
+BELIEF_FILE_SUFFIX = '.rbcb'
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u2'),
+    ('flags', '<u2'),
+    ('record_size', '<u4'),
+    ('count', '<u8'),
+])
+# the header is padded so that the records, and the weights after them, start 8-byte aligned
+HEADER_SIZE = 64
+WEIGHTED = 0x1
+
+WEIGHT_DTYPE = np.dtype('<f8')
+# FEN lines parsed per chunk when importing
+FEN_CHUNK = 65536
+
+
+def _header(count, weighted):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = FORMAT_VERSION
+    header['flags'] = WEIGHTED if weighted else 0
+    header['record_size'] = BELIEF_DTYPE.itemsize
+    header['count'] = count
+    return header.tobytes().ljust(HEADER_SIZE, b'\x00')
+
+
+def read_header(path):
+    """(count, weighted) of a belief file. Raises ValueError if `path` is not a belief file this version reads."""
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or raw[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a belief file'.format(path))
+    header = np.frombuffer(raw[:HEADER_DTYPE.itemsize], dtype=HEADER_DTYPE)[0]
+    if header['version'] > FORMAT_VERSION:
+        raise ValueError('{} has format version {}, this reader supports up to {}'.format(
+            path, header['version'], FORMAT_VERSION))
+    if header['record_size'] != BELIEF_DTYPE.itemsize:
+        raise ValueError('{} has {}-byte records, expected {}'.format(
+            path, header['record_size'], BELIEF_DTYPE.itemsize))
+    return int(header['count']), bool(header['flags'] & WEIGHTED)
+
+
+def is_belief_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class BeliefWriter:
+    """
+    Streams stores into a belief file, for sets too large to hold at once.
+    The record count is written into the header, and the weights after the
+    records, when the writer is closed.
+    """
+
+    def __init__(self, path, weighted=False):
+        self.path = path
+        self.weighted = weighted
+        self.count = 0
+        self.weights = []
+        self.file = open(path, 'wb')
+        self.file.write(_header(0, weighted))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, store:BeliefStore):
+        # copied field by field so that the alignment padding is written as zeros, not whatever memory held
+        records = np.zeros(len(store), dtype=BELIEF_DTYPE)
+        for field in ALL_FIELDS:
+            records[field] = store.records[field]
+        self.file.write(records.tobytes())
+        if self.weighted:
+            self.weights.append(store.weight_array().astype(WEIGHT_DTYPE))
+        self.count += len(store)
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.weighted and self.weights:
+            self.file.write(np.concatenate(self.weights).tobytes())
+        self.file.seek(0)
+        self.file.write(_header(self.count, self.weighted))
+        self.file.close()
+        self.file = None
+
+
+def write_beliefs(path, store:BeliefStore):
+    """Writes a store, with its weights if it has any."""
+    with BeliefWriter(path, weighted=store.weights is not None) as writer:
+        writer.write(store)
+
+
+def read_beliefs(path, mmap=True) -> BeliefStore:
+    """
+    Loads a belief file. With `mmap` the records and weights are read-only
+    views of the file, paged in on access; copy them before changing them.
+    """
+    count, weighted = read_header(path)
+    weights_offset = HEADER_SIZE + count * BELIEF_DTYPE.itemsize
+    if count == 0:
+        return BeliefStore(np.zeros(0, dtype=BELIEF_DTYPE), np.zeros(0) if weighted else None)
+    if mmap:
+        records = np.memmap(path, dtype=BELIEF_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        weights = np.memmap(path, dtype=WEIGHT_DTYPE, mode='r', offset=weights_offset, shape=(count,)) \
+            if weighted else None
+    else:
+        records = np.fromfile(path, dtype=BELIEF_DTYPE, count=count, offset=HEADER_SIZE)
+        weights = np.fromfile(path, dtype=WEIGHT_DTYPE, count=count, offset=weights_offset) if weighted else None
+    return BeliefStore(records, weights)
+
+
+def fens_to_beliefs(lines, path, chunk=FEN_CHUNK):
+    """Writes the FENs of an iterable of lines, blank lines skipped, to a belief file. Returns the count."""
+    with BeliefWriter(path) as writer:
+        rows = []
+        for line in lines:
+            fen = line.strip()
+            if fen:
+                rows.append(encode_board(chess.Board(fen)))
+            if len(rows) == chunk:
+                writer.write(BeliefStore(records_from_rows(rows)))
+                rows = []
+        if rows:
+            writer.write(BeliefStore(records_from_rows(rows)))
+        return writer.count
+
+
+def beliefs_to_fens(path, out, chunk=FEN_CHUNK):
+    """Writes one FEN line per record of a belief file to a text stream. Returns the count."""
+    store = read_beliefs(path)
+    for start in range(0, len(store), chunk):
+        out.write(''.join(fen + '\n' for fen in store.select(slice(start, start + chunk)).fens()))
+    return len(store)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) >= 3 and argv[0] == 'import':
+        with open(argv[1]) as lines:
+            print('{} positions written to {}'.format(fens_to_beliefs(lines, argv[2]), argv[2]))
+    elif len(argv) >= 2 and argv[0] == 'export':
+        if len(argv) >= 3:
+            with open(argv[2], 'w') as out:
+                beliefs_to_fens(argv[1], out)
+        else:
+            beliefs_to_fens(argv[1], sys.stdout)
+    elif len(argv) == 2 and argv[0] == 'info':
+        count, weighted = read_header(argv[1])
+        print('{}: {} positions, {}'.format(argv[1], count, 'weighted' if weighted else 'unweighted'))
+    else:
+        print(__doc__.strip().split('\n\n')[-1])
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import chess
+import numpy as np
+from belief_store import BeliefStore, records_from_rows
+from belief_filters import compile_sense_result, window_mask
+from belief_expansion import capture_moves, expand_board
+
+# Children are handed from one stage to the next in chunks of about this many rows
+CHUNK_SIZE = 4096
+# Parents given to an expansion pool per call, so that its output stays bounded too
+POOL_BATCH = 8192
+
+# A stage is a generator function stage(parents, chunks, *args) turning a stream
+# of (store, parent index) chunks into another. The parent index of a row is the
+# position in `parents` of the belief it was derived from.
+
+
+def _chunk(rows, weights, parent_index):
+    store = BeliefStore(records_from_rows(rows), None if weights is None else np.array(weights))
+    return store, np.array(parent_index, dtype=np.int64)
+
+
+def expansion_stage(parents:BeliefStore, chunks, capture_square=None, pool=None, chunk_size=CHUNK_SIZE):
+    """
+    Children of every incoming belief, one opponent move deep, yielded as
+    soon as `chunk_size` of them are ready. With `capture_square` only the
+    capturing moves are followed. Duplicates are merged per parent here and
+    across parents by BeliefSet.materialize().
+    """
+    for store, index in chunks:
+        if pool is not None and len(store) >= pool.min_parallel:
+            for start in range(0, len(store), POOL_BATCH):
+                batch = slice(start, start + POOL_BATCH)
+                children, parent_index = pool.expand(store.select(batch), capture_square=capture_square,
+                                                     return_parents=True)
+                if children:
+                    yield children, index[batch][parent_index]
+            continue
+
+        rows = []
+        parent_index = []
+        weights = None if store.weights is None else []
+        for position, (board, weight) in enumerate(zip(store.boards(), store.weight_array())):
+            moves = None if capture_square is None else capture_moves(board, capture_square)
+            if moves is not None and not moves:
+                continue
+            before = len(rows)
+            expand_board(board, {}, rows, [], moves, float(weight), weights)
+            parent_index.extend([index[position]] * (len(rows) - before))
+
+            if len(rows) >= chunk_size:
+                yield _chunk(rows, weights, parent_index)
+                rows = []
+                parent_index = []
+                weights = None if weights is None else []
+        if rows:
+            yield _chunk(rows, weights, parent_index)
+
+
+def capture_stage(parents:BeliefStore, chunks, color, capture_square=None):
+    """
+    Keeps the children in which the opponent's move changed the pieces of
+    `color` exactly as reported: not at all, or only by taking the piece on
+    `capture_square`.
+    """
+    mine = parents.occupied_co(color)
+    lost = np.uint64(0 if capture_square is None else chess.BB_SQUARES[capture_square])
+    for store, index in chunks:
+        keep = store.occupied_co(color) == (mine[index] & ~lost)
+        if keep.any():
+            yield store.select(keep), index[keep]
+
+
+def sense_stage(parents:BeliefStore, chunks, sense_result):
+    """Keeps the children that agree with every square of the sense result."""
+    compiled = compile_sense_result(sense_result)
+    for store, index in chunks:
+        keep = window_mask(store, compiled)
+        if keep.any():
+            yield store.select(keep), index[keep]
+
+
+class BeliefSet:
+    """
+    A belief set that has not been computed yet: a parent BeliefStore and
+    the stages still to run over it. Nothing is generated until chunks() or
+    materialize() is called, and the stages are then fused, so only the
+    children that survive every stage are ever held at once.
+    """
+
+    def __init__(self, parents:BeliefStore, stages=()):
+        self.parents = parents
+        self.stages = tuple(stages)
+
+    def then(self, stage, *args):
+        """New BeliefSet with one more stage at the end of the pipeline."""
+        return BeliefSet(self.parents, self.stages + ((stage, args),))
+
+    def expand(self, capture_square=None, pool=None):
+        return self.then(expansion_stage, capture_square, pool)
+
+    def check_captures(self, color, capture_square=None):
+        return self.then(capture_stage, color, capture_square)
+
+    def filter_sense(self, sense_result):
+        return self.then(sense_stage, sense_result)
+
+    def chunks(self):
+        """Runs the pipeline lazily, yielding (store, parent index) chunks."""
+        chunks = iter([(self.parents, np.arange(len(self.parents)))])
+        for stage, args in self.stages:
+            chunks = stage(self.parents, chunks, *args)
+        return chunks
+
+    def materialize(self) -> BeliefStore:
+        """Runs the pipeline and merges the surviving chunks into one deduplicated store."""
+        return BeliefStore.concat(store for store, _ in self.chunks()).unique()
+
+    def sample(self, k) -> BeliefStore:
+        """
+        About k of the beliefs the pipeline produces, deduplicated, without
+        running it to the end: the parents are taken in random order and
+        the pipeline stopped once k children have come out of it. All of
+        them if there are fewer.
+        """
+        parents = self.parents.select(np.random.permutation(len(self.parents)))
+        stores = []
+        count = 0
+        for store, _ in BeliefSet(parents, self.stages).chunks():
+            stores.append(store)
+            count += len(store)
+            if count >= k:
+                break
+        return BeliefStore.concat(stores).unique()
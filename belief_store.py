@@ -0,0 +1,338 @@
+import chess
+import numpy as np
+from numpy.lib import recfunctions
+
+# Piece bitboard columns: white PNBRQK followed by black pnbrqk, the same
+# order as chess.Piece.symbol() so that column = piece_type - 1 (+ 6 for black)
+PIECE_SYMBOLS = 'PNBRQKpnbrqk'
+
+# Castling rights packed into one byte: K, Q, k, q
+CASTLING_MASKS = (chess.BB_H1, chess.BB_A1, chess.BB_H8, chess.BB_A8)
+
+# Castling bits lost when a move touches a square
+CASTLING_LOST = [0] * 64
+CASTLING_LOST[chess.H1] = 0b0001
+CASTLING_LOST[chess.A1] = 0b0010
+CASTLING_LOST[chess.E1] = 0b0011
+CASTLING_LOST[chess.H8] = 0b0100
+CASTLING_LOST[chess.A8] = 0b1000
+CASTLING_LOST[chess.E8] = 0b1100
+
+BELIEF_DTYPE = np.dtype([
+    ('pieces', '<u8', (12,)),
+    ('turn', 'u1'),
+    ('castling', 'u1'),
+    ('ep', 'i1'),
+    ('halfmove', '<u2'),
+    ('fullmove', '<u2'),
+], align=True)
+
+ALL_FIELDS = ('pieces', 'turn', 'castling', 'ep', 'halfmove', 'fullmove')
+
+# Fields that identify a position when merging beliefs. The clocks do not
+# change which moves are possible, so positions that differ only there are
+# the same belief.
+CANONICAL_FIELDS = ('pieces', 'turn', 'castling', 'ep')
+
+
+def piece_index(piece_type, color):
+    """Column of the bitboard holding `piece_type` pieces of `color`."""
+    return piece_type - 1 if color == chess.WHITE else piece_type + 5
+
+
+def ep_square_of(board:chess.Board):
+    """
+    En passant square, only kept when a pawn could actually capture there.
+    Pseudolegal is enough: RBC lets a player leave its king in check.
+    """
+    if board.ep_square is not None and board.has_pseudo_legal_en_passant():
+        return board.ep_square
+    return -1
+
+
+def canonical_fen(board) -> str:
+    """
+    FEN of a board (or FEN string) reduced to what identifies the position:
+    placement, side to move, castling rights and a relevant en passant square.
+    """
+    if isinstance(board, str):
+        board = chess.Board(board)
+    ep = ep_square_of(board)
+    return ' '.join([board.board_fen(), 'w' if board.turn else 'b', board.castling_xfen(),
+                     chess.SQUARE_NAMES[ep] if ep >= 0 else '-'])
+
+
+def encode_board(board:chess.Board):
+    """
+    Converts a board into a single BELIEF_DTYPE row tuple:
+    (pieces, turn, castling, ep, halfmove, fullmove)
+    """
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    by_type = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    pieces = tuple(bb & white for bb in by_type) + tuple(bb & black for bb in by_type)
+
+    rights = board.clean_castling_rights()
+    castling = 0
+    for bit, mask in enumerate(CASTLING_MASKS):
+        if rights & mask:
+            castling |= 1 << bit
+
+    return (pieces, board.turn, castling, ep_square_of(board),
+            min(board.halfmove_clock, 0xFFFF), min(board.fullmove_number, 0xFFFF))
+
+
+def decode_row(row) -> chess.Board:
+    """Builds a chess.Board directly from the bitboards of one record."""
+    pieces = [int(bb) for bb in row['pieces']]
+    white = pieces[0] | pieces[1] | pieces[2] | pieces[3] | pieces[4] | pieces[5]
+    black = pieces[6] | pieces[7] | pieces[8] | pieces[9] | pieces[10] | pieces[11]
+
+    board = chess.Board(None)
+    board.pawns = pieces[0] | pieces[6]
+    board.knights = pieces[1] | pieces[7]
+    board.bishops = pieces[2] | pieces[8]
+    board.rooks = pieces[3] | pieces[9]
+    board.queens = pieces[4] | pieces[10]
+    board.kings = pieces[5] | pieces[11]
+    board.promoted = chess.BB_EMPTY
+    board.occupied_co[chess.WHITE] = white
+    board.occupied_co[chess.BLACK] = black
+    board.occupied = white | black
+
+    board.turn = bool(row['turn'])
+    castling = int(row['castling'])
+    board.castling_rights = chess.BB_EMPTY
+    for bit, mask in enumerate(CASTLING_MASKS):
+        if castling & (1 << bit):
+            board.castling_rights |= mask
+    ep = int(row['ep'])
+    board.ep_square = ep if ep >= 0 else None
+    board.halfmove_clock = int(row['halfmove'])
+    board.fullmove_number = int(row['fullmove'])
+    return board
+
+
+def records_from_rows(rows):
+    """Packs a list of encode_board() tuples into a zero-padded record array."""
+    records = np.zeros(len(rows), dtype=BELIEF_DTYPE)
+    if rows:
+        pieces, turn, castling, ep, halfmove, fullmove = zip(*rows)
+        records['pieces'] = np.array(pieces, dtype=np.uint64)
+        records['turn'] = turn
+        records['castling'] = castling
+        records['ep'] = ep
+        records['halfmove'] = halfmove
+        records['fullmove'] = fullmove
+    return records
+
+
+def row_keys(records, fields=ALL_FIELDS):
+    """One opaque, byte-comparable key per record built from `fields` only."""
+    packed = recfunctions.repack_fields(records[list(fields)])
+    return np.ascontiguousarray(packed).view(np.dtype((np.void, packed.dtype.itemsize)))
+
+
+class BeliefStore:
+    """
+    A set of candidate positions held as one fixed-width record per position
+    (12 piece bitboards, side to move, castling, en passant and clocks) in a
+    contiguous NumPy array, with optional per-position weights. FEN strings
+    and chess.Board objects are only produced on request.
+    """
+
+    def __init__(self, records=None, weights=None):
+        self.records = np.zeros(0, dtype=BELIEF_DTYPE) if records is None else records
+        self.weights = weights
+
+    @classmethod
+    def from_boards(cls, boards, weights=None):
+        return cls(records_from_rows([encode_board(board) for board in boards]), weights)
+
+    @classmethod
+    def from_fens(cls, fens, weights=None):
+        return cls.from_boards((chess.Board(fen) for fen in fens), weights)
+
+    @classmethod
+    def concat(cls, stores):
+        stores = list(stores)
+        if not stores:
+            return cls()
+        records = np.concatenate([store.records for store in stores])
+        if all(store.weights is None for store in stores):
+            return cls(records)
+        return cls(records, np.concatenate([store.weight_array() for store in stores]))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __bool__(self):
+        return len(self.records) > 0
+
+    @property
+    def pieces(self):
+        """(n, 12) view of the piece bitboards, see PIECE_SYMBOLS for the column order."""
+        return self.records['pieces']
+
+    @property
+    def turn(self):
+        return self.records['turn']
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+    def weight_array(self):
+        """Per-position weights, 1 for every position of an unweighted store."""
+        if self.weights is None:
+            return np.ones(len(self.records))
+        return self.weights
+
+    def occupied_co(self, color):
+        """(n,) bitboards of every square occupied by `color`."""
+        start = 0 if color == chess.WHITE else 6
+        return np.bitwise_or.reduce(self.pieces[:, start:start + 6], axis=1)
+
+    def occupied(self):
+        return np.bitwise_or.reduce(self.pieces, axis=1)
+
+    def board(self, index) -> chess.Board:
+        return decode_row(self.records[index])
+
+    def boards(self):
+        for row in self.records:
+            yield decode_row(row)
+
+    def fen(self, index) -> str:
+        return self.board(index).fen()
+
+    def fens(self):
+        return [board.fen() for board in self.boards()]
+
+    def select(self, selector):
+        """New store with the rows picked by a boolean mask, index array or slice."""
+        weights = None if self.weights is None else self.weights[selector]
+        return BeliefStore(self.records[selector], weights)
+
+    def sample(self, k):
+        """Up to k distinct positions, drawn in proportion to their weights."""
+        k = min(k, len(self.records))
+        p = None
+        if self.weights is not None:
+            p = self.weights / self.weights.sum()
+            k = min(k, int(np.count_nonzero(p)))
+        indices = np.random.choice(len(self.records), size=k, replace=False, p=p)
+        return self.select(indices)
+
+    def representative_order(self):
+        """
+        Indices of the positions, most typical first. A position scores the
+        weighted share of the store that agrees with it on each piece-square
+        bit, summed over the bits. Ties keep the store order.
+        """
+        if not len(self.records):
+            return np.zeros(0, dtype=np.int64)
+        bits = np.unpackbits(self.pieces.view(np.uint8).reshape(len(self.records), 12, 8), axis=2,
+                             bitorder='little').reshape(len(self.records), 12 * 64)
+        weights = self.weight_array()
+        frequency = weights @ bits / weights.sum()
+        # agreement is the frequency on a set bit and one minus it on a clear one, so only set bits differ
+        agreement = bits @ (2 * frequency - 1)
+        return np.argsort(-agreement, kind='stable')
+
+    def canonical_keys(self):
+        """Per-position keys that ignore the halfmove and fullmove clocks."""
+        return row_keys(self.records, CANONICAL_FIELDS)
+
+    def unique(self, counts=False):
+        """
+        Merges positions with the same canonical key, keeping the first
+        occurrence of each. Weights of merged positions are summed. With
+        `counts`, an unweighted store comes back weighted by how many times
+        each position occurred.
+        """
+        if len(self.records) < 2:
+            if counts and self.weights is None:
+                return BeliefStore(self.records, np.ones(len(self.records)))
+            return self
+        _, first, inverse = np.unique(self.canonical_keys(), return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        weights = None
+        if self.weights is not None or counts:
+            weights = np.bincount(inverse.ravel(), weights=self.weights, minlength=len(first))[order]
+        return BeliefStore(self.records[first[order]], weights)
+
+    def remove(self, color, squares):
+        """New store with the pieces of `color` on the squares of bitboard `squares` taken off."""
+        records = self.records.copy()
+        first = piece_index(chess.PAWN, color)
+        records['pieces'][:, first:first + 6] &= ~np.uint64(squares)
+        return BeliefStore(records, self.weights)
+
+    def push(self, move):
+        """
+        New store with `move` played in every position (a null move for
+        None), computed on the bitboards directly. Every position must have
+        the same side to move, as is the case for our own move in RBC.
+        Positions without the moving piece on move.from_square, which cannot
+        have played it, are left out. The move is not checked for legality.
+        """
+        records = self.records.copy()
+        weights = self.weights
+        if not len(records):
+            return BeliefStore(records, weights)
+
+        color = bool(records['turn'][0])
+        ours = piece_index(chess.PAWN, color)
+        theirs = piece_index(chess.PAWN, not color)
+        if move:
+            # the piece type is taken from the first position that has one of ours on the from square
+            moving = (records['pieces'][:, ours:ours + 6] & np.uint64(chess.BB_SQUARES[move.from_square])) != 0
+            holders = np.flatnonzero(moving.any(axis=1))
+            column = ours + (int(np.flatnonzero(moving[holders[0]])[0]) if len(holders) else 0)
+            keep = moving[:, column - ours]
+            if not keep.all():
+                records = records[keep]
+                weights = None if weights is None else weights[keep]
+        pieces = records['pieces']
+        halfmove = np.minimum(records['halfmove'].astype(np.uint32) + 1, 0xFFFF)
+
+        records['turn'] = not color
+        if color == chess.BLACK:
+            records['fullmove'] = np.minimum(records['fullmove'].astype(np.uint32) + 1, 0xFFFF)
+        ep = records['ep'].copy()
+        records['ep'] = -1
+        if not move:
+            records['halfmove'] = halfmove
+            return BeliefStore(records, weights)
+
+        from_bb = np.uint64(chess.BB_SQUARES[move.from_square])
+        to_bb = np.uint64(chess.BB_SQUARES[move.to_square])
+        piece_type = column - ours + 1
+
+        captured = np.any(pieces[:, theirs:theirs + 6] & to_bb, axis=1)
+        pieces[:, theirs:theirs + 6] &= ~to_bb
+        if piece_type == chess.PAWN and chess.square_file(move.from_square) != chess.square_file(move.to_square):
+            # en passant takes the pawn behind the target square
+            en_passant = ep == move.to_square
+            victim = np.uint64(chess.BB_SQUARES[move.to_square + (-8 if color == chess.WHITE else 8)])
+            pieces[en_passant, theirs] &= ~victim
+            captured |= en_passant
+
+        pieces[:, column] &= ~from_bb
+        pieces[:, ours + (move.promotion or piece_type) - 1] |= to_bb
+        if piece_type == chess.KING and chess.square_distance(move.from_square, move.to_square) > 1:
+            rank = chess.square_rank(move.from_square)
+            kingside = move.to_square > move.from_square
+            rook_from = np.uint64(chess.BB_SQUARES[chess.square(7 if kingside else 0, rank)])
+            rook_to = np.uint64(chess.BB_SQUARES[chess.square(5 if kingside else 3, rank)])
+            pieces[:, ours + chess.ROOK - 1] = (pieces[:, ours + chess.ROOK - 1] & ~rook_from) | rook_to
+
+        records['castling'] &= ~np.uint8(CASTLING_LOST[move.from_square] | CASTLING_LOST[move.to_square])
+        records['halfmove'] = np.where(captured | (piece_type == chess.PAWN), 0, halfmove)
+        if piece_type == chess.PAWN and abs(move.to_square - move.from_square) == 16:
+            # kept only where an opponent pawn could take en passant, as in ep_square_of()
+            ep_square = (move.from_square + move.to_square) // 2
+            can_take = (pieces[:, theirs] & np.uint64(chess.BB_PAWN_ATTACKS[color][ep_square])) != 0
+            records['ep'] = np.where(can_take, ep_square, -1)
+        return BeliefStore(records, weights)
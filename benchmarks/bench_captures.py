@@ -0,0 +1,66 @@
+"""
+Capture-turn expansion on capture-heavy middlegames: the attack-map
+generator against the full pseudolegal scan of generate_capture_resulting_fens.
+
+Run from the repository root:
+    python -m benchmarks.bench_captures [num_beliefs]
+"""
+import random
+import sys
+import time
+import chess
+from belief_store import BeliefStore
+from belief_expansion import expand_beliefs
+from part_four_sub_two import generate_capture_resulting_fens
+from benchmarks.bench_expansion import random_positions
+
+
+def capture_cases(count, seed=2025):
+    """(fen, capture square) pairs from middlegame positions where the side to move has several captures."""
+    rng = random.Random(seed)
+    cases = []
+    for fen in random_positions(count * 4, seed=seed, max_plies=60):
+        board = chess.Board(fen)
+        if board.fullmove_number < 10:
+            continue
+        targets = [square for square in chess.scan_forward(board.occupied_co[not board.turn])
+                   if board.attackers(board.turn, square)]
+        if len(targets) >= 2:
+            cases.append((fen, rng.choice(targets)))
+        if len(cases) == count:
+            break
+    return cases
+
+
+def main():
+    num_beliefs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    cases = capture_cases(num_beliefs)
+
+    start = time.perf_counter()
+    old_count = 0
+    for fen, square in cases:
+        old_count += len(generate_capture_resulting_fens(chess.Board(fen), chess.SQUARE_NAMES[square]))
+    old_time = time.perf_counter() - start
+
+    # the belief set of a real capture turn shares one capture square, so expand per square
+    stores = {}
+    for fen, square in cases:
+        stores.setdefault(square, []).append(fen)
+    stores = {square: BeliefStore.from_fens(fens) for square, fens in stores.items()}
+
+    start = time.perf_counter()
+    new_count = 0
+    for square, store in stores.items():
+        new_count += len(expand_beliefs(store, capture_square=square))
+    new_time = time.perf_counter() - start
+
+    print('beliefs: {}'.format(len(cases)))
+    print('full scan:  {:>7} children {:8.3f}s {:>8.1f} us/belief'.format(
+        old_count, old_time, old_time / len(cases) * 1e6))
+    print('attack map: {:>7} children {:8.3f}s {:>8.1f} us/belief'.format(
+        new_count, new_time, new_time / len(cases) * 1e6))
+    print('speedup: {:.1f}x'.format(old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Children per second of the push/pop expansion engine against the old
+copy()/push()/fen() generate_next_fens.
+
+Run from the repository root:
+    python -m benchmarks.bench_expansion [num_beliefs | belief_file]
+"""
+import random
+import sys
+import time
+import chess
+from belief_store import BeliefStore
+from belief_io import is_belief_file, read_beliefs
+from belief_expansion import expand_beliefs
+from part_four_sub_one import generate_next_fens
+
+
+def random_positions(count, seed=2025, max_plies=40):
+    """Positions reached by random pseudolegal playouts, with both kings still on the board."""
+    rng = random.Random(seed)
+    fens = []
+    while len(fens) < count:
+        board = chess.Board()
+        for _ in range(rng.randint(4, max_plies)):
+            moves = list(board.pseudo_legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+            if board.king(chess.WHITE) is None or board.king(chess.BLACK) is None:
+                break
+            fens.append(board.fen())
+    return fens[:count]
+
+
+def load_positions(arg, default_count, **kwargs):
+    """The belief file named by `arg`, or random_positions() of the count it gives, `default_count` if None."""
+    if arg is not None and is_belief_file(arg):
+        return read_beliefs(arg)
+    return BeliefStore.from_fens(random_positions(int(arg) if arg is not None else default_count, **kwargs))
+
+
+def bench_old(fens):
+    start = time.perf_counter()
+    children = set()
+    for fen in fens:
+        children.update(generate_next_fens(chess.Board(fen)))
+    return len(children), time.perf_counter() - start
+
+
+def bench_new(store):
+    start = time.perf_counter()
+    children = expand_beliefs(store)
+    return len(children), time.perf_counter() - start
+
+
+def main():
+    store = load_positions(sys.argv[1] if len(sys.argv) > 1 else None, 2000)
+    fens = store.fens()
+
+    old_count, old_time = bench_old(fens)
+    new_count, new_time = bench_new(store)
+
+    print('beliefs: {}'.format(len(fens)))
+    print('generate_next_fens: {:>8} children {:8.3f}s {:>10.0f} children/s'.format(
+        old_count, old_time, old_count / old_time))
+    print('expand_beliefs:     {:>8} children {:8.3f}s {:>10.0f} children/s'.format(
+        new_count, new_time, new_count / new_time))
+    print('speedup: {:.1f}x'.format(old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
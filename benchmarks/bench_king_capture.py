@@ -0,0 +1,57 @@
+"""
+King-capture check over a whole belief set: the bitboard detector against
+the per-board pseudolegal scan that choose_move used to run.
+
+Run from the repository root:
+    python -m benchmarks.bench_king_capture [num_beliefs | belief_file]
+
+A belief file is benchmarked as is, without the expansion step.
+"""
+import sys
+import time
+from collections import Counter
+import chess
+from belief_store import BeliefStore
+from belief_expansion import expand_beliefs
+from king_capture import king_capture_counts
+from belief_io import is_belief_file, read_beliefs
+from benchmarks.bench_expansion import random_positions
+
+
+def scan_king_captures(board:chess.Board):
+    counts = Counter()
+    for move in board.pseudo_legal_moves:
+        piece = board.piece_at(move.to_square)
+        if piece and piece.piece_type == chess.KING and move.promotion in (None, chess.QUEEN):
+            counts[move] += 1
+    return counts
+
+
+def main():
+    if len(sys.argv) > 1 and is_belief_file(sys.argv[1]):
+        store = read_beliefs(sys.argv[1])
+    else:
+        num_beliefs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+        # children of random positions, a realistic mix with some kings left en prise
+        store = expand_beliefs(BeliefStore.from_fens(random_positions(num_beliefs // 20, max_plies=80)))
+        store = store.select(slice(0, num_beliefs))
+
+    start = time.perf_counter()
+    old = Counter()
+    for board in store.boards():
+        old.update(scan_king_captures(board))
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = king_capture_counts(store)
+    new_time = time.perf_counter() - start
+    assert old == Counter({move: int(count) for move, count in new.items()})
+
+    print('beliefs: {}, king captures: {}'.format(len(store), sum(old.values())))
+    print('scan:     {:8.3f}s {:>8.2f} us/belief'.format(old_time, old_time / len(store) * 1e6))
+    print('bitboard: {:8.3f}s {:>8.2f} us/belief'.format(new_time, new_time / len(store) * 1e6))
+    print('speedup: {:.0f}x'.format(old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
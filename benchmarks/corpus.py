@@ -0,0 +1,98 @@
+"""
+The fixed benchmark corpus, checked in under benchmarks/corpus as belief
+files (see belief_io): opening, middlegame and endgame positions, and
+belief sets of several sizes. Everything is generated from fixed seeds,
+so rebuilding gives the same files.
+
+Rebuild from the repository root:
+    python -m benchmarks.corpus
+"""
+import os
+import random
+import chess
+import numpy as np
+from belief_store import BeliefStore
+from belief_expansion import expand_beliefs
+from belief_io import write_beliefs, read_beliefs, BELIEF_FILE_SUFFIX
+from benchmarks.bench_expansion import random_positions
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+PHASES = ('opening', 'middlegame', 'endgame')
+POSITIONS_PER_PHASE = 200
+BELIEF_SET_SIZES = (100, 1000, 10000)
+SEED = 2025
+
+
+def opening_positions(count, seed=SEED):
+    """Positions 4 to 16 plies into random playouts."""
+    return [fen for fen in random_positions(count * 3, seed=seed, max_plies=16)
+            if chess.Board(fen).ply() >= 4][:count]
+
+
+def middlegame_positions(count, seed=SEED):
+    """Positions past move 10 of random playouts with at least 20 pieces left."""
+    fens = []
+    for fen in random_positions(count * 20, seed=seed, max_plies=60):
+        board = chess.Board(fen)
+        if board.fullmove_number > 10 and chess.popcount(board.occupied) >= 20:
+            fens.append(fen)
+        if len(fens) == count:
+            break
+    return fens
+
+
+def endgame_positions(count, seed=SEED):
+    """Valid positions with both kings and two to six other pieces placed at random."""
+    rng = random.Random(seed)
+    fens = []
+    while len(fens) < count:
+        board = chess.Board(None)
+        squares = rng.sample(chess.SQUARES, 8)
+        board.set_piece_at(squares[0], chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(squares[1], chess.Piece(chess.KING, chess.BLACK))
+        for square in squares[2:2 + rng.randint(2, 6)]:
+            board.set_piece_at(square, chess.Piece(rng.choice(chess.PIECE_TYPES[:-1]), rng.choice(chess.COLORS)))
+        board.turn = rng.choice(chess.COLORS)
+        board.fullmove_number = rng.randint(40, 80)
+        if board.is_valid():
+            fens.append(board.fen())
+    return fens
+
+
+def belief_set(size, seed=SEED):
+    """
+    A belief set like the ones RandomSensing tracks: the positions a
+    middlegame can be in after several unseen opponent moves, with our
+    moves passed, sampled down to `size` beliefs, our side to move.
+    """
+    rng = np.random.default_rng(seed)
+    store = BeliefStore.from_fens(middlegame_positions(1, seed=seed))
+    while True:
+        children = expand_beliefs(store)
+        if len(children) >= size:
+            return children.select(np.sort(rng.choice(len(children), size=size, replace=False)))
+        store = children.push(None)
+
+
+def corpus_path(name):
+    return os.path.join(CORPUS_DIR, name + BELIEF_FILE_SUFFIX)
+
+
+def load(name) -> BeliefStore:
+    """A corpus file by name: a phase, or 'beliefs_<size>'."""
+    return read_beliefs(corpus_path(name))
+
+
+def build():
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    generators = {'opening': opening_positions, 'middlegame': middlegame_positions, 'endgame': endgame_positions}
+    for phase in PHASES:
+        write_beliefs(corpus_path(phase), BeliefStore.from_fens(generators[phase](POSITIONS_PER_PHASE)))
+    for size in BELIEF_SET_SIZES:
+        write_beliefs(corpus_path('beliefs_{}'.format(size)), belief_set(size))
+
+
+if __name__ == '__main__':
+    build()
+    for name in PHASES + tuple('beliefs_{}'.format(size) for size in BELIEF_SET_SIZES):
+        print('{}: {} positions'.format(corpus_path(name), len(load(name))))
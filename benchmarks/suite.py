@@ -0,0 +1,289 @@
+"""
+Benchmark suite for the belief-tracking primitives and full agent turns,
+run on the checked-in corpus (see benchmarks.corpus).
+
+Micro-benchmarks report the throughput of each primitive, the best of
+several repetitions. Macro-benchmarks play fixed-seed games of
+RandomSensing and ImprovedAgent against the random bot and report
+percentiles of the time spent on each of the agent's turns, from the
+opponent move result to the move result. Games use the built-in
+evaluator unless --engine stockfish is given, and an in-memory
+evaluation cache, so that runs on different machines compare.
+
+Results can be saved as JSON and compared against an earlier run: a
+metric that got worse by more than --threshold is a regression, and the
+exit status is 1.
+
+Run from the repository root:
+    python -m benchmarks.suite [--quick] [--only micro|macro] [--output results.json]
+                               [--baseline baseline.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+import chess
+import numpy as np
+from belief_expansion import expand_beliefs
+from belief_filters import filter_fens_by_window, filter_by_sense
+from engine_pool import ENGINE_ENV_VAR
+from eval_cache import EVAL_CACHE_ENV_VAR
+from king_capture import king_capture_counts, best_king_capture
+import part_four_sub_two
+from part_four_sub_one import RandomSensing
+from part_four_sub_two import ImprovedAgent
+from random_bot import MyAgent
+from reconchess import play_local_game
+from benchmarks.corpus import load, PHASES, BELIEF_SET_SIZES
+
+RESULTS_VERSION = 1
+# fraction by which a metric may get worse before it counts as a regression
+DEFAULT_THRESHOLD = 0.2
+REPEATS = 5
+QUICK_REPEATS = 2
+# each repetition calls a primitive until this much time has passed, so that fast ones are not timer noise
+MIN_REPEAT_SECONDS = 0.2
+GAMES = 4
+QUICK_GAMES = 2
+SECONDS_PER_PLAYER = 120
+TURN_PERCENTILES = (50, 90, 99)
+# the sense window of the filtering benchmarks, the 3x3 square around it
+SENSE_SQUARE = chess.E5
+
+
+def best_time(function, repeats, min_seconds=MIN_REPEAT_SECONDS):
+    """Seconds per call of `function`, the best of `repeats` repetitions of enough calls to last `min_seconds`."""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+        calls = max(calls * 2, int(calls * min_seconds / max(elapsed, 1e-9)))
+    best = elapsed / calls
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def sense_result_of(board:chess.Board, square=SENSE_SQUARE):
+    """The sense result a 3x3 window centred on `square` gives on `board`."""
+    rank, file = chess.square_rank(square), chess.square_file(square)
+    return [(chess.square(f, r), board.piece_at(chess.square(f, r)))
+            for r in range(rank - 1, rank + 2) for f in range(file - 1, file + 2)]
+
+
+def window_string(sense_result):
+    """parse_window() form of a sense result, '?' for an empty square."""
+    return ';'.join('{}:{}'.format(chess.square_name(square), piece.symbol() if piece else '?')
+                    for square, piece in sense_result)
+
+
+def capture_cases(boards):
+    """(board, capture square) for each board where the side to move can capture, on the first target."""
+    cases = []
+    for board in boards:
+        targets = [square for square in chess.scan_forward(board.occupied_co[not board.turn])
+                   if board.attackers(board.turn, square)]
+        if targets:
+            cases.append((board, targets[0]))
+    return cases
+
+
+def micro_benchmarks():
+    """(metric name, unit, function, items processed per call) for every primitive on every corpus file."""
+    cases = []
+    for phase in PHASES:
+        boards = list(load(phase).boards())
+        cases.append(('generate_next_fens/' + phase, 'positions/s',
+                      lambda boards=boards: [part_four_sub_two.generate_next_fens(board) for board in boards],
+                      len(boards)))
+        cases.append(('generate_all_possible_moves/' + phase, 'positions/s',
+                      lambda boards=boards: [part_four_sub_two.generate_all_possible_moves(board) for board in boards],
+                      len(boards)))
+        captures = capture_cases(boards)
+        cases.append(('generate_capture_resulting_fens/' + phase, 'positions/s',
+                      lambda captures=captures: [part_four_sub_two.generate_capture_resulting_fens(
+                          board, chess.SQUARE_NAMES[square]) for board, square in captures],
+                      len(captures)))
+
+    for size in BELIEF_SET_SIZES:
+        store = load('beliefs_{}'.format(size))
+        boards = list(store.boards())
+        fens = [board.fen() for board in boards]
+        sense_result = sense_result_of(boards[0])
+        window = window_string(sense_result)
+        move_actions = [list(board.pseudo_legal_moves) for board in boards]
+        suffix = '/{}'.format(size)
+        cases += [
+            ('expand_beliefs' + suffix, 'beliefs/s', lambda store=store: expand_beliefs(store), size),
+            ('filter_fens_by_window' + suffix, 'beliefs/s',
+             lambda fens=fens, window=window: filter_fens_by_window(fens, window), size),
+            ('filter_by_sense' + suffix, 'beliefs/s',
+             lambda store=store, sense_result=sense_result: filter_by_sense(store, sense_result), size),
+            ('get_king_capture_move' + suffix, 'beliefs/s',
+             lambda boards=boards, move_actions=move_actions: [
+                 part_four_sub_two.get_king_capture_move(board, moves, board.turn)
+                 for board, moves in zip(boards, move_actions)], size),
+            ('king_capture_counts' + suffix, 'beliefs/s',
+             lambda store=store: best_king_capture(king_capture_counts(store)), size),
+        ]
+    return cases
+
+
+def run_micro(repeats, log=print):
+    metrics = {}
+    for name, unit, function, items in micro_benchmarks():
+        if not items:
+            continue
+        value = items / best_time(function, repeats)
+        metrics['micro/' + name] = {'value': value, 'unit': unit, 'better': 'higher'}
+        log('{:<50} {:>14.1f} {}'.format(name, value, unit))
+    return metrics
+
+
+class TurnTimer:
+    """
+    Wraps the turn callbacks of an agent and records, for every turn, the
+    total time spent in them from the opponent move result to the move result.
+    """
+
+    CALLBACKS = ('handle_opponent_move_result', 'choose_sense', 'handle_sense_result', 'choose_move',
+                 'handle_move_result')
+
+    def __init__(self, agent):
+        self.turns = []
+        self.current = 0.0
+        for name in self.CALLBACKS:
+            setattr(agent, name, self._timed(getattr(agent, name), name == 'handle_move_result'))
+
+    def _timed(self, callback, ends_turn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = callback(*args, **kwargs)
+            self.current += time.perf_counter() - start
+            if ends_turn:
+                self.turns.append(self.current)
+                self.current = 0.0
+            return result
+        return timed
+
+
+AGENTS = {'RandomSensing': RandomSensing, 'ImprovedAgent': ImprovedAgent}
+
+
+def turn_latencies(agent_class, games, seconds_per_player=SECONDS_PER_PLAYER, seed=0):
+    """Seconds spent on each of the agent's turns over `games` fixed-seed games, alternating colors."""
+    turns = []
+    for game in range(games):
+        random.seed(seed + game)
+        np.random.seed(seed + game)
+        agent = agent_class()
+        timer = TurnTimer(agent)
+        if game % 2 == 0:
+            play_local_game(agent, MyAgent(), seconds_per_player=seconds_per_player)
+        else:
+            play_local_game(MyAgent(), agent, seconds_per_player=seconds_per_player)
+        turns += timer.turns
+    return turns
+
+
+def run_macro(games, log=print):
+    metrics = {}
+    for name, agent_class in AGENTS.items():
+        turns = np.array(turn_latencies(agent_class, games))
+        summary = {'p{}'.format(p): float(np.percentile(turns, p)) for p in TURN_PERCENTILES}
+        summary['mean'] = float(turns.mean())
+        summary['max'] = float(turns.max())
+        for statistic, value in summary.items():
+            metrics['macro/{}/turn_{}'.format(name, statistic)] = {'value': value, 'unit': 's', 'better': 'lower'}
+        log('{:<50} {} over {} turns'.format(
+            name, ' '.join('{}={:.4f}s'.format(statistic, value) for statistic, value in summary.items()), len(turns)))
+    return metrics
+
+
+def environment():
+    import reconchess
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'chess': chess.__version__,
+        'reconchess': getattr(reconchess, '__version__', None),
+        'engine': os.environ.get(ENGINE_ENV_VAR, 'stockfish'),
+    }
+
+
+def compare(metrics, baseline, threshold=DEFAULT_THRESHOLD, log=print):
+    """Names of the metrics more than `threshold` worse than in `baseline`, logging every change."""
+    regressions = []
+    for name, metric in sorted(metrics.items()):
+        base = baseline.get(name)
+        if base is None or not base['value']:
+            continue
+        change = metric['value'] / base['value'] - 1
+        worse = -change if metric['better'] == 'higher' else change
+        regressed = worse > threshold
+        if regressed:
+            regressions.append(name)
+        log('{:<60} {:>+8.1%}{}'.format(name, change, '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Belief-tracking benchmark suite.')
+    parser.add_argument('--only', choices=('micro', 'macro'), help='run one half of the suite')
+    parser.add_argument('--quick', action='store_true', help='fewer repetitions and games')
+    parser.add_argument('--games', type=int, help='games per agent in the macro-benchmarks')
+    parser.add_argument('--engine', choices=('builtin', 'stockfish'), default='builtin',
+                        help='evaluator the agents use in the macro-benchmarks')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fraction a metric may get worse before it is a regression')
+    args = parser.parse_args(argv)
+
+    if args.engine == 'builtin':
+        os.environ[ENGINE_ENV_VAR] = 'builtin'
+    # cached moves from earlier runs would make turns look faster than they are
+    os.environ.setdefault(EVAL_CACHE_ENV_VAR, '')
+
+    metrics = {}
+    if args.only != 'macro':
+        metrics.update(run_micro(QUICK_REPEATS if args.quick else REPEATS))
+    if args.only != 'micro':
+        metrics.update(run_macro(args.games or (QUICK_GAMES if args.quick else GAMES)))
+
+    results = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': environment(),
+        'metrics': metrics,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('version') != RESULTS_VERSION:
+            print('Warning: baseline has results version {}, expected {}'.format(baseline.get('version'), RESULTS_VERSION))
+        regressions = compare(metrics, baseline['metrics'], args.threshold)
+        if regressions:
+            print('{} regression(s) beyond {:.0%}'.format(len(regressions), args.threshold))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import atexit
+import os
+import queue
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+import chess.engine
+from eval_cache import get_eval_cache, lookup
+from engine_supervisor import SupervisedEngine
+from fallback_evaluator import FallbackEvaluator, is_fallback
+
+STOCKFISH_ENV_VAR = 'STOCKFISH_EXECUTABLE'
+# number of Stockfish processes kept warm per executable
+ENGINE_POOL_SIZE_ENV_VAR = 'RBC_ENGINE_POOL_SIZE'
+# "builtin" to play with the in-process evaluator even where Stockfish is installed
+ENGINE_ENV_VAR = 'RBC_ENGINE'
+
+
+def get_stockfish_path():
+    """Stockfish executable from STOCKFISH_EXECUTABLE, or the default install location."""
+    if STOCKFISH_ENV_VAR in os.environ:
+        return os.environ[STOCKFISH_ENV_VAR]
+    if os.name == 'nt':  # Windows
+        return './stockfish.exe'
+    return '/opt/stockfish/stockfish'
+
+
+_builtin = FallbackEvaluator()
+_builtin_warned = set()
+
+
+def use_builtin_engine(path):
+    """
+    True when the in-process FallbackEvaluator should stand in for the
+    Stockfish executable at `path`: when asked to with RBC_ENGINE=builtin,
+    or when there is no such executable.
+    """
+    if os.environ.get(ENGINE_ENV_VAR) == 'builtin':
+        return True
+    if os.path.exists(path) or shutil.which(path):
+        return False
+    if path not in _builtin_warned:
+        _builtin_warned.add(path)
+        print('Warning: no Stockfish executable at "{}", playing with the built-in evaluator'.format(path),
+              file=sys.stderr)
+    return True
+
+
+def get_builtin_engine() -> FallbackEvaluator:
+    """The process-wide built-in evaluator."""
+    return _builtin
+
+
+class EnginePool:
+    """
+    A fixed number of Stockfish processes started once and handed out with
+    checkout()/checkin() or the lease() context manager. Each one is a
+    SupervisedEngine, which restarts itself in the background after a crash
+    or a hang and answers from a fallback evaluator meanwhile. A checked-out
+    engine is pinged first, and replaced by a fresh process if it does not
+    answer. play() and analyse() lease an engine for one call. With a
+    `cache` (see eval_cache), play() answers repeated searches without
+    asking an engine.
+    """
+
+    def __init__(self, path, size=1, options=None, cache=None):
+        self.path = path
+        self.size = size
+        self.options = options or {}
+        self.cache = cache
+        self.idle = queue.LifoQueue()
+        self.engines = []
+        self.lock = threading.Lock()
+        self.closed = False
+        for _ in range(size):
+            self.idle.put(self._start())
+
+    def _start(self):
+        engine = SupervisedEngine(self.path, self.options)
+        with self.lock:
+            self.engines.append(engine)
+        return engine
+
+    def _discard(self, engine):
+        with self.lock:
+            if engine in self.engines:
+                self.engines.remove(engine)
+        try:
+            engine.close()
+        except Exception:
+            pass
+
+    def restart(self, engine):
+        """Replaces a dead or misbehaving engine with a fresh process."""
+        self._discard(engine)
+        return self._start()
+
+    def checkout(self, timeout=None):
+        """Takes an idle engine, waiting up to `timeout` seconds for one to be returned."""
+        if self.closed:
+            raise RuntimeError('Engine pool is closed')
+        engine = self.idle.get(timeout=timeout)
+        if not engine.ping():
+            engine = self.restart(engine)
+        return engine
+
+    def checkin(self, engine):
+        """Hands an engine back. Engines returned after close() are shut down."""
+        if self.closed:
+            self._discard(engine)
+        else:
+            self.idle.put(engine)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        engine = self.checkout(timeout)
+        try:
+            yield engine
+        except chess.engine.EngineTerminatedError:
+            engine = self.restart(engine)
+            raise
+        finally:
+            self.checkin(engine)
+
+    def run(self, task, retries=1):
+        """Calls task(engine) on a leased engine, on a fresh process again if the engine died."""
+        for attempt in range(retries + 1):
+            try:
+                with self.lease() as engine:
+                    return task(engine)
+            except chess.engine.EngineTerminatedError:
+                if attempt == retries:
+                    raise
+
+    def play(self, board, limit, **kwargs):
+        key, cached = lookup(self.cache, board, limit, self.path, **kwargs)
+        if cached is not None:
+            return cached
+        result = self.run(lambda engine: engine.play(board, limit, **kwargs))
+        if key is not None and not is_fallback(result):
+            self.cache.put(key, result.move)
+        return result
+
+    def analyse(self, board, limit, **kwargs):
+        return self.run(lambda engine: engine.analyse(board, limit, **kwargs))
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            engines, self.engines = self.engines, []
+        for engine in engines:
+            try:
+                engine.quit()
+            except (chess.engine.EngineTerminatedError, chess.engine.EngineError):
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_engine_pool(path=None, size=None) -> EnginePool:
+    """
+    The process-wide pool for a Stockfish executable, started on first use
+    and shared by every bot and tool in the process until it exits. Without
+    the executable, the built-in evaluator is returned instead.
+    """
+    if path is None:
+        path = get_stockfish_path()
+    if use_builtin_engine(path):
+        return get_builtin_engine()
+    if size is None:
+        size = int(os.environ.get(ENGINE_POOL_SIZE_ENV_VAR, 1))
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None or pool.closed:
+            pool = _pools[path] = EnginePool(path, size, cache=get_eval_cache())
+        return pool
+
+
+def close_engine_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# Each engine runs its event loop on a non-daemon thread, and the interpreter
+# joins those before atexit handlers run, so the pools are closed at that point
+getattr(threading, '_register_atexit', atexit.register)(close_engine_pools)
@@ -0,0 +1,136 @@
+import sys
+import threading
+import time
+import chess.engine
+from fallback_evaluator import FallbackEvaluator
+
+# seconds a search may run past its time limit before the engine is considered hung
+WATCHDOG_GRACE = 2.0
+# first and longest wait between attempts to start a replacement engine
+RESTART_DELAY = 0.1
+MAX_RESTART_DELAY = 5.0
+
+# what a failed engine call raises: the process died, it answered nonsense, or the watchdog fired
+ENGINE_FAILURES = (chess.engine.EngineTerminatedError, chess.engine.EngineError, TimeoutError)
+
+
+class SupervisedEngine:
+    """
+    A Stockfish process behind a watchdog, with the play(), analyse() and
+    configure() calls of SimpleEngine. A call that fails, or a search that
+    runs `grace` seconds past its time limit, takes the engine out of
+    service: it is restarted on a background thread with every option given
+    to configure() replayed, and calls are answered by `fallback` until it
+    is back, so a crash never stalls a turn.
+    """
+
+    def __init__(self, path, options=None, fallback=None, grace=WATCHDOG_GRACE):
+        self.path = path
+        self.options = dict(options or {})
+        self.fallback = fallback if fallback is not None else FallbackEvaluator()
+        self.grace = grace
+        self.lock = threading.Lock()
+        self.closed = False
+        self.restarts = 0
+        self.restarter = None
+        # the first start is not supervised: a missing executable should fail loudly
+        self.engine = self._open()
+
+    def _open(self):
+        engine = chess.engine.SimpleEngine.popen_uci(self.path, timeout=self.grace, setpgrp=True)
+        if self.options:
+            engine.configure(self.options)
+        return engine
+
+    @property
+    def alive(self):
+        return self.engine is not None
+
+    def _restart(self, engine):
+        try:
+            engine.close()
+        except Exception:
+            pass
+        delay = RESTART_DELAY
+        while not self.closed:
+            try:
+                fresh = self._open()
+            except Exception as e:
+                print('Warning: restarting engine "{}" failed ({}), retrying in {:.1f}s'.format(self.path, e, delay),
+                      file=sys.stderr)
+                time.sleep(delay)
+                delay = min(2 * delay, MAX_RESTART_DELAY)
+                continue
+            with self.lock:
+                if not self.closed:
+                    self.engine = fresh
+                    self.restarts += 1
+                    return
+            fresh.quit()
+
+    def take_down(self, engine):
+        """Takes a failed engine out of service and starts its replacement in the background."""
+        with self.lock:
+            if self.engine is not engine or self.closed:
+                return
+            self.engine = None
+            self.restarter = threading.Thread(target=self._restart, args=(engine,), name='engine-restart', daemon=True)
+            self.restarter.start()
+
+    def _call(self, method, board, limit, **kwargs):
+        engine = self.engine
+        if engine is not None:
+            try:
+                return getattr(engine, method)(board, limit, **kwargs)
+            except ENGINE_FAILURES as e:
+                print('Warning: engine "{}" failed ({}), restarting it and using the fallback evaluator'.format(
+                    self.path, type(e).__name__), file=sys.stderr)
+                self.take_down(engine)
+        return getattr(self.fallback, method)(board, limit, **kwargs)
+
+    def play(self, board, limit, **kwargs):
+        return self._call('play', board, limit, **kwargs)
+
+    def analyse(self, board, limit, **kwargs):
+        return self._call('analyse', board, limit, **kwargs)
+
+    def configure(self, options):
+        """Sets UCI options now and on every engine started later."""
+        self.options.update(options)
+        engine = self.engine
+        if engine is not None:
+            try:
+                engine.configure(options)
+            except ENGINE_FAILURES:
+                self.take_down(engine)
+
+    def ping(self):
+        """True if the engine answers. One that does not is taken down, and False returned instead of raising."""
+        engine = self.engine
+        if engine is None:
+            return False
+        try:
+            engine.ping()
+        except ENGINE_FAILURES:
+            self.take_down(engine)
+            return False
+        return True
+
+    def wait_alive(self, timeout=None):
+        """Waits for a restart in progress. True if the engine is up."""
+        restarter = self.restarter
+        if restarter is not None:
+            restarter.join(timeout)
+        return self.alive
+
+    def quit(self):
+        with self.lock:
+            self.closed = True
+            engine, self.engine = self.engine, None
+        if engine is not None:
+            try:
+                engine.quit()
+            except ENGINE_FAILURES:
+                pass
+
+    close = quit
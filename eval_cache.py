@@ -0,0 +1,222 @@
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+import chess
+import chess.engine
+from belief_store import canonical_fen
+
+# SQLite file holding cached engine moves, empty to keep the cache in memory only
+EVAL_CACHE_ENV_VAR = 'RBC_EVAL_CACHE'
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.rbc_eval_cache.sqlite')
+
+
+def limit_key(limit):
+    """Part of the cache key for a search limit, None for clock-based limits that should not be cached."""
+    if limit.white_clock is not None or limit.black_clock is not None or limit.remaining_moves is not None:
+        return None
+    return '{}/{}/{}/{}'.format(limit.time, limit.depth, limit.nodes, limit.mate)
+
+
+def position_key(board:chess.Board, limit, root_moves=None, namespace=''):
+    """
+    Cache key of a search: engine namespace, canonical position (so clocks
+    and irrelevant en passant squares do not split entries), search limit
+    and root-move restriction.
+    """
+    limit_part = limit_key(limit)
+    if limit_part is None:
+        return None
+    moves = ','.join(sorted(move.uci() for move in root_moves)) if root_moves else '*'
+    return '|'.join((namespace, canonical_fen(board), limit_part, moves))
+
+
+def lookup(cache, board:chess.Board, limit, namespace='', **kwargs):
+    """
+    (key, cached PlayResult or None) for an engine.play() call. Searches
+    with options other than root_moves, or without a cache, get no key.
+    """
+    if cache is None or set(kwargs) - {'root_moves'}:
+        return None, None
+    key = position_key(board, limit, kwargs.get('root_moves'), namespace)
+    move = cache.get(key)
+    return key, None if move is None else chess.engine.PlayResult(move, None)
+
+
+def analysis_key(board:chess.Board, limit, multipv, root_moves=None, namespace=''):
+    """Cache key of a MultiPV analysis, a position_key() that also holds the number of lines."""
+    key = position_key(board, limit, root_moves, namespace)
+    return None if key is None else '{}|multipv={}'.format(key, multipv)
+
+
+def lookup_analysis(cache, board:chess.Board, limit, multipv, namespace='', **kwargs):
+    """
+    (key, cached list of InfoDicts or None) for an analyse(multipv=...)
+    call, same as lookup() for play().
+    """
+    if cache is None or set(kwargs) - {'root_moves'}:
+        return None, None
+    key = analysis_key(board, limit, multipv, kwargs.get('root_moves'), namespace)
+    return key, cache.get_analysis(key)
+
+
+def encode_analysis(infos):
+    """
+    Text form of the first move and score of each line of an analysis,
+    scores from White's side: "e2e4 cp 35;d2d4 mate -3". None if a line
+    has no move or no score.
+    """
+    lines = []
+    for info in infos:
+        pv, score = info.get('pv'), info.get('score')
+        if not pv or score is None:
+            return None
+        score = score.white()
+        if not score.is_mate():
+            value = 'cp {}'.format(score.score())
+        elif score.mate():
+            value = 'mate {}'.format(score.mate())
+        else:
+            # mate on the board, which mate() gives as 0 whichever side is mated
+            value = 'mate {}0'.format('+' if score == chess.engine.MateGiven else '-')
+        lines.append('{} {}'.format(pv[0].uci(), value))
+    return ';'.join(lines) if lines else None
+
+
+def decode_analysis(text):
+    """The InfoDicts of an encode_analysis() string, each with its pv move, score and multipv rank."""
+    infos = []
+    for rank, line in enumerate(text.split(';'), 1):
+        move, kind, value = line.split()
+        if kind == 'cp':
+            score = chess.engine.Cp(int(value))
+        elif int(value):
+            score = chess.engine.Mate(int(value))
+        else:
+            score = chess.engine.MateGiven if value == '+0' else -chess.engine.MateGiven
+        infos.append({'pv': [chess.Move.from_uci(move)], 'score': chess.engine.PovScore(score, chess.WHITE),
+                      'multipv': rank})
+    return infos
+
+
+class EvalCache:
+    """
+    Best moves found by engine searches, and the lines of MultiPV analyses,
+    in an in-memory LRU backed by optional SQLite tables shared across
+    games and processes. Hits and misses of both tiers are counted in
+    stats().
+    """
+
+    def __init__(self, path=None, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS evals (key TEXT PRIMARY KEY, move TEXT NOT NULL)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS analyses (key TEXT PRIMARY KEY, lines TEXT NOT NULL)')
+            self.db.commit()
+
+    def _remember(self, key, move):
+        self.memory[key] = move
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _get(self, key, query):
+        if key is None:
+            return None
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            if self.db is not None:
+                row = self.db.execute(query, (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def _put(self, key, value, query):
+        with self.lock:
+            self._remember(key, value)
+            if self.db is not None:
+                self.db.execute(query, (key, value))
+                self.db.commit()
+
+    def get(self, key):
+        """Cached move for a position_key(), or None."""
+        move = self._get(key, 'SELECT move FROM evals WHERE key = ?')
+        return None if move is None else chess.Move.from_uci(move)
+
+    def put(self, key, move):
+        if key is None or move is None:
+            return
+        self._put(key, move.uci(), 'INSERT OR REPLACE INTO evals (key, move) VALUES (?, ?)')
+
+    def get_analysis(self, key):
+        """Cached lines, as InfoDicts, for an analysis_key(), or None."""
+        lines = self._get(key, 'SELECT lines FROM analyses WHERE key = ?')
+        return None if lines is None else decode_analysis(lines)
+
+    def put_analysis(self, key, infos):
+        lines = None if key is None or not infos else encode_analysis(infos)
+        if lines is None:
+            return
+        self._put(key, lines, 'INSERT OR REPLACE INTO analyses (key, lines) VALUES (?, ?)')
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'lookups': lookups,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory),
+        }
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_eval_cache() -> EvalCache:
+    """The process-wide cache, stored at RBC_EVAL_CACHE (default ~/.rbc_eval_cache.sqlite)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.environ.get(EVAL_CACHE_ENV_VAR, DEFAULT_CACHE_PATH)
+            try:
+                _cache = EvalCache(path)
+            except sqlite3.Error as e:
+                print('Warning: cannot open evaluation cache at "{}" ({}), caching in memory only'.format(path, e),
+                      file=sys.stderr)
+                _cache = EvalCache(None)
+        return _cache
+
+
+@atexit.register
+def close_eval_cache():
+    if _cache is not None:
+        _cache.close()
@@ -0,0 +1,157 @@
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from belief_store import BeliefStore, BELIEF_DTYPE
+from belief_expansion import expand_beliefs
+
+KEY_DTYPE = np.dtype(np.uint64)
+WEIGHT_DTYPE = np.dtype(np.float64)
+PARENT_DTYPE = np.dtype(np.int64)
+
+# Workers are not forked: by the time a bot starts its pool it has engine and pondering threads
+# running, and a forked copy of a lock one of them held would never be released
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _block_layout(count):
+    """Byte offsets of the keys, weights and parents sections, and the size, of a block holding `count` rows."""
+    keys_offset = count * BELIEF_DTYPE.itemsize
+    weights_offset = keys_offset + count * KEY_DTYPE.itemsize
+    parents_offset = weights_offset + count * WEIGHT_DTYPE.itemsize
+    return keys_offset, weights_offset, parents_offset, parents_offset + count * PARENT_DTYPE.itemsize
+
+
+def _expand_shard(input_name, total, start, stop, weighted, capture_square):
+    """
+    Worker side: expands records [start, stop) of the shared input block and
+    writes the children (records, Zobrist keys, weights, parent indices)
+    into a new shared block. Returns (block name, number of children).
+    """
+    _, weights_offset, _, _ = _block_layout(total)
+    block = SharedMemory(name=input_name)
+    try:
+        shard = np.ndarray((total,), dtype=BELIEF_DTYPE, buffer=block.buf)[start:stop].copy()
+        weights = None
+        if weighted:
+            weights = np.ndarray((total,), dtype=WEIGHT_DTYPE, buffer=block.buf,
+                                 offset=weights_offset)[start:stop].copy()
+    finally:
+        block.close()
+
+    children, keys, parents = expand_beliefs(BeliefStore(shard, weights), return_keys=True,
+                                             capture_square=capture_square, return_parents=True)
+    count = len(children)
+    if count == 0:
+        return None, 0
+
+    keys_offset, weights_offset, parents_offset, size = _block_layout(count)
+    out = SharedMemory(create=True, size=size)
+    np.ndarray((count,), dtype=BELIEF_DTYPE, buffer=out.buf)[:] = children.records
+    np.ndarray((count,), dtype=KEY_DTYPE, buffer=out.buf, offset=keys_offset)[:] = keys
+    np.ndarray((count,), dtype=WEIGHT_DTYPE, buffer=out.buf, offset=weights_offset)[:] = children.weight_array()
+    np.ndarray((count,), dtype=PARENT_DTYPE, buffer=out.buf, offset=parents_offset)[:] = parents + start
+    name = out.name
+    out.close()
+    return name, count
+
+
+def _collect_shard(name, count):
+    """Parent side: copies a worker's output block out and frees it."""
+    keys_offset, weights_offset, parents_offset, _ = _block_layout(count)
+    block = SharedMemory(name=name)
+    try:
+        records = np.ndarray((count,), dtype=BELIEF_DTYPE, buffer=block.buf).copy()
+        keys = np.ndarray((count,), dtype=KEY_DTYPE, buffer=block.buf, offset=keys_offset).copy()
+        weights = np.ndarray((count,), dtype=WEIGHT_DTYPE, buffer=block.buf, offset=weights_offset).copy()
+        parents = np.ndarray((count,), dtype=PARENT_DTYPE, buffer=block.buf, offset=parents_offset).copy()
+    finally:
+        block.close()
+        block.unlink()
+    return records, keys, weights, parents
+
+
+class ExpansionPool:
+    """
+    A pool of worker processes, started once per game, that expands a belief
+    set in parallel. Parent records are shared with the workers through one
+    shared memory block. Each worker returns its children in its own block,
+    and the shards are merged with a global Zobrist-key dedup.
+    """
+
+    def __init__(self, workers, min_parallel=2000, shards_per_worker=4, start_method=START_METHOD):
+        self.workers = workers
+        self.min_parallel = min_parallel
+        self.shards_per_worker = shards_per_worker
+
+        # start the tracker before the workers so that every worker shares it
+        resource_tracker.ensure_running()
+        context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            # the workers only need this module, not everything the bot's __main__ imports
+            context.set_forkserver_preload([__name__])
+        self.pool = context.Pool(processes=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def expand(self, store:BeliefStore, return_keys=False, capture_square=None, return_parents=False):
+        """Same result as belief_expansion.expand_beliefs(), computed across the pool."""
+        total = len(store)
+        if total < self.min_parallel or self.pool is None:
+            return expand_beliefs(store, return_keys=return_keys, capture_square=capture_square,
+                                  return_parents=return_parents)
+
+        weighted = store.weights is not None
+        _, weights_offset, _, size = _block_layout(total)
+        block = SharedMemory(create=True, size=size)
+        try:
+            np.ndarray((total,), dtype=BELIEF_DTYPE, buffer=block.buf)[:] = store.records
+            if weighted:
+                np.ndarray((total,), dtype=WEIGHT_DTYPE, buffer=block.buf, offset=weights_offset)[:] = store.weights
+
+            num_shards = min(total, self.workers * self.shards_per_worker)
+            bounds = np.linspace(0, total, num_shards + 1, dtype=int)
+            tasks = [(block.name, total, int(start), int(stop), weighted, capture_square)
+                     for start, stop in zip(bounds[:-1], bounds[1:])]
+            results = self.pool.starmap(_expand_shard, tasks)
+        finally:
+            block.close()
+            block.unlink()
+
+        shards = [_collect_shard(name, count) for name, count in results if count]
+        if shards:
+            records = np.concatenate([records for records, _, _, _ in shards])
+            keys = np.concatenate([keys for _, keys, _, _ in shards])
+            parents = np.concatenate([parents for _, _, _, parents in shards])
+            weights = np.concatenate([weights for _, _, weights, _ in shards]) if weighted else None
+
+        if shards and return_parents:
+            # children are only merged per parent, and each parent is in exactly one shard
+            children = BeliefStore(records, weights)
+        elif shards:
+            # a child reachable from beliefs in two shards shows up once per shard
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            order = np.argsort(first)
+            if weighted:
+                weights = np.bincount(inverse.ravel(), weights=weights, minlength=len(first))[order]
+            kept = first[order]
+            children, keys, parents = BeliefStore(records[kept], weights), keys[kept], parents[kept]
+        else:
+            children, keys, parents = BeliefStore(), np.zeros(0, dtype=KEY_DTYPE), np.zeros(0, dtype=PARENT_DTYPE)
+
+        result = (children,)
+        if return_keys:
+            result += (keys,)
+        if return_parents:
+            result += (parents,)
+        return result if len(result) > 1 else children
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
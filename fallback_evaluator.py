@@ -0,0 +1,237 @@
+from collections import Counter
+import chess
+import chess.engine
+import numpy as np
+from belief_store import BeliefStore, piece_index
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 20000,
+}
+
+# Piece-square bonuses from White's side, rank 8 first as the board is printed
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20],
+    chess.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20],
+}
+
+
+def _square_values():
+    """(12, 64) value of each piece on each square for White, in belief-store column order."""
+    values = np.zeros((12, 64), dtype=np.int64)
+    for piece_type, table in PIECE_SQUARE_TABLES.items():
+        for square in chess.SQUARES:
+            file, rank = chess.square_file(square), chess.square_rank(square)
+            values[piece_index(piece_type, chess.WHITE), square] = PIECE_VALUES[piece_type] + table[(7 - rank) * 8 + file]
+            values[piece_index(piece_type, chess.BLACK), square] = -PIECE_VALUES[piece_type] - table[rank * 8 + file]
+    return values
+
+
+SQUARE_VALUES = _square_values()
+_SQUARE_VALUE_LISTS = SQUARE_VALUES.tolist()
+
+# score of a position where the side to move can take the king
+KING_CAPTURE_SCORE = 30000
+# plies of captures followed beyond every candidate move, and nodes spent on each candidate at most
+QUIESCENCE_DEPTH = 6
+QUIESCENCE_NODES = 400
+# beliefs evaluated per NumPy pass, bounding the unpacked (n, 12, 64) bit array
+EVALUATION_CHUNK = 16384
+
+# beliefs drawn per engine search by ranked_sample(), before the static evaluation picks among them
+RANKED_OVERSAMPLE = 4
+
+# key set in the info of every result the fallback evaluator produces, so that callers do not cache them
+FALLBACK_INFO = 'fallback'
+
+
+def is_fallback(result) -> bool:
+    """True for a PlayResult or InfoDict produced by the fallback evaluator rather than an engine."""
+    info = result.info if isinstance(result, chess.engine.PlayResult) else result
+    return bool(info and info.get(FALLBACK_INFO))
+
+
+def evaluate_board(board:chess.Board):
+    """Material and piece-square score of a board, in centipawns for the side to move."""
+    score = 0
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            values = _SQUARE_VALUE_LISTS[piece_index(piece_type, color)]
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                score += values[square]
+    return score if board.turn == chess.WHITE else -score
+
+
+def evaluate_beliefs(store:BeliefStore):
+    """(n,) material and piece-square scores of every belief at once, in centipawns for the side to move."""
+    scores = np.empty(len(store), dtype=np.int64)
+    for start in range(0, len(store), EVALUATION_CHUNK):
+        pieces = store.pieces[start:start + EVALUATION_CHUNK]
+        bits = np.unpackbits(pieces.view(np.uint8).reshape(len(pieces), 12, 8), axis=2, bitorder='little')
+        scores[start:start + len(pieces)] = np.einsum('npq,pq->n', bits, SQUARE_VALUES)
+    white = store.turn == chess.WHITE
+    return np.where(white, scores, -scores)
+
+
+def ranked_sample(store:BeliefStore, k, oversample=RANKED_OVERSAMPLE) -> BeliefStore:
+    """
+    Up to k beliefs to spend engine searches on, with evaluate_beliefs() as
+    a cheap first pass: oversample * k beliefs are drawn as by sample(),
+    ranked by their static score and every oversample-th kept, so the
+    searches cover the whole range of scores rather than a chance cluster.
+    """
+    drawn = store.sample(k * oversample)
+    if len(drawn) <= k:
+        return drawn
+    order = np.argsort(evaluate_beliefs(drawn), kind='stable')
+    return drawn.select(np.sort(order[((np.arange(k) + 0.5) * len(drawn) / k).astype(np.intp)]))
+
+
+class FallbackEvaluator:
+    """
+    In-process evaluator with the calls of the engines it stands in for:
+    play() and analyse() like SimpleEngine, vote() and analyse_many() like
+    AsyncEvaluator. Every candidate move is scored by a short quiescence
+    search, captures only, over material and piece-square tables. It serves
+    moves while an engine restarts, and plays on its own when no Stockfish
+    is installed.
+    """
+
+    size = 1
+
+    def __init__(self, depth=QUIESCENCE_DEPTH, nodes=QUIESCENCE_NODES):
+        self.depth = depth
+        self.nodes = nodes
+
+    def quiesce(self, board:chess.Board, alpha, beta, depth, budget):
+        """Negamax score for the side to move, following captures until the position is quiet."""
+        budget[0] -= 1
+        stand = evaluate_board(board)
+        if stand >= beta or depth == 0 or budget[0] <= 0:
+            return stand
+        alpha = max(alpha, stand)
+
+        captures = []
+        for move in board.generate_pseudo_legal_captures():
+            victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+            if victim == chess.KING:
+                return KING_CAPTURE_SCORE
+            captures.append((-PIECE_VALUES[victim], PIECE_VALUES[board.piece_type_at(move.from_square)], move))
+        # most valuable victim first, then least valuable attacker
+        captures.sort(key=lambda capture: capture[:2])
+
+        for _, _, move in captures:
+            board.push(move)
+            score = -self.quiesce(board, -beta, -alpha, depth - 1, budget)
+            board.pop()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def move_score(self, board:chess.Board, move:chess.Move, nodes=None):
+        """Score of playing `move` on `board`, for the side to move."""
+        if board.piece_type_at(move.to_square) == chess.KING:
+            return KING_CAPTURE_SCORE
+        board.push(move)
+        score = -self.quiesce(board, -KING_CAPTURE_SCORE, KING_CAPTURE_SCORE, self.depth, [nodes or self.nodes])
+        board.pop()
+        return score
+
+    def rank_moves(self, board:chess.Board, root_moves=None, limit=None):
+        """(score, move) pairs for the side to move, best first, ties broken alphabetically."""
+        moves = list(root_moves) if root_moves else list(board.legal_moves) or list(board.pseudo_legal_moves)
+        nodes = None
+        if limit is not None and limit.nodes and moves:
+            nodes = max(1, limit.nodes // len(moves))
+        board = board.copy(stack=False)
+        scored = [(self.move_score(board, move, nodes), move) for move in moves]
+        return sorted(scored, key=lambda item: (-item[0], item[1].uci()))
+
+    def play(self, board:chess.Board, limit=None, root_moves=None, **kwargs) -> chess.engine.PlayResult:
+        ranked = self.rank_moves(board, root_moves, limit)
+        return chess.engine.PlayResult(ranked[0][1] if ranked else None, None, info={FALLBACK_INFO: True})
+
+    def analyse(self, board:chess.Board, limit=None, multipv=None, root_moves=None, **kwargs):
+        infos = [{'score': chess.engine.PovScore(chess.engine.Cp(score), board.turn), 'pv': [move],
+                  'multipv': rank + 1, FALLBACK_INFO: True}
+                 for rank, (score, move) in enumerate(self.rank_moves(board, root_moves, limit)[:multipv or 1])]
+        return infos if multipv is not None else (infos[0] if infos else {FALLBACK_INFO: True})
+
+    def vote(self, boards, limit=None, root_moves=None, deadline=None, decided=None) -> Counter:
+        if root_moves is None:
+            root_moves = [None] * len(boards)
+        counts = Counter()
+        for searched, (board, moves) in enumerate(zip(boards, root_moves), 1):
+            move = self.play(board, limit, root_moves=moves).move
+            if move is not None:
+                counts[move] += 1
+            if decided is not None and decided(counts, len(boards) - searched):
+                break
+        return counts
+
+    def analyse_many(self, boards, limit=None, multipv=1, root_moves=None, deadline=None):
+        if root_moves is None:
+            root_moves = [None] * len(boards)
+        return [self.analyse(board, limit, multipv=multipv, root_moves=moves) for board, moves in zip(boards, root_moves)]
+
+    def close(self):
+        pass
+
+    quit = close
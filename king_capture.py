@@ -0,0 +1,119 @@
+from collections import Counter
+import chess
+import numpy as np
+from belief_store import BeliefStore, piece_index
+
+
+def _table(squares):
+    return np.array([int(bb) for bb in squares], dtype=np.uint64)
+
+
+def _ray(square, file_step, rank_step):
+    bb = 0
+    file, rank = chess.square_file(square) + file_step, chess.square_rank(square) + rank_step
+    while 0 <= file < 8 and 0 <= rank < 8:
+        bb |= chess.BB_SQUARES[chess.square(file, rank)]
+        file, rank = file + file_step, rank + rank_step
+    return bb
+
+
+KNIGHT_ATTACKS = _table(chess.BB_KNIGHT_ATTACKS)
+KING_ATTACKS = _table(chess.BB_KING_ATTACKS)
+# squares a pawn of `color` must stand on to attack a square: those attacked by an opposing pawn from there
+PAWN_ATTACKERS = {color: _table(chess.BB_PAWN_ATTACKS[not color]) for color in chess.COLORS}
+
+# Rays leaving every square, with whether the nearest square along them has the
+# higher index and whether rooks (True) or bishops (False) move that way
+RAYS = [(_table(_ray(square, df, dr) for square in chess.SQUARES), dr * 8 + df > 0, df == 0 or dr == 0)
+        for df, dr in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1))]
+
+
+def lowest_bit(bbs):
+    return bbs & (~bbs + np.uint64(1))
+
+
+def highest_bit(bbs):
+    bbs = bbs.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        bbs |= bbs >> np.uint64(shift)
+    return bbs & ~(bbs >> np.uint64(1))
+
+
+def bit_square(bbs):
+    """Square of the single bit of each bitboard (exact: powers of two convert to float without rounding)."""
+    return np.frexp(bbs.astype(np.float64))[1] - 1
+
+
+def king_attackers(store:BeliefStore, color):
+    """
+    (n,) bitboards of the pieces of `color` attacking the opposing king in
+    each belief, and the (n,) king squares (-1 where there is no king).
+    """
+    pieces = store.pieces
+    king = lowest_bit(pieces[:, piece_index(chess.KING, not color)])
+    square = np.where(king != 0, bit_square(king), 0)
+    occupied = np.bitwise_or.reduce(pieces, axis=1)
+
+    def ours(piece_type):
+        return pieces[:, piece_index(piece_type, color)]
+
+    attackers = ours(chess.PAWN) & PAWN_ATTACKERS[color][square]
+    attackers |= ours(chess.KNIGHT) & KNIGHT_ATTACKS[square]
+    attackers |= ours(chess.KING) & KING_ATTACKS[square]
+    rooks = ours(chess.ROOK) | ours(chess.QUEEN)
+    bishops = ours(chess.BISHOP) | ours(chess.QUEEN)
+    for rays, upwards, straight in RAYS:
+        blockers = rays[square] & occupied
+        nearest = lowest_bit(blockers) if upwards else highest_bit(blockers)
+        attackers |= nearest & (rooks if straight else bishops)
+
+    attackers[king == 0] = 0
+    return attackers, np.where(king != 0, square, -1)
+
+
+def king_capture_counts(store:BeliefStore, color=None, move_actions=None) -> Counter:
+    """
+    Weight of the beliefs in which each move of `color` (by default the side
+    to move in each belief) captures the opposing king, optionally only for
+    moves in `move_actions`. Pawns capturing on the back rank promote to a
+    queen.
+    """
+    if color is None:
+        counts = Counter()
+        for side in chess.COLORS:
+            counts.update(king_capture_counts(store.select(store.turn == side), side, move_actions))
+        return counts
+
+    attackers, king_square = king_attackers(store, color)
+    weights = store.weight_array()
+    pawns = store.pieces[:, piece_index(chess.PAWN, color)]
+    back_rank = 7 if color == chess.WHITE else 0
+
+    counts = Counter()
+    rows = np.flatnonzero(attackers)
+    attackers = attackers[rows]
+    while len(rows):
+        bit = lowest_bit(attackers)
+        from_square = bit_square(bit)
+        promotes = ((pawns[rows] & bit) != 0) & (king_square[rows] >> 3 == back_rank)
+        keys = (from_square * 64 + king_square[rows]) * 2 + promotes
+        unique, inverse = np.unique(keys, return_inverse=True)
+        for key, weight in zip(unique.tolist(), np.bincount(inverse, weights=weights[rows]).tolist()):
+            move = chess.Move(key >> 7, key >> 1 & 63, chess.QUEEN if key & 1 else None)
+            counts[move] += weight
+
+        attackers ^= bit
+        left = attackers != 0
+        rows, attackers = rows[left], attackers[left]
+
+    if move_actions is not None:
+        allowed = set(move_actions)
+        counts = Counter({move: weight for move, weight in counts.items() if move in allowed})
+    return counts
+
+
+def best_king_capture(counts:Counter):
+    """The king capture found in the most beliefs, ties broken alphabetically, or None."""
+    if not counts:
+        return None
+    return min(counts, key=lambda move: (-counts[move], move.uci()))
@@ -1,17 +1,21 @@
 import chess
 
-def execute_move(fen, move_str):
+def executed_fen(fen, move_str):
     try:
         board = chess.Board(fen)
         move = chess.Move.from_uci(move_str)
         if move in board.legal_moves:
             board.push(move)
-            print(board.fen())
+            return board.fen()
         else:
-            print("Illegal move")
+            return "Illegal move"
     except Exception:
-        print("Illegal move")
+        return "Illegal move"
+
+def execute_move(fen, move_str):
+    print(executed_fen(fen, move_str))
 
-fen_input = input().strip()
-move_input = input().strip()
-execute_move(fen_input, move_input)
+if __name__ == "__main__":
+    fen_input = input().strip()
+    move_input = input().strip()
+    execute_move(fen_input, move_input)
@@ -0,0 +1,39 @@
+import chess
+import chess.engine
+
+
+def move_squares(board:chess.Board, move:chess.Move):
+    """Squares a move depends on: where it starts and lands, what it passes over, and the rook of a castle."""
+    squares = chess.BB_SQUARES[move.from_square] | chess.BB_SQUARES[move.to_square]
+    squares |= chess.between(move.from_square, move.to_square)
+    if board.is_castling(move):
+        rank = chess.BB_RANK_1 if board.turn == chess.WHITE else chess.BB_RANK_8
+        squares |= rank & (chess.BB_FILE_H if board.is_kingside_castling(move) else chess.BB_FILE_A | chess.BB_FILE_B)
+    return squares
+
+
+class MovePlan:
+    """
+    The move an engine chose during the sense phase, with its principal
+    variation, kept for choose_move. The plan stays valid as long as the
+    sense result does not change a square that the planned move or the
+    expected reply depends on.
+    """
+
+    def __init__(self, board:chess.Board, result:chess.engine.PlayResult):
+        self.move = result.move
+        self.pv = [move for move in (result.move, result.ponder) if move is not None]
+        self.squares = 0
+        board = board.copy(stack=False)
+        for move in self.pv:
+            if not board.is_pseudo_legal(move):
+                break
+            self.squares |= move_squares(board, move)
+            board.push(move)
+
+    def survives(self, board:chess.Board, sense_result):
+        """False if the sense result changes, on `board`, a square the plan depends on."""
+        for square, piece in sense_result:
+            if self.squares & chess.BB_SQUARES[square] and board.piece_at(square) != piece:
+                return False
+        return True
@@ -0,0 +1,90 @@
+import chess
+import chess.engine
+import numpy as np
+
+# principal variations asked for per belief, the candidates beyond them get the worst score seen
+MAX_MULTIPV = 8
+
+
+def expected_score(info, color):
+    """Expected game score, 0 to 1, of an analysed line for `color`, or NaN if it has no score."""
+    score = info.get('score')
+    if score is None:
+        return np.nan
+    return score.pov(color).wdl().expectation()
+
+
+def score_matrix(boards, analyses, candidates):
+    """
+    (beliefs, candidates) matrix of the expected score of playing each
+    candidate move on each analysed board, from MultiPV analyses. A
+    candidate that the analysis of a board did not reach, or that is not
+    legal there, is given the worst score of that board. Boards without a
+    usable analysis are left out; the indices of the rows kept are returned
+    with the matrix.
+    """
+    column = {move: j for j, move in enumerate(candidates)}
+    rows, kept = [], []
+    for i, (board, infos) in enumerate(zip(boards, analyses)):
+        row = np.full(len(candidates), np.nan)
+        for info in infos or ():
+            pv = info.get('pv')
+            if pv and pv[0] in column:
+                row[column[pv[0]]] = expected_score(info, board.turn)
+        if np.isnan(row).all():
+            continue
+        row[np.isnan(row)] = np.nanmin(row)
+        rows.append(row)
+        kept.append(i)
+    return np.array(rows).reshape(len(rows), len(candidates)), np.array(kept, dtype=np.intp)
+
+
+def best_expected_move(matrix, candidates, weights=None):
+    """
+    The candidate with the best expected score over the beliefs, each row
+    weighted by `weights` (uniformly if None), and the expected scores.
+    Ties go to the candidate listed first.
+    """
+    if weights is None:
+        weights = np.ones(len(matrix))
+    expected = np.asarray(weights, dtype=float) @ matrix / np.sum(weights)
+    return candidates[int(np.argmax(expected))], expected
+
+
+def analysis_plan(boards, candidates):
+    """
+    How choose_by_score() analyses `boards`: the indices of the boards on
+    which some candidate is legal, the candidates legal on each of them as
+    root moves, and the number of lines asked for (0 if no board is left).
+    """
+    allowed = set(candidates)
+    searched, root_moves = [], []
+    for i, board in enumerate(boards):
+        moves = [move for move in board.legal_moves if move in allowed]
+        if moves:
+            searched.append(i)
+            root_moves.append(moves)
+    multipv = min(MAX_MULTIPV, max((len(moves) for moves in root_moves), default=0))
+    return searched, root_moves, multipv
+
+
+def choose_by_score(evaluator, boards, limit, candidates, weights=None, deadline=None):
+    """
+    Runs one MultiPV analysis per board, restricted to the candidates legal
+    on it, and returns the candidate with the best weighted expected score,
+    or None if no analysis came back. Candidates are ordered by UCI so that
+    ties are broken alphabetically.
+    """
+    candidates = sorted(set(candidates), key=chess.Move.uci)
+    searched, root_moves, multipv = analysis_plan(boards, candidates)
+    if not searched:
+        return None
+
+    boards = [boards[i] for i in searched]
+    analyses = evaluator.analyse_many(boards, limit, multipv=multipv, root_moves=root_moves, deadline=deadline)
+    matrix, kept = score_matrix(boards, analyses, candidates)
+    if not len(kept):
+        return None
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[searched][kept]
+    return best_expected_move(matrix, candidates, weights)[0]
@@ -2,119 +2,54 @@ from reconchess import Player
 import chess
 import chess.engine
 import random
-from collections import defaultdict
+import os
+import numpy as np
 from reconchess import *
 from reconchess.utilities import without_opponent_pieces, is_illegal_castle
-<<<<<<< HEAD
-import os
-
-STOCKFISH_ENV_VAR = 'STOCKFISH_EXECUTABLE'
-=======
-
-def get_king_capture_move(board:chess.Board):
-    for move in board.pseudo_legal_moves:
-        if board.is_capture(move):
-            captured_square = move.to_square
-            captured_piece = board.piece_at(captured_square)
-            if captured_piece and captured_piece.piece_type == chess.KING:
-                return move
-    return None
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
-
-def parse_window(window_str):
-    """
-    Parses the window description into a dictionary:
-    {'c8': '?', 'd8': '?', ..., 'd7': 'n'}
-    """
-    window = {}
-    entries = window_str.strip().split(';')
-    for entry in entries:
-        if entry:
-            square, piece = entry.split(':')
-            window[square] = piece
-    return window
-
-def fen_matches_window(fen, window):
-    """
-    Checks if the given FEN matches the window observation.
-    '?' means the square must be empty.
-    Any other piece letter must match exactly.
-    """
-    board = chess.Board(fen)
-    for square_str, expected_piece in window.items():
-        square = chess.parse_square(square_str)
-        piece = board.piece_at(square)
-
-        if expected_piece == '?':
-            if piece is not None:
-                return False  # Expected empty square
-        else:
-            if piece is None or piece.symbol() != expected_piece:
-                return False  # Piece mismatch
-    return True
-
-<<<<<<< HEAD
-def filter_fens_by_window(fens, window_str):
-    window = parse_window(window_str)
-    consistent_fens = [fen for fen in fens if fen_matches_window(fen, window)]
-    return sorted(consistent_fens)
-
-def get_king_capture_move(board:chess.Board, move_actions: List[chess.Move],color:bool):
-    for move in move_actions:
-        if board.is_capture(move):
-            captured_square = move.to_square
-            captured_piece = board.piece_at(captured_square)
-            if captured_piece and captured_piece.piece_type == chess.KING and board.king(not color):
-                return move
-    return None
-
-def generate_all_possible_moves(board:chess.Board):
-    possible_moves = set()
-
-    # 1. Add all pseudolegal moves
-    for move in board.pseudo_legal_moves:
-        possible_moves.add(move)
-
-    # 2. Add the null move
-    possible_moves.add(chess.Move.null())
-
-    # 3. Add special castling moves permitted in RBC
-    castle_board = without_opponent_pieces(board)
-    for move in castle_board.generate_castling_moves():
-        if not is_illegal_castle(board, move):
-            possible_moves.add(move)
-
-    # 4. Output sorted list of moves
-    return sorted(possible_moves)
-    
-def generate_next_fens(board:chess.Board):
-=======
-def generate_capture_resulting_fens(fen, capture_square_str):
-    board = chess.Board(fen)
-    target_square = chess.SQUARE_NAMES.index(capture_square_str)
+from belief_store import BeliefStore
+from belief_io import write_beliefs, BELIEF_FILE_SUFFIX
+from belief_filters import filter_by_move_result, filter_by_sense
+from belief_expansion import capture_moves
+from belief_pipeline import BeliefSet
+from expansion_pool import ExpansionPool
+from particle_filter import ParticleFilter
+from sense_selection import choose_sense_square
+from async_evaluator import get_evaluator
+from engine_pool import get_stockfish_path
+from eval_cache import get_eval_cache
+from time_manager import TimeManager
+from move_scoring import choose_by_score
+from king_capture import king_capture_counts, best_king_capture
+from pondering import Ponderer
+from fallback_evaluator import FallbackEvaluator, ranked_sample
+
+# number of worker processes used to expand large belief sets, 0 or 1 to expand in-process
+EXPANSION_WORKERS_ENV_VAR = 'RBC_EXPANSION_WORKERS'
+# cap on the number of weighted beliefs kept by the particle filter, 0 for an unbounded set
+MAX_BELIEFS_ENV_VAR = 'RBC_MAX_BELIEFS'
+# how the searches of the sampled beliefs pick a move: "multipv" scores every candidate on every belief,
+# "vote" counts the best move of each belief
+MOVE_SCORING_ENV_VAR = 'RBC_MOVE_SCORING'
+# "0" to stop expanding the belief set and scoring sense windows on the opponent's turn
+PONDER_ENV_VAR = 'RBC_PONDER'
+# directory that receives a belief file (see belief_io) of the set after each of our moves, unset for none
+BELIEF_CHECKPOINTS_ENV_VAR = 'RBC_BELIEF_CHECKPOINTS'
+# children per belief assumed when budgeting the sense before the opponent-move expansion has run,
+# on the high side: the budget only uses it to cap how many children are scored
+CHILDREN_PER_BELIEF = 40
+
+def generate_capture_resulting_fens(board:chess.Board, capture_square:Square):
     next_fens = set()
 
-    # 1. Check all pseudolegal moves that end on the capture square
-    for move in board.pseudo_legal_moves:
-        if move.to_square == target_square and board.is_capture(move):
-            new_board = board.copy()
-            new_board.push(move)
-            next_fens.add(new_board.fen())
-
-    # 2. Special RBC castling (very rare, but handle it safely)
-    castle_board = without_opponent_pieces(board)
-    for move in castle_board.generate_castling_moves():
-        if not is_illegal_castle(board, move):
-            if move.to_square == target_square and board.is_capture(move):
-                new_board = board.copy()
-                new_board.push(move)
-                next_fens.add(new_board.fen())
+    # Only the opponent pieces attacking the capture square (and en passant) can have captured there
+    for move in capture_moves(board, capture_square):
+        board.push(move)
+        next_fens.add(board.fen())
+        board.pop()
 
     return sorted(next_fens)
 
-def generate_next_fens(fen):
-    board = chess.Board(fen)
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
+def generate_next_fens(board:chess.Board):
     next_fens = set()
 
     # 1. Pseudolegal moves
@@ -136,254 +71,266 @@ def generate_next_fens(fen):
             new_board.push(move)
             next_fens.add(new_board.fen())
 
-<<<<<<< HEAD
-    # Output sorted FENs
-    return sorted(next_fens)
-
-def generate_capture_resulting_fens(board:chess.Board, capture_square_str):
-    target_square = chess.SQUARE_NAMES.index(capture_square_str)
-    next_fens = set()
-
-    # 1. Check all pseudolegal moves that end on the capture square
-    for move in board.pseudo_legal_moves:
-        if move.to_square == target_square and board.is_capture(move):
-            new_board = board.copy()
-            new_board.push(move)
-            next_fens.add(new_board.fen())
-
-    # 2. Special RBC castling (very rare, but handle it safely)
-    castle_board = without_opponent_pieces(board)
-    for move in castle_board.generate_castling_moves():
-        if not is_illegal_castle(board, move):
-            if move.to_square == target_square and board.is_capture(move):
-                new_board = board.copy()
-                new_board.push(move)
-                next_fens.add(new_board.fen())
-
-    # 3. Return sorted list
-    return sorted(next_fens)   
-
-class ImprovedAgent(Player):
-    def __init__(self):
-        super().__init__()
-        self.color = None
-        self.engine = None
-        self.board = None
-        self.belief_states = []
-        self.possible_moves = []
-
-        if STOCKFISH_ENV_VAR not in os.environ:
-            raise KeyError(
-                'TroutBot requires an environment variable called "{}" pointing to the Stockfish executable'.format(
-                    STOCKFISH_ENV_VAR))
-
-        # make sure there is actually a file
-        stockfish_path = os.environ[STOCKFISH_ENV_VAR]
-        if not os.path.exists(stockfish_path):
-            raise ValueError('No stockfish executable found at "{}"'.format(stockfish_path))
-        
-        self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path, setpgrp=True)
-=======
     return sorted(next_fens)
 
 class RandomSensing(Player):
-    def __init__(self):
+    def __init__(self, expansion_workers=None, max_beliefs=None, move_scoring=None):
         super().__init__()
-        self.belief_states = []
+        self.beliefs = BeliefStore()
         self.color = None
         self.engine = None
         self.turn_count = 0
-
-        try:
-            # Initialize Stockfish engine
-            self.engine = chess.engine.SimpleEngine.popen_uci('/opt/stockfish/stockfish')
-        except:
-            # Fallback if default path doesn't work
-            self.engine = chess.engine.SimpleEngine.popen_uci(r"G:\Downloads\AI-RBC-main\stockfish\stockfish.exe")
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
+        self.time_manager = TimeManager()
+
+        if expansion_workers is None:
+            expansion_workers = int(os.environ.get(EXPANSION_WORKERS_ENV_VAR, 0))
+        self.expansion_workers = expansion_workers
+        self.expansion_pool = None
+
+        if max_beliefs is None:
+            max_beliefs = int(os.environ.get(MAX_BELIEFS_ENV_VAR, 0))
+        self.particle_filter = ParticleFilter(max_beliefs) if max_beliefs > 0 else None
+        if move_scoring is None:
+            move_scoring = os.environ.get(MOVE_SCORING_ENV_VAR, 'multipv')
+        self.move_scoring = move_scoring
+        # beliefs after the opponent's move, held unevaluated until the sense result arrives,
+        # and the children it produces when the ponderer has computed them
+        self.pending = None
+        self.pending_children = None
+        self.pending_capture = None
+        # window entropy of the pending set, when pondering computed it ahead of time
+        self.pending_entropy = None
+        self.ponderer = None
+        # clock at the start of our last move, from which the ponderer predicts the next turn's searches
+        self.seconds_left = None
+
+        # Searches run concurrently on a set of supervised engine processes shared by the whole process,
+        # the executable comes from STOCKFISH_EXECUTABLE or the default install location
+        self.engine = get_evaluator(get_stockfish_path())
 
     def handle_game_start(self, color:bool, board:chess.Board, opponent_name:str):
         self.color = color
         self.board = board
-<<<<<<< HEAD
-        #self.belief_states = generate_next_fens(self.board)
-       # self.possible_moves = generate_all_possible_moves(self.board)
+        self.beliefs = BeliefStore.from_boards([board])
+        self.time_manager = TimeManager()
+        if os.environ.get(PONDER_ENV_VAR, '1') != '0':
+            # the built-in evaluator has no cache to warm, and would only slow down the opponent's turn
+            evaluator = None if isinstance(self.engine, FallbackEvaluator) else self.engine
+            self.ponderer = Ponderer(color, evaluator)
+            if color == chess.BLACK:
+                self.ponderer.start(self.beliefs)
+
+        # Workers are started once per game and reused every turn
+        if self.expansion_workers > 1:
+            self.expansion_pool = ExpansionPool(self.expansion_workers)
 
     def handle_opponent_move_result(self, captured_my_piece:bool, capture_square: Optional[Square]):
-=======
-        #self.belief_states = [board.fen()]     
+        # White's first turn: the opponent has not moved yet
+        if self.color == chess.WHITE and self.turn_count == 0:
+            return
 
-    def handle_opponent_move_result(self, captured_my_piece:bool, capture_square: Optional[Square]):
-        new_beliefs = []
-        for fen in self.belief_states:
-            #board = chess.Board(fen)
-            
-            if captured_my_piece:
-                # Generate all possible FENs where opponent could have captured
-                resulting_fens = generate_capture_resulting_fens(fen, capture_square)
-                new_beliefs.extend(resulting_fens)
-            else:
-                # Generate all possible non-capture moves
-                next_fens = generate_next_fens(fen)
-                new_beliefs.extend(next_fens)
-                
-        self.belief_states = list(set(new_beliefs))  # Remove duplicates
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
+        self.pending_capture = capture_square if captured_my_piece else None
+        if self.particle_filter is not None:
+            self.particle_filter.remember(self.beliefs)
+
+        # Commit what was worked out on the opponent's turn, the pipeline stays for the fallbacks either way
+        self.pending = self.opponent_move(self.beliefs, self.pending_capture)
+        pondered = self.ponderer.take(self.pending_capture) if self.ponderer is not None else None
+        if pondered is not None:
+            self.pending_children, self.pending_entropy = pondered
 
         if captured_my_piece:
             self.board.remove_piece_at(capture_square)
 
+    def opponent_move(self, beliefs:BeliefStore, capture_square:Optional[Square]=None) -> BeliefSet:
+        """
+        Lazy children of `beliefs` consistent with the opponent move result:
+        only moves capturing on the capture square if there was one, and no
+        change to our own pieces otherwise.
+        """
+        return BeliefSet(beliefs).expand(capture_square, self.expansion_pool).check_captures(self.color, capture_square)
+
+    def track(self, beliefs:BeliefStore) -> BeliefStore:
+        """Resamples the updated belief set when running as a particle filter."""
+        if self.particle_filter is not None:
+            return self.particle_filter.resample(beliefs)
+        return beliefs
+
     def choose_sense(self, sense_actions: List[Square], move_actions: List[chess.Move], seconds_left:float) -> Square:
-<<<<<<< HEAD
+        # The sense is chosen on the set after the opponent's move, which is only computed in full once the
+        # sense result can filter it, unless the ponderer has computed it already
+        beliefs = self.pending_children if self.pending_children is not None else self.beliefs
+        count = len(beliefs)
+        if self.pending is not None and self.pending_children is None:
+            count = len(self.pending.parents) * CHILDREN_PER_BELIEF
+        entropy, self.pending_entropy = self.pending_entropy, None
+
+        # Score a sample of the set when scoring all of it does not fit in the turn
+        budget = self.time_manager.start_turn(seconds_left, count, self.engine.size)
+        if not budget.sense_beliefs:
+            return random.choice(sense_actions)
+        if entropy is not None:
+            return choose_sense_square(beliefs, sense_actions, entropy=entropy)
+        if self.pending is not None and self.pending_children is None:
+            # children of the parents in random order, only as many as can be scored
+            beliefs = self.pending.sample(budget.sense_beliefs)
+        elif len(beliefs) > budget.sense_beliefs:
+            beliefs = beliefs.sample(budget.sense_beliefs)
+        return choose_sense_square(beliefs, sense_actions)
 
-        return random.choice(sense_actions)
-    
-    def handle_sense_result(self, sense_result:List[Tuple[Square, Optional[chess.Piece]]]):
-     
-=======
-        #Prioritize sensing around opponent king or center squares
-        targets = [chess.E4, chess.E5, chess.D4, chess.D5]
-        if self.turn_count < 10:  # Early game
-            targets.extend([chess.F8, chess.G8] if self.color == chess.WHITE else [chess.F1, chess.G1])
-        return random.choice(sense_actions)
-    
     def handle_sense_result(self, sense_result:List[Tuple[Square, Optional[chess.Piece]]]):
         """Update belief states based on sensing results with empty state handling"""
-        if not self.belief_states:
-            self.belief_states = [chess.STARTING_FEN]
+        if not self.beliefs:
+            self.beliefs = BeliefStore.from_fens([chess.STARTING_FEN])
             return
-            
-        # Convert sense result to window format
-        window_str = ';'.join(f"{chess.SQUARE_NAMES[square]}:{piece.symbol() if piece else '?'}" 
-                            for square, piece in sense_result)
-        
-        # Filter matching belief states
-        new_beliefs = [fen for fen in self.belief_states 
-                    if fen_matches_window(fen, parse_window(window_str))]
-        
-        if new_beliefs:
-            self.belief_states = new_beliefs
+
+        # Expansion, capture check and sense filter run as one pass over the children,
+        # unless the ponderer has computed the children already
+        pending = self.pending if self.pending is not None else BeliefSet(self.beliefs)
+        children = self.pending_children
+        self.pending = self.pending_children = None
+        if children is not None:
+            new_beliefs = filter_by_sense(children, sense_result)
         else:
+            new_beliefs = pending.filter_sense(sense_result).materialize()
+
+        capture_square = self.pending_capture
+
+        def update(parents):
+            # this turn's opponent move result and sense result, applied to another parent set
+            return self.opponent_move(parents, capture_square).filter_sense(sense_result).materialize()
+
+        def without_sense(parents):
+            # the opponent move result alone, or, for a capture no belief explains, any opponent move
+            # with our captured piece taken off, so that our own pieces stay right
+            children = self.opponent_move(parents, capture_square).materialize()
+            if children or capture_square is None:
+                return children
+            return self.opponent_move(parents).materialize().remove(self.color, chess.BB_SQUARES[capture_square])
+
+        if new_beliefs:
+            self.beliefs = self.track(new_beliefs)
+        elif self.particle_filter is not None:
+            # Rebuild from recent parent sets, filtering before the cap is applied
+            self.beliefs = self.particle_filter.rejuvenate(update, without_sense)
+        elif pending.stages:
             # If no beliefs match, expand from last known state
             print("Warning: No beliefs match sensing result, expanding possibilities")
-            self.belief_states = generate_next_fens(random.choice(self.belief_states[:10]))  # Limit to first 10 to avoid explosion
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
+            fallback = random.randrange(min(10, len(self.beliefs)))  # Limit to first 10 to avoid explosion
+            self.beliefs = BeliefSet(self.beliefs.select(slice(fallback, fallback + 1))).expand().materialize()
+        else:
+            print("Warning: No beliefs match sensing result, keeping the current set")
+        if self.particle_filter is not None:
+            self.particle_filter.observe(update)
         for square, piece in sense_result:
             if piece is None:
                 self.board.remove_piece_at(square)
             else:
                 self.board.set_piece_at(square,piece)
 
-    def choose_move(self, move_actions: List[chess.Move], seconds_left:float)-> Optional[chess.Move]:
-<<<<<<< HEAD
-        
-        capture_move = get_king_capture_move(self.board,move_actions,self.color)
-
-        if capture_move:
-            return capture_move
-        
-        return random.choice(move_actions)
-
-
-    def handle_move_result(self, requested_move: chess.Move, taken_move:chess.Move, captured_opponent_piece:bool, capture_square:Optional[Square]):
-      
-        if taken_move is not None:
-            self.board.push(taken_move)
-
-    def handle_game_end(self, winner_color: Optional[bool], win_reason: Optional[WinReason],
-=======
-
-        for fen in self.belief_states:
-            board = chess.Board(fen)
-
-            # Try to capture the opponent's king
-            capture_move = get_king_capture_move(board)
-            if capture_move:
-                return capture_move
-
-            # Otherwise ask Stockfish
-        result = self.engine.play(board, chess.engine.Limit(time=0.1))
-        
-        sampled_beliefs = random.sample(self.belief_states, min(5, len(self.belief_states)))
-
-        for fen in sampled_beliefs:
-            board = chess.Board(fen)
-
-            if result in move_actions:
-                return result.move
-            # if move in move_counts:
-            #     move_counts[move] += 1
-            # else:
-              #  move_counts[move] = 1
-
-        
-    
     def choose_move(self, move_actions, seconds_left):
         self.turn_count += 1
-        
-        # First check for king captures in any belief state
-        for fen in self.belief_states:
-            board = chess.Board(fen)
-            king_capture = get_king_capture_move(board)
-            if king_capture and king_capture.uci() in move_actions:
-                # Double-check move legality
-                if king_capture in board.legal_moves:
-                    return king_capture
-                else:
-                    print(f"Warning: King capture {king_capture} not legal in position {fen}")
-
-        # Otherwise use Stockfish on sampled belief states
-        move_scores = defaultdict(int)
-        sampled_beliefs = random.sample(self.belief_states, min(5, len(self.belief_states)))
-        
-        for fen in sampled_beliefs:
-            board = chess.Board(fen)
+        self.seconds_left = seconds_left
+
+        # First take the king if we can in any belief state, with the move that does so in the most of them
+        king_capture = best_king_capture(king_capture_counts(self.beliefs, self.color, move_actions))
+        if king_capture is not None:
+            return king_capture
+
+        # Otherwise search the sampled belief states concurrently, as many and as long as the clock allows,
+        # spread over the range of their static evaluations
+        budget = self.time_manager.budget(seconds_left, len(self.beliefs), self.engine.size)
+        sampled = list(ranked_sample(self.beliefs, budget.samples).boards())
+        if self.move_scoring == 'multipv' and sampled:
+            # plus the beliefs the ponderer already analysed, which are cache hits
+            sampled += self.warmed_beliefs(budget.search, sampled)
             try:
-                # Get legal moves for this specific board
-                legal_moves = list(board.legal_moves)
-                
-                # Only consider moves that are in both legal_moves and move_actions
-                valid_moves = [m for m in legal_moves if m.uci() in move_actions]
-                
-                if valid_moves:
-                    result = self.engine.play(board, chess.engine.Limit(time=0.5), 
-                                            root_moves=valid_moves)
-                    if result.move and result.move.uci() in move_actions:
-                        move_scores[result.move.uci()] += 1
+                # Beliefs are sampled in proportion to their weights, so the rows count equally
+                move = choose_by_score(self.engine, sampled, budget.search, move_actions, deadline=budget.deadline)
+                if move is not None:
+                    return move
             except Exception as e:
-                print(f"Error processing {fen}: {str(e)}")
-                continue
+                print(f"Error scoring sampled beliefs: {str(e)}")
+            sampled = []
+
+        boards, root_moves = [], []
+        for board in sampled:
+            # Only consider moves that are in both legal_moves and move_actions
+            valid_moves = [m for m in board.legal_moves if m in move_actions]
+            if valid_moves:
+                boards.append(board)
+                root_moves.append(valid_moves)
+
+        move_scores = {}
+        try:
+            if boards:
+                move_scores = self.engine.vote(boards, budget.search, root_moves=root_moves, deadline=budget.deadline)
+        except Exception as e:
+            print(f"Error evaluating sampled beliefs: {str(e)}")
 
+        move_scores = {move: count for move, count in move_scores.items() if move in move_actions}
         if move_scores:
-            best_move = max(move_scores.items(), key=lambda x: x[1])[0]
-            return chess.Move.from_uci(best_move)
-        
+            return max(move_scores.items(), key=lambda x: x[1])[0]
+
         # Fallback: choose randomly from legal moves
         try:
-            board = chess.Board(random.choice(self.belief_states))
-            legal_moves = [m for m in board.legal_moves if m.uci() in move_actions]
+            board = self.beliefs.board(random.randrange(len(self.beliefs)))
+            legal_moves = [m for m in board.legal_moves if m in move_actions]
             return random.choice(legal_moves) if legal_moves else None
         except:
             return None # Fallback
 
+    def warmed_beliefs(self, limit, sampled) -> List[chess.Board]:
+        """
+        Beliefs still held, other than those `sampled`, that the ponderer
+        analysed with `limit` on the opponent's turn. Their analyses are in
+        the evaluation cache, so scoring them as well costs no search.
+        """
+        if self.ponderer is None or not self.ponderer.warmed or self.ponderer.warmed_limit != limit:
+            return []
+        keys = self.ponderer.warmed.canonical_keys()
+        held = np.isin(keys, self.beliefs.canonical_keys())
+        held &= ~np.isin(keys, BeliefStore.from_boards(sampled).canonical_keys())
+        return list(self.ponderer.warmed.select(held).boards())
+
     def handle_move_result(self, requested_move: chess.Move, taken_move:chess.Move, captured_opponent_piece:bool, capture_square:Optional[Square]):
-        new_beliefs = []
-        for fen in self.belief_states:
-            board = chess.Board(fen)
-            if taken_move:
-                board.push(taken_move)
-                new_beliefs.append(board.fen())
-        self.belief_states = new_beliefs
+        # Drop the beliefs that would have given a different move result, then play it on the rest
+        consistent = filter_by_move_result(self.beliefs, self.color, requested_move, taken_move,
+                                           captured_opponent_piece, capture_square)
+        if not consistent:
+            print("Warning: No beliefs match the move result, keeping all of them")
+            consistent = self.beliefs
+        # A rejected move still hands the turn over, push() plays a null move for None
+        self.beliefs = self.track(consistent.push(taken_move))
+        if self.particle_filter is not None:
+            color = self.color
+            self.particle_filter.observe(lambda store: filter_by_move_result(
+                store, color, requested_move, taken_move, captured_opponent_piece, capture_square).push(taken_move))
+        if self.ponderer is not None:
+            # the searches of our next turn, budgeted as if it started on this move's clock with as many beliefs
+            search = None
+            if self.seconds_left is not None:
+                search = self.time_manager.next_budget(self.seconds_left, len(self.beliefs), self.engine.size)
+            self.ponderer.start(self.beliefs, search)
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Saves the belief set, for replaying a game's tracking offline, when checkpoints are enabled."""
+        directory = os.environ.get(BELIEF_CHECKPOINTS_ENV_VAR)
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        name = '{}-{}-{:03d}{}'.format(os.getpid(), chess.COLOR_NAMES[self.color], self.turn_count, BELIEF_FILE_SUFFIX)
+        write_beliefs(os.path.join(directory, name), self.beliefs)
 
     def handle_game_end(self, winner_color: Optional[Color], win_reason: Optional[WinReason],
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
                         game_history: GameHistory):
-        try:
-            # if the engine is already terminated then this call will throw an exception
-            self.engine.quit()
-        except chess.engine.EngineTerminatedError:
-<<<<<<< HEAD
-            pass
-=======
-            pass
->>>>>>> 71515f9d06e73fc5178b986f879f5705c81cf3a6
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self.expansion_pool is not None:
+            self.expansion_pool.close()
+            self.expansion_pool = None
+        stats = get_eval_cache().stats()
+        print(f"Evaluation cache: {stats['memory_hits'] + stats['disk_hits']}/{stats['lookups']} hits "
+              f"({stats['hit_rate']:.0%}, {stats['disk_hits']} from disk)")
+        # the engine pool is shared with other games in this process and closed when it exits
@@ -5,46 +5,11 @@ import random
 from collections import defaultdict
 from reconchess import *
 from reconchess.utilities import without_opponent_pieces, is_illegal_castle
-import os
-
-STOCKFISH_ENV_VAR = 'STOCKFISH_EXECUTABLE'
-
-def parse_window(window_str):
-    """
-    Parses the window description into a dictionary:
-    {'c8': '?', 'd8': '?', ..., 'd7': 'n'}
-    """
-    window = {}
-    entries = window_str.strip().split(';')
-    for entry in entries:
-        if entry:
-            square, piece = entry.split(':')
-            window[square] = piece
-    return window
-
-def fen_matches_window(fen, window):
-    """
-    Checks if the given FEN matches the window observation.
-    '?' means the square must be empty.
-    Any other piece letter must match exactly.
-    """
-    board = chess.Board(fen)
-    for square_str, expected_piece in window.items():
-        square = chess.parse_square(square_str)
-        piece = board.piece_at(square)
-
-        if expected_piece == '?':
-            if piece is not None:
-                return False  # Expected empty square
-        else:
-            if piece is None or piece.symbol() != expected_piece:
-                return False  # Piece mismatch
-    return True
-
-def filter_fens_by_window(fens, window_str):
-    window = parse_window(window_str)
-    consistent_fens = [fen for fen in fens if fen_matches_window(fen, window)]
-    return sorted(consistent_fens)
+from engine_pool import get_engine_pool, get_stockfish_path
+from belief_store import BeliefStore
+from belief_expansion import expand_beliefs
+from time_manager import TimeManager
+from sense_selection import choose_sense_square
 
 def get_king_capture_move(board:chess.Board, move_actions: List[chess.Move],color:bool):
     for move in move_actions:
@@ -71,8 +36,8 @@ def generate_all_possible_moves(board:chess.Board):
         if not is_illegal_castle(board, move):
             possible_moves.add(move)
 
-    # 4. Output sorted list of moves
-    return sorted(possible_moves)
+    # 4. Output sorted list of moves, in UCI order as Move objects do not compare
+    return sorted(possible_moves, key=lambda move: move.uci())
     
 def generate_next_fens(board:chess.Board):
     next_fens = set()
@@ -130,22 +95,16 @@ class ImprovedAgent(Player):
         self.board = None
         self.belief_states = []
         self.possible_moves = []
+        self.time_manager = TimeManager()
 
-        if STOCKFISH_ENV_VAR not in os.environ:
-            raise KeyError(
-                'TroutBot requires an environment variable called "{}" pointing to the Stockfish executable'.format(
-                    STOCKFISH_ENV_VAR))
-
-        # make sure there is actually a file
-        stockfish_path = os.environ[STOCKFISH_ENV_VAR]
-        if not os.path.exists(stockfish_path):
-            raise ValueError('No stockfish executable found at "{}"'.format(stockfish_path))
-        
-        self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path, setpgrp=True)
+        # lease from the process-wide pool of warm stockfish engines, found through STOCKFISH_EXECUTABLE;
+        # without an executable the pool hands out the built-in evaluator instead
+        self.engine = get_engine_pool(get_stockfish_path())
 
     def handle_game_start(self, color:bool, board:chess.Board, opponent_name:str):
         self.color = color
         self.board = board
+        self.time_manager = TimeManager()
         #self.belief_states = generate_next_fens(self.board)
        # self.possible_moves = generate_all_possible_moves(self.board)
 
@@ -155,8 +114,15 @@ class ImprovedAgent(Player):
             self.board.remove_piece_at(capture_square)
 
     def choose_sense(self, sense_actions: List[Square], move_actions: List[chess.Move], seconds_left:float) -> Square:
-
-        return random.choice(sense_actions)
+        # White's first turn, when the opponent has not moved yet, or out of time to think
+        budget = self.time_manager.start_turn(seconds_left)
+        if (self.color == chess.WHITE and not self.board.move_stack) or not budget.sense_beliefs:
+            return random.choice(sense_actions)
+
+        # Sense where the opponent's possible replies from the tracked board differ the most
+        board = self.board.copy(stack=False)
+        board.turn = not self.color
+        return choose_sense_square(expand_beliefs(BeliefStore.from_boards([board])), sense_actions)
     
     def handle_sense_result(self, sense_result:List[Tuple[Square, Optional[chess.Piece]]]):
      
@@ -183,8 +149,5 @@ class ImprovedAgent(Player):
 
     def handle_game_end(self, winner_color: Optional[bool], win_reason: Optional[WinReason],
                         game_history: GameHistory):
-        try:
-            # if the engine is already terminated then this call will throw an exception
-            self.engine.quit()
-        except chess.engine.EngineTerminatedError:
-            pass
+        # the engine pool is shared with other games in this process and closed when it exits
+        pass
@@ -1,5 +1,6 @@
 import chess
 import chess.engine
+from engine_pool import get_engine_pool
 
 def get_king_capture_move(board):
     """
@@ -23,13 +24,12 @@ def choose_move(fen):
         return capture_move.uci()
 
     # 2. Ask Stockfish to suggest a move (within 0.5 seconds)
-    #engine = chess.engine.SimpleEngine.popen_uci('./stockfish', setpgrp=True)
-    engine = chess.engine.SimpleEngine.popen_uci('/opt/stockfish/stockfish', setpgrp=True)
+    #engine = get_engine_pool('./stockfish')
+    engine = get_engine_pool('/opt/stockfish/stockfish')
 
     result = engine.play(board, chess.engine.Limit(time=0.5))
     move = result.move
 
-    engine.quit()
     return move.uci()
 
 # === Input ===
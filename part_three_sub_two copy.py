@@ -1,5 +1,6 @@
 import chess
 import chess.engine
+from engine_pool import get_engine_pool
 
 def get_king_capture_move(board):
     for move in board.pseudo_legal_moves:
@@ -26,8 +27,8 @@ def choose_move(fens):
 
     move_counts = {}
 
-    # Start the engine once
-    engine = chess.engine.SimpleEngine.popen_uci(r"G:\Downloads\AI-RBC-main\stockfish\stockfish.exe", setpgrp=True)
+    # Lease from the warm engine pool instead of starting a process per call
+    engine = get_engine_pool(r"G:\Downloads\AI-RBC-main\stockfish\stockfish.exe")
 
     for fen in fens:
         board = chess.Board(fen)
@@ -47,8 +48,6 @@ def choose_move(fens):
         else:
             move_counts[move] = 1
 
-    engine.quit()
-
     return move_counts
 
 def main():
@@ -1,4 +1,5 @@
 import chess.engine
+from engine_pool import get_engine_pool
 
 def get_king_capture_move(board):
     for move in board.pseudo_legal_moves:
@@ -12,9 +13,9 @@ def get_king_capture_move(board):
 def choose_move(fens):
     move_counts = {}
 
-    # Start the engine once
-    engine = chess.engine.SimpleEngine.popen_uci(r"G:\Downloads\AI-RBC-main\stockfish\stockfish.exe", setpgrp=True)
-    #engine = chess.engine.SimpleEngine.popen_uci('/opt/stockfish/stockfish', setpgrp=True)
+    # Lease from the warm engine pool instead of starting a process per call
+    engine = get_engine_pool(r"G:\Downloads\AI-RBC-main\stockfish\stockfish.exe")
+    #engine = get_engine_pool('/opt/stockfish/stockfish')
 
     for fen in fens:
         board = chess.Board(fen)
@@ -33,8 +34,6 @@ def choose_move(fens):
         else:
             move_counts[move] = 1
 
-    engine.quit()
-
     return move_counts
 
 def main():
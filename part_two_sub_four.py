@@ -36,15 +36,19 @@ def fen_matches_window(fen, window):
                 return False  # Piece mismatch
     return True
 
-def filter_fens_by_window(fens, window_str):
+def consistent_fens_for_window(fens, window_str):
     window = parse_window(window_str)
     consistent_fens = [fen for fen in fens if fen_matches_window(fen, window)]
-    for fen in sorted(consistent_fens):
+    return sorted(consistent_fens)
+
+def filter_fens_by_window(fens, window_str):
+    for fen in consistent_fens_for_window(fens, window_str):
         print(fen)
 
-N = int(input())
-fens = [input().strip() for _ in range(N)]
-window_description = input().strip()
+if __name__ == "__main__":
+    N = int(input())
+    fens = [input().strip() for _ in range(N)]
+    window_description = input().strip()
 
-filter_fens_by_window(fens, window_description)
+    filter_fens_by_window(fens, window_description)
 
@@ -2,7 +2,7 @@ import chess
 import reconchess
 from reconchess.utilities import without_opponent_pieces, is_illegal_castle
 
-def generate_all_possible_moves(fen):
+def all_possible_moves(fen):
     board = chess.Board(fen)
     possible_moves = set()
 
@@ -19,10 +19,14 @@ def generate_all_possible_moves(fen):
         if not is_illegal_castle(board, move):
             possible_moves.add(move.uci())
 
-    # 4. Output sorted list of moves
-    for move in sorted(possible_moves):
+    # 4. Return sorted list of moves
+    return sorted(possible_moves)
+
+def generate_all_possible_moves(fen):
+    for move in all_possible_moves(fen):
         print(move)
 
-# Sample Input
-fen_input = input().strip()
-generate_all_possible_moves(fen_input)
+if __name__ == "__main__":
+    # Sample Input
+    fen_input = input().strip()
+    generate_all_possible_moves(fen_input)
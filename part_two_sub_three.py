@@ -5,17 +5,17 @@ from reconchess.utilities import without_opponent_pieces, is_illegal_castle
 import chess
 from reconchess.utilities import without_opponent_pieces, is_illegal_castle
 
-def generate_capture_resulting_fens(fen, capture_square_str):
+def capture_resulting_fens(fen, capture_square_str):
     board = chess.Board(fen)
     target_square = chess.SQUARE_NAMES.index(capture_square_str)
     next_fens = set()
 
     # 1. Check all pseudolegal moves that end on the capture square
-    for move in board.pseudo_legal_moves:
-        if move.to_square == target_square and board.is_capture(move):
-            new_board = board.copy()
-            new_board.push(move)
-            next_fens.add(new_board.fen())
+    for move in board.generate_pseudo_legal_moves(to_mask=chess.BB_SQUARES[target_square]):
+        if board.is_capture(move):
+            board.push(move)
+            next_fens.add(board.fen())
+            board.pop()
 
     # 2. Special RBC castling (very rare, but handle it safely)
     castle_board = without_opponent_pieces(board)
@@ -27,11 +27,15 @@ def generate_capture_resulting_fens(fen, capture_square_str):
                 next_fens.add(new_board.fen())
 
     # 3. Return sorted list
-    for f in sorted(next_fens):
+    return sorted(next_fens)
+
+def generate_capture_resulting_fens(fen, capture_square_str):
+    for f in capture_resulting_fens(fen, capture_square_str):
         print(f)
 
-# Sample Input
-fen_input = input("").strip()
-capture_square_input = input().strip().lower()
-generate_capture_resulting_fens(fen_input, capture_square_input)
+if __name__ == "__main__":
+    # Sample Input
+    fen_input = input("").strip()
+    capture_square_input = input().strip().lower()
+    generate_capture_resulting_fens(fen_input, capture_square_input)
 
@@ -0,0 +1,87 @@
+from collections import deque
+import numpy as np
+from belief_store import BeliefStore
+
+
+class ParticleFilter:
+    """
+    Keeps a weighted belief set at no more than `max_particles` positions.
+    resample() is applied after every update of the set. Parent sets seen
+    before each opponent-move expansion are remembered, with the updates
+    observed since, so that an update which rules out every particle can
+    rebuild the set from recent history instead of starting over.
+    """
+
+    def __init__(self, max_particles, history=4, seed=None):
+        self.max_particles = max_particles
+        # (parent set, updates observed since it) of the most recent expansions
+        self.history = deque(maxlen=history)
+        self.rng = np.random.default_rng(seed)
+
+    def resample(self, store:BeliefStore) -> BeliefStore:
+        """
+        Systematic resampling down to max_particles. Positions drawn more
+        than once are kept once with a proportionally larger weight, so the
+        result is a set of distinct particles whose weights sum to 1.
+        """
+        if not store:
+            return store
+
+        weights = store.weight_array()
+        total = weights.sum()
+        if total <= 0:
+            weights = np.ones(len(store))
+            total = float(len(store))
+
+        if len(store) <= self.max_particles:
+            return BeliefStore(store.records, weights / total)
+
+        positions = (self.rng.random() + np.arange(self.max_particles)) / self.max_particles
+        cumulative = np.cumsum(weights / total)
+        cumulative[-1] = 1.0
+        counts = np.bincount(np.searchsorted(cumulative, positions), minlength=len(store))
+        kept = np.flatnonzero(counts)
+        return BeliefStore(store.records[kept], counts[kept] / self.max_particles)
+
+    def remember(self, store:BeliefStore):
+        """Records the particle set an expansion is about to start from."""
+        if store:
+            self.history.append((store, []))
+
+    def observe(self, update):
+        """
+        Records an update of the set, a function from a store to the updated
+        store, for replaying on the remembered parent sets.
+        """
+        for _, updates in self.history:
+            updates.append(update)
+
+    def replay(self, parents:BeliefStore, updates) -> BeliefStore:
+        """Applies `updates` to `parents` in order, resampling after each as during play."""
+        store = parents
+        for update in updates:
+            store = update(store)
+            if not store:
+                break
+            store = self.resample(store)
+        return store
+
+    def rejuvenate(self, rebuild, fallback=None) -> BeliefStore:
+        """
+        Rebuilds an empty set. Each remembered parent set, newest first, is
+        brought up to date by replaying the updates observed since it, then
+        `rebuild` applies the update that emptied the set, before
+        resampling, so that particles the cap had dropped can come back. If
+        no remembered set is consistent, `fallback` is applied to the newest
+        one instead.
+        """
+        for parents, updates in reversed(self.history):
+            store = self.replay(parents, updates)
+            if not store:
+                continue
+            survivors = rebuild(store)
+            if survivors:
+                return self.resample(survivors)
+        if fallback is not None and self.history:
+            return self.resample(fallback(self.history[-1][0]))
+        return BeliefStore()
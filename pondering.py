@@ -0,0 +1,145 @@
+import threading
+import numpy as np
+from reconchess.utilities import move_actions
+from belief_store import BeliefStore
+from belief_pipeline import BeliefSet
+from king_capture import bit_square
+from sense_selection import window_entropy
+from fallback_evaluator import is_fallback, ranked_sample
+from move_scoring import analysis_plan
+
+# belief sets larger than this are not pondered, their full expansion would not fit in the opponent's turn
+PONDER_MAX_BELIEFS = 20000
+
+# outcome key of an opponent move that captured nothing
+NO_CAPTURE = -1
+
+
+class PonderTask(threading.Thread):
+    """
+    One opponent turn of pondering. The belief set, with the opponent to
+    move, is expanded by every opponent move once. The children are split
+    by the capture square the opponent move result would report, and the
+    sense windows of each outcome are scored. `ready` is set at that point.
+    Then, until stopped, the analyses choose_move would run on the beliefs
+    in which nothing of ours was captured are run with the `search` budget
+    predicted for our next turn, so that they are in the evaluation cache.
+    """
+
+    def __init__(self, beliefs:BeliefStore, color, evaluator=None, search=None):
+        super().__init__(name='ponder', daemon=True)
+        self.beliefs = beliefs
+        self.color = color
+        self.evaluator = evaluator
+        self.search = search
+        self.stopping = threading.Event()
+        self.ready = threading.Event()
+        # outcome key -> (deduplicated beliefs, window entropy)
+        self.outcomes = {}
+        # no-capture beliefs whose analyses an engine returned, and are therefore cached
+        self.warmed = []
+
+    def expand_outcomes(self):
+        mine = self.beliefs.occupied_co(self.color)
+        groups = {}
+        for children, index in BeliefSet(self.beliefs).expand().chunks():
+            if self.stopping.is_set():
+                return None
+            # the opponent can only remove our pieces, and a move result reports at most one of them
+            lost = mine[index] & ~children.occupied_co(self.color)
+            single = (lost & (lost - np.uint64(1))) == 0
+            key = np.where(lost != 0, bit_square(lost), NO_CAPTURE)
+            for outcome in np.unique(key[single]).tolist():
+                groups.setdefault(outcome, []).append(children.select(single & (key == outcome)))
+
+        outcomes = {}
+        for outcome, stores in groups.items():
+            if self.stopping.is_set():
+                return None
+            store = BeliefStore.concat(stores).unique()
+            outcomes[outcome] = (store, window_entropy(store))
+        return outcomes
+
+    def run(self):
+        outcomes = self.expand_outcomes()
+        if outcomes is None:
+            return
+        self.outcomes = outcomes
+        self.ready.set()
+
+        if self.evaluator is not None and self.search is not None and NO_CAPTURE in outcomes:
+            self.warm(outcomes[NO_CAPTURE][0])
+
+    def warm(self, beliefs:BeliefStore):
+        """
+        Analyses a sample of `beliefs` the way choose_by_score() would, a
+        round of one board per engine at a time, with the same limit, root
+        moves and number of lines, so that the cache keys are the same.
+        """
+        if not beliefs or not self.search.samples:
+            return
+        boards = list(ranked_sample(beliefs, self.search.samples).boards())
+        # the move actions depend on our pieces only, which are the same in every one of these beliefs
+        searched, root_moves, multipv = analysis_plan(boards, move_actions(boards[0]))
+        boards = [boards[i] for i in searched]
+        for start in range(0, len(boards), self.evaluator.size):
+            if self.stopping.is_set():
+                return
+            batch = slice(start, start + self.evaluator.size)
+            try:
+                analyses = self.evaluator.analyse_many(boards[batch], self.search.search, multipv=multipv,
+                                                       root_moves=root_moves[batch], deadline=self.search.deadline)
+            except Exception:
+                return
+            self.warmed.extend(board for board, infos in zip(boards[batch], analyses)
+                               if infos and not any(is_fallback(info) for info in infos))
+
+
+class Ponderer:
+    """
+    Uses the opponent's turn, which does not run on our clock. start() is
+    called from handle_move_result with the belief set in which the
+    opponent is to move. take() is called when the opponent move result
+    arrives and commits the pondered outcome for it, or returns None if
+    pondering had not finished, in which case the caller expands as usual.
+    With an `evaluator`, start() may also be given the TurnBudget predicted
+    for our next turn, whose searches are then run ahead of time; take()
+    leaves the beliefs searched in `warmed` and the limit in `warmed_limit`.
+    """
+
+    def __init__(self, color, evaluator=None, max_beliefs=PONDER_MAX_BELIEFS):
+        self.color = color
+        self.evaluator = evaluator
+        self.max_beliefs = max_beliefs
+        self.task = None
+        self.warmed = BeliefStore()
+        self.warmed_limit = None
+
+    def start(self, beliefs:BeliefStore, search=None):
+        self.stop()
+        if beliefs and len(beliefs) <= self.max_beliefs:
+            self.task = PonderTask(beliefs, self.color, self.evaluator, search)
+            self.task.start()
+
+    def take(self, capture_square):
+        """
+        (beliefs, window entropy) after the opponent move that captured on
+        `capture_square`, None for no capture; None if not pondered.
+        """
+        task, self.task = self.task, None
+        self.warmed, self.warmed_limit = BeliefStore(), None
+        if task is None:
+            return None
+        task.stopping.set()
+        if not task.ready.is_set():
+            return None
+        outcome = NO_CAPTURE if capture_square is None else capture_square
+        if outcome == NO_CAPTURE and task.warmed:
+            self.warmed, self.warmed_limit = BeliefStore.from_boards(list(task.warmed)), task.search.search
+        # an outcome no child produced leaves no belief, as the pipeline would
+        return task.outcomes.get(outcome, (BeliefStore(), None))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.stopping.set()
+            self.task = None
@@ -0,0 +1,222 @@
+"""
+One entry point for the FEN command-line tools, a subcommand per tool.
+
+Without --batch a subcommand reads one record from stdin and prints what
+the tool's own script prints. With --batch it streams records from stdin
+or --input until end of file, skipping blank lines between records, and
+writes each record's output lines followed by the --delimiter line, in
+input order. A record that fails, or cannot be read, gets one "error:"
+line as its output. Records are processed in chunks across a pool of
+worker processes, with at most a few chunks per worker in flight, so
+memory stays bounded on inputs of any length.
+
+--input may also name a belief file (see belief_io) for the tools that
+take a single FEN. Workers then map the file themselves and are sent
+record ranges, not FEN strings.
+
+    python rbc_cli.py next-fens --batch --input positions.txt > children.txt
+    python rbc_cli.py moves --plain < position.txt
+    python rbc_cli.py board --batch --input positions.rbcb
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from collections import deque
+from itertools import chain, islice
+import BoardRepresentation
+import NextMovePrediction
+import NextStatePrediction
+import NextStatePredictionWithCaptures
+import moveExecution
+import part_two_sub_one
+import part_two_sub_two
+import part_two_sub_three
+import part_two_sub_four
+from belief_io import is_belief_file, read_beliefs, read_header
+
+# records handed to a worker at a time, and chunks per worker submitted ahead of the one being written
+CHUNK_SIZE = 256
+CHUNKS_AHEAD = 4
+# line written after each record's output in batch mode
+RECORD_DELIMITER = ''
+
+
+def _read_fen(lines):
+    return (next(lines).strip(),)
+
+
+def _read_fen_and_move(lines):
+    return next(lines).strip(), next(lines).strip()
+
+
+def _read_fen_and_square(lines):
+    return next(lines).strip(), next(lines).strip().lower()
+
+
+def _read_fens_and_window(lines):
+    count = int(next(lines))
+    fens = [next(lines).strip() for _ in range(count)]
+    return fens, next(lines).strip()
+
+
+# subcommand -> (help, record reader, tool with RBC rules, plain-chess tool or None)
+TOOLS = {
+    'board': ('print the board of a FEN', _read_fen, BoardRepresentation.board_rows, None),
+    'execute': ('play a UCI move on a FEN', _read_fen_and_move,
+                lambda fen, move: [moveExecution.executed_fen(fen, move)], None),
+    'moves': ('every possible move of a FEN, RBC castling included', _read_fen,
+              part_two_sub_one.all_possible_moves, NextMovePrediction.all_possible_moves),
+    'next-fens': ('every FEN after a possible move', _read_fen,
+                  part_two_sub_two.next_fens, NextStatePrediction.next_fens),
+    'capture-fens': ('every FEN after a move capturing on a square', _read_fen_and_square,
+                     part_two_sub_three.capture_resulting_fens,
+                     NextStatePredictionWithCaptures.capture_resulting_fens),
+    'filter-window': ('the FENs consistent with a sense window', _read_fens_and_window,
+                      part_two_sub_four.consistent_fens_for_window, None),
+}
+
+
+def get_tool(name, plain=False):
+    _, _, tool, plain_tool = TOOLS[name]
+    if plain and plain_tool is None:
+        raise ValueError('{} has no plain-chess variant'.format(name))
+    return plain_tool if plain else tool
+
+
+def read_records(name, stream):
+    """
+    Yields the argument tuple of each record in `stream`, blank lines
+    between records skipped. A record that cannot be read is yielded as the
+    ValueError describing it, and reading goes on with the next line.
+    """
+    reader = TOOLS[name][1]
+    lines = iter(stream)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield reader(chain([line], lines))
+        except StopIteration:
+            yield ValueError('truncated {} record at end of input'.format(name))
+        except ValueError as e:
+            yield ValueError('bad {} record: {}'.format(name, e))
+
+
+def run_chunk(name, plain, records):
+    """Worker side: the output lines of each record of a chunk. A failed or unread record gets one error line."""
+    tool = get_tool(name, plain)
+    results = []
+    for record in records:
+        if isinstance(record, ValueError):
+            results.append(['error: {}'.format(record)])
+            continue
+        try:
+            results.append(tool(*record))
+        except Exception as e:
+            results.append(['error: {}'.format(e)])
+    return results
+
+
+def run_file_chunk(name, plain, path, start, stop):
+    """Worker side: run_chunk() on the FENs of records [start, stop) of a belief file, mapped in this process."""
+    return run_chunk(name, plain, [(fen,) for fen in read_beliefs(path).select(slice(start, stop)).fens()])
+
+
+def record_tasks(name, records, plain=False, chunk_size=CHUNK_SIZE):
+    """(worker function, arguments, record count) for each chunk of an iterable of records."""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield run_chunk, (name, plain, chunk), len(chunk)
+
+
+def file_tasks(name, path, plain=False, chunk_size=CHUNK_SIZE):
+    """(worker function, arguments, record count) for each chunk of the records of a belief file."""
+    if TOOLS[name][1] is not _read_fen:
+        raise ValueError('{} takes more than a FEN per record, belief files only hold positions'.format(name))
+    count, _ = read_header(path)
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        yield run_file_chunk, (name, plain, path, start, stop), stop - start
+
+
+def _format(results, delimiter):
+    """The output lines of each record, each record followed by the delimiter line unless it is None."""
+    end = '' if delimiter is None else delimiter + '\n'
+    return ''.join(''.join(line + '\n' for line in lines) + end for lines in results)
+
+
+def run_tasks(tasks, out, workers=None, delimiter=RECORD_DELIMITER):
+    """Writes the output of every task to `out`, in task order. Returns the number of records."""
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    if workers == 1:
+        for function, args, size in tasks:
+            out.write(_format(function(*args), delimiter))
+            count += size
+        return count
+
+    with multiprocessing.Pool(processes=workers) as pool:
+        pending = deque()
+        for function, args, size in tasks:
+            pending.append((size, pool.apply_async(function, args)))
+            if len(pending) >= workers * CHUNKS_AHEAD:
+                size, result = pending.popleft()
+                out.write(_format(result.get(), delimiter))
+                count += size
+        while pending:
+            size, result = pending.popleft()
+            out.write(_format(result.get(), delimiter))
+            count += size
+    return count
+
+
+def run_batch(name, records, out, plain=False, workers=None, chunk_size=CHUNK_SIZE, delimiter=RECORD_DELIMITER):
+    """Writes the output of every record to `out`, in input order. Returns the number of records."""
+    return run_tasks(record_tasks(name, records, plain, chunk_size), out, workers, delimiter)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='FEN tools for reconnaissance blind chess.')
+    subparsers = parser.add_subparsers(dest='tool', required=True)
+    for name, (description, _, _, plain_tool) in TOOLS.items():
+        sub = subparsers.add_parser(name, help=description)
+        if plain_tool is not None:
+            sub.add_argument('--plain', action='store_true', help='standard chess moves only, no RBC castling')
+        sub.add_argument('--batch', action='store_true', help='process every record until end of input')
+        sub.add_argument('--input', help='read records from this file instead of stdin')
+        sub.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+        sub.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='records per worker task')
+        sub.add_argument('--delimiter', default=RECORD_DELIMITER, help='line written after each record in batch mode')
+    args = parser.parse_args(argv)
+    plain = getattr(args, 'plain', False)
+
+    if args.input and is_belief_file(args.input):
+        tasks = file_tasks(args.tool, args.input, plain, args.chunk_size if args.batch else 1)
+        if not args.batch:
+            tasks = islice(tasks, 1)
+        run_tasks(tasks, sys.stdout, args.workers if args.batch else 1, args.delimiter if args.batch else None)
+        return
+
+    stream = open(args.input) if args.input else sys.stdin
+    try:
+        records = read_records(args.tool, stream)
+        if not args.batch:
+            record = next(records, None)
+            if isinstance(record, ValueError):
+                print('error: {}'.format(record))
+            elif record is not None:
+                for line in get_tool(args.tool, plain)(*record):
+                    print(line)
+            return
+        run_batch(args.tool, records, sys.stdout, plain, args.workers, args.chunk_size, args.delimiter)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+if __name__ == '__main__':
+    main()
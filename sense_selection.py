@@ -0,0 +1,106 @@
+import random
+import chess
+import numpy as np
+from belief_store import BeliefStore
+
+# Centres of the 36 windows that lie fully on the board. A window centred on
+# an edge square only sees a subset of the squares of an interior one.
+INTERIOR_SQUARES = [chess.square(file, rank) for rank in range(1, 7) for file in range(1, 7)]
+
+# Piece code of a square: 0 for empty, 1 + piece column otherwise. Bit b of the
+# code is set on the squares of the columns listed in _PLANE_COLUMNS[b].
+_PLANE_COLUMNS = [[column for column in range(12) if (column + 1) >> bit & 1] for bit in range(4)]
+
+# Spreads the 8 bits of a rank byte into 8 nibbles, file f at bits 4f
+_SPREAD = np.array([sum(((byte >> f) & 1) << (4 * f) for f in range(8)) for byte in range(256)], dtype=np.uint32)
+
+# Bit offset, inside a rank word, of the leftmost file of each window column
+_FILE_SHIFTS = np.arange(0, 24, 4, dtype=np.uint32)
+
+# Beliefs are numbered in the low bits of a sort key, below the 36-bit signature
+_INDEX_BITS = 28
+
+
+def rank_words(store:BeliefStore):
+    """(8, n) uint32 per rank and belief: the piece code of file f in bits 4f..4f+3."""
+    n = len(store)
+    words = np.zeros((n, 8), dtype=np.uint32)
+    for bit, columns in enumerate(_PLANE_COLUMNS):
+        plane = np.bitwise_or.reduce(store.pieces[:, columns], axis=1)
+        words |= _SPREAD[plane.view(np.uint8).reshape(n, 8)] << np.uint32(bit)
+    return np.ascontiguousarray(words.T)
+
+
+def window_signatures(store:BeliefStore):
+    """
+    (36, n) uint64 signature of what each belief would show in each interior
+    window, in INTERIOR_SQUARES order: the piece codes of its 9 squares,
+    4 bits apiece. Two beliefs give the same sense result for a window
+    exactly when their signatures there are equal.
+    """
+    ranks = rank_words(store)
+    # 12 bits (3 files) of every rank for each of the 6 window columns
+    slices = (ranks[:, None, :] >> _FILE_SHIFTS[:, None]) & np.uint32(0xFFF)
+    signatures = (slices[2:8].astype(np.uint64) << np.uint64(24))
+    signatures |= slices[0:6] | (slices[1:7] << np.uint32(12))
+    return signatures.reshape(len(INTERIOR_SQUARES), len(store))
+
+
+def _outcome_masses(store:BeliefStore):
+    """
+    Probability of every distinct sense result of every window, grouping
+    the beliefs on their signatures. Returns (mass, window) arrays with one
+    entry per (window, result) pair.
+    """
+    n = len(store)
+    keys = window_signatures(store)
+    if store.weights is None:
+        keys.sort(axis=1)
+        change = np.ones(keys.shape, dtype=bool)
+        np.not_equal(keys[:, 1:], keys[:, :-1], out=change[:, 1:])
+        starts = np.flatnonzero(change.ravel())
+        mass = np.diff(np.append(starts, change.size)) / n
+    else:
+        # sorting signature and belief index together groups each window without an argsort
+        keys <<= np.uint64(_INDEX_BITS)
+        keys |= np.arange(n, dtype=np.uint64)
+        keys.sort(axis=1)
+        order = (keys & np.uint64((1 << _INDEX_BITS) - 1)).astype(np.intp)
+        keys >>= np.uint64(_INDEX_BITS)
+        change = np.ones(keys.shape, dtype=bool)
+        np.not_equal(keys[:, 1:], keys[:, :-1], out=change[:, 1:])
+        # number the groups window by window so that one bincount sums them all
+        group = np.cumsum(change.ravel()) - 1
+        mass = np.bincount(group, weights=(store.weights / store.weights.sum())[order].ravel())
+    window = np.repeat(np.arange(len(INTERIOR_SQUARES)), change.sum(axis=1))
+    return mass, window
+
+
+def window_entropy(store:BeliefStore):
+    """(36,) expected information, in bits, of sensing each interior window."""
+    mass, window = _outcome_masses(store)
+    information = -mass * np.log2(np.where(mass > 0, mass, 1))
+    return np.bincount(window, weights=information, minlength=len(INTERIOR_SQUARES))
+
+
+def expected_survivors(store:BeliefStore):
+    """(36,) expected share of the belief weight left after sensing each interior window."""
+    mass, window = _outcome_masses(store)
+    return np.bincount(window, weights=mass * mass, minlength=len(INTERIOR_SQUARES))
+
+
+def choose_sense_square(store:BeliefStore, sense_actions, rng=random, entropy=None):
+    """
+    The interior square in `sense_actions` whose window is expected to split
+    `store` the most, ties broken at random. Falls back to a random sense
+    action when there is nothing to choose between. `entropy` may hold the
+    window_entropy() of the store if it was computed ahead of time.
+    """
+    allowed = [i for i, square in enumerate(INTERIOR_SQUARES) if square in sense_actions]
+    if not store or not allowed:
+        return rng.choice(sense_actions)
+    if entropy is None:
+        entropy = window_entropy(store)
+    entropy = entropy[allowed]
+    best = np.flatnonzero(entropy >= entropy.max() - 1e-9)
+    return INTERIOR_SQUARES[allowed[rng.choice(list(best))]]
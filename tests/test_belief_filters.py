@@ -0,0 +1,76 @@
+import random
+import chess
+import numpy as np
+from reconchess.utilities import add_pawn_queen_promotion, capture_square_of_move, move_actions, revise_move
+from belief_store import BeliefStore
+from belief_expansion import expand_beliefs
+from belief_filters import move_result_mask
+from benchmarks.corpus import PHASES, load
+
+
+def move_result(board, requested_move):
+    """(taken move, capture square) of a requested move, as reconchess.LocalGame.move() computes them."""
+    taken_move = revise_move(board, add_pawn_queen_promotion(board, requested_move))
+    return taken_move, capture_square_of_move(board, taken_move)
+
+
+def with_their_pieces(board, other):
+    """`board` with the opponent's pieces of `other`, minus those on squares of ours."""
+    color = board.turn
+    belief = board.copy(stack=False)
+    for square in chess.scan_forward(board.occupied_co[not color]):
+        belief.remove_piece_at(square)
+    for square in chess.scan_forward(other.occupied_co[not color] & ~board.occupied_co[color]):
+        belief.set_piece_at(square, other.piece_at(square))
+    # en passant only with the pawn that has just pushed past the square
+    belief.ep_square = None
+    if other.ep_square is not None and not chess.BB_SQUARES[other.ep_square] & belief.occupied:
+        pushed = other.ep_square + (-8 if color == chess.WHITE else 8)
+        if belief.piece_at(pushed) == chess.Piece(chess.PAWN, not color):
+            belief.ep_square = other.ep_square
+    return belief
+
+
+def test_move_result_mask_matches_reconchess():
+    # beliefs sharing one position's pieces of ours, with the opponent's pieces of other positions of the corpus
+    rng = random.Random(2025)
+    positions = [board for phase in PHASES for board in load(phase).boards()]
+    for truth in positions:
+        others = [board for board in rng.sample(positions, 60) if board.turn == truth.turn]
+        store = BeliefStore.from_boards([truth] + [with_their_pieces(truth, other) for other in others])
+        # the reference runs on the decoded beliefs, whose en passant squares the store has cleaned up
+        beliefs = list(store.boards())
+        for requested_move in move_actions(truth):
+            taken_move, capture_square = move_result(beliefs[0], requested_move)
+            expected = [move_result(belief, requested_move) == (taken_move, capture_square) for belief in beliefs]
+            mask = move_result_mask(store, truth.turn, requested_move, taken_move, capture_square is not None,
+                                    capture_square)
+            np.testing.assert_array_equal(mask, expected, err_msg='{} {}'.format(truth.fen(), requested_move))
+
+
+def test_move_result_mask_matches_reconchess_on_castling_and_en_passant():
+    # Black's replies block either castling or not, and pushing a pawn past e5 gives an en passant capture
+    beliefs = expand_beliefs(BeliefStore.from_fens(['4k3/3p1p2/8/1b2P3/8/4n3/8/R3K2R b KQ - 0 1']))
+    boards = list(beliefs.boards())
+    results = set()
+    for truth in boards:
+        for requested_move in move_actions(truth):
+            taken_move, capture_square = move_result(truth, requested_move)
+            results.add((requested_move, taken_move, capture_square))
+            expected = [move_result(belief, requested_move) == (taken_move, capture_square) for belief in boards]
+            mask = move_result_mask(beliefs, truth.turn, requested_move, taken_move, capture_square is not None,
+                                    capture_square)
+            np.testing.assert_array_equal(mask, expected, err_msg='{} {}'.format(truth.fen(), requested_move))
+    castles = [chess.Move.from_uci('e1g1'), chess.Move.from_uci('e1c1')]
+    assert {(move, None, None) for move in castles} | {(move, move, None) for move in castles} <= results
+    assert {(chess.Move.from_uci(move), chess.Move.from_uci(move), square)
+            for move, square in (('e5d6', chess.D5), ('e5f6', chess.F5))} <= results
+
+
+def test_move_result_mask_drops_beliefs_without_the_moving_piece():
+    board = chess.Board()
+    store = BeliefStore.from_boards([board, board.transform(lambda bb: bb & ~chess.BB_G1)])
+    move = chess.Move.from_uci('g1f3')
+    np.testing.assert_array_equal(move_result_mask(store, chess.WHITE, move, move, False, None), [True, False])
+    store = store.select([1])
+    np.testing.assert_array_equal(move_result_mask(store, chess.WHITE, move, move, False, None), [False])
@@ -0,0 +1,38 @@
+import chess
+import numpy as np
+from belief_store import BeliefStore, encode_board, records_from_rows
+from belief_expansion import candidate_moves
+from benchmarks.corpus import PHASES, load
+
+
+def pushed_rows(board, move):
+    board = board.copy(stack=False)
+    board.push(move)
+    return records_from_rows([encode_board(board)])
+
+
+def test_push_matches_python_chess():
+    # every move of the random playout and endgame positions of the benchmark corpus, RBC castling and passing too
+    for phase in PHASES:
+        store = load(phase)
+        for index, board in enumerate(store.boards()):
+            belief = store.select(slice(index, index + 1))
+            for move in candidate_moves(board):
+                np.testing.assert_array_equal(belief.push(move).records, pushed_rows(board, move),
+                                              err_msg='{} {}'.format(board.fen(), move))
+
+
+def test_push_leaves_out_beliefs_without_the_moving_piece():
+    # each position with, in turn, every piece of ours but the king taken off, as unseen captures would
+    for board in load('middlegame').select(slice(0, 20)).boards():
+        mine = board.occupied_co[board.turn] & ~board.kings
+        beliefs = [board] + [board.transform(lambda bb, square=square: bb & ~chess.BB_SQUARES[square])
+                             for square in chess.scan_forward(mine)]
+        store = BeliefStore.from_boards(beliefs, np.arange(1.0, len(beliefs) + 1))
+        for move in candidate_moves(board):
+            holders = [not move or bool(belief.piece_at(move.from_square)) for belief in beliefs]
+            pushed = store.push(move)
+            np.testing.assert_array_equal(pushed.records, np.concatenate(
+                [pushed_rows(belief, move) for belief, held in zip(beliefs, holders) if held]),
+                err_msg='{} {}'.format(board.fen(), move))
+            np.testing.assert_array_equal(pushed.weights, store.weights[holders])
@@ -0,0 +1,54 @@
+import os
+import signal
+import sys
+import textwrap
+import chess
+import chess.engine
+from engine_pool import EnginePool
+from fallback_evaluator import is_fallback
+
+# a UCI engine that answers every search with the first legal move
+FAKE_ENGINE = textwrap.dedent('''
+    import sys
+    import chess
+    board = chess.Board()
+    for line in sys.stdin:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == 'uci':
+            print('id name fake')
+            print('uciok')
+        elif parts[0] == 'isready':
+            print('readyok')
+        elif parts[0] == 'position':
+            moves = parts.index('moves') if 'moves' in parts else len(parts)
+            board = chess.Board() if parts[1] == 'startpos' else chess.Board(' '.join(parts[2:moves]))
+            for move in parts[moves + 1:]:
+                board.push_uci(move)
+        elif parts[0] == 'go':
+            print('bestmove ' + next(iter(board.legal_moves)).uci())
+        elif parts[0] == 'quit':
+            break
+        sys.stdout.flush()
+''')
+
+
+def test_checkout_restarts_killed_engine(tmp_path):
+    script = tmp_path / 'fake_engine.py'
+    script.write_text(FAKE_ENGINE)
+    pool = EnginePool([sys.executable, str(script)], size=1)
+    try:
+        engine = pool.checkout()
+        assert engine.ping()
+        os.kill(engine.engine.transport.get_pid(), signal.SIGKILL)
+        pool.checkin(engine)
+
+        fresh = pool.checkout()
+        assert fresh is not engine and fresh.alive
+        result = fresh.play(chess.Board(), chess.engine.Limit(time=0.01))
+        assert result.move in chess.Board().legal_moves and not is_fallback(result)
+        pool.checkin(fresh)
+        assert pool.engines == [fresh]
+    finally:
+        pool.close()
@@ -0,0 +1,65 @@
+import random
+from collections import Counter
+import chess
+import numpy as np
+from reconchess.utilities import move_actions
+from belief_store import BeliefStore
+from king_capture import king_capture_counts
+from MultipleMoveGeneration import find_king_capture, first_king_capture
+from benchmarks.corpus import PHASES, load
+
+
+def king_captures(board, color):
+    """Pseudolegal moves of `color` taking the opposing king, promoting to a queen only."""
+    board = board.copy(stack=False)
+    board.turn = color
+    king = board.king(not color)
+    return [move for move in board.pseudo_legal_moves
+            if move.to_square == king and move.promotion in (None, chess.QUEEN)]
+
+
+# pawns taking the king on the back rank, of either color
+PROMOTIONS = ['4k3/3P4/8/8/8/8/8/4K3 w - - 0 1', '4k3/3P1P2/8/8/8/8/8/4K3 w - - 0 1',
+              '4k3/8/8/8/8/8/5p2/4K3 b - - 0 1', '3k4/8/8/8/8/8/1B3p2/4K3 b - - 0 1']
+
+
+def with_turns_flipped(store:BeliefStore):
+    """The beliefs of `store` followed by the same positions with the other side to move."""
+    flipped = store.records.copy()
+    flipped['turn'] ^= 1
+    flipped['ep'] = -1
+    return BeliefStore(np.concatenate([store.records, flipped]))
+
+
+def test_king_capture_counts_match_python_chess():
+    rng = np.random.default_rng(2025)
+    for store in [with_turns_flipped(load(phase)) for phase in PHASES] + [BeliefStore.from_fens(PROMOTIONS)]:
+        store = BeliefStore(store.records, rng.integers(1, 10, size=len(store)).astype(np.float64))
+        boards = list(store.boards())
+        expected = Counter()
+        for board, weight in zip(boards, store.weights):
+            for move in king_captures(board, board.turn):
+                expected[move] += weight
+        assert king_capture_counts(store) == expected
+        for color in chess.COLORS:
+            expected = Counter()
+            for board, weight in zip(boards, store.weights):
+                for move in king_captures(board, color):
+                    expected[move] += weight
+            assert king_capture_counts(store, color) == expected
+
+
+def test_king_capture_counts_keep_only_move_actions():
+    for board in with_turns_flipped(load('endgame')).boards():
+        actions = move_actions(board)
+        counts = king_capture_counts(BeliefStore.from_boards([board]), board.turn, actions)
+        assert counts == Counter(move for move in king_captures(board, board.turn) if move in actions)
+
+
+def test_first_king_capture_matches_the_scan():
+    rng = random.Random(2025)
+    positions = [board for phase in PHASES for board in load(phase).boards()]
+    for _ in range(200):
+        boards = rng.sample(positions, 20)
+        scanned = next(filter(None, map(find_king_capture, boards)), None)
+        assert first_king_capture(boards, BeliefStore.from_boards(boards)) == scanned
@@ -0,0 +1,144 @@
+import random
+import chess
+import numpy as np
+from reconchess import LocalGame, play_local_game
+from belief_store import BeliefStore, canonical_fen
+from belief_expansion import expand_beliefs
+from belief_filters import filter_by_sense
+from engine_pool import ENGINE_ENV_VAR
+from eval_cache import EVAL_CACHE_ENV_VAR
+from particle_filter import ParticleFilter
+from part_four_sub_one import RandomSensing, PONDER_ENV_VAR
+from random_bot import MyAgent
+
+
+def played(*moves):
+    board = chess.Board()
+    for move in moves:
+        board.push_uci(move)
+    return board
+
+
+def store_of(*boards):
+    return BeliefStore.from_boards(boards)
+
+
+def push(uci):
+    return lambda store: store.push(chess.Move.from_uci(uci))
+
+
+def sensed(*squares):
+    """An update expanding by any opponent move, then keeping the children that agree with the pieces of the truth
+    on `squares`, where the truth is 1. e4 e5 2. Nf3 Nc6."""
+    truth = played('e2e4', 'e7e5', 'g1f3', 'b8c6')
+    sense_result = [(square, truth.piece_at(square)) for square in squares]
+    return lambda store: filter_by_sense(expand_beliefs(store), sense_result)
+
+
+def fens(store):
+    # without the clocks: 1. e4 Nc6 2. Nf3 e5 is the same belief as 1. e4 e5 2. Nf3 Nc6
+    return sorted(canonical_fen(board) for board in store.boards())
+
+
+def test_replay_applies_the_updates_in_order():
+    particle_filter = ParticleFilter(max_particles=50)
+    replayed = particle_filter.replay(store_of(played('e2e4')), [expand_beliefs, push('g1f3')])
+    # every black reply, each followed by our knight move
+    expected = [canonical_fen(played('e2e4', move.uci(), 'g1f3')) for move in played('e2e4').pseudo_legal_moves]
+    assert fens(replayed) == sorted(expected + [canonical_fen(played('e2e4', '0000', 'g1f3'))])
+    assert np.isclose(replayed.weights.sum(), 1)
+
+
+def test_replay_resamples_after_each_update():
+    particle_filter = ParticleFilter(max_particles=3, seed=0)
+    replayed = particle_filter.replay(store_of(played('e2e4')), [expand_beliefs, push('g1f3')])
+    assert 1 <= len(replayed) <= 3
+    assert all(board.piece_at(chess.F3) == chess.Piece(chess.KNIGHT, chess.WHITE) for board in replayed.boards())
+
+
+def test_replay_stops_once_the_set_is_empty():
+    particle_filter = ParticleFilter(max_particles=50)
+    calls = []
+    replayed = particle_filter.replay(store_of(played('e2e4')), [
+        lambda store: store.select(np.zeros(len(store), dtype=bool)), lambda store: calls.append(store) or store])
+    assert not replayed and not calls
+
+
+def test_rejuvenate_replays_older_parents_up_to_the_present():
+    particle_filter = ParticleFilter(max_particles=50)
+    # one turn ago, before the opponent's e7e5 and our g1f3
+    particle_filter.remember(store_of(played('e2e4')))
+    particle_filter.observe(sensed(chess.E4))
+    particle_filter.observe(push('g1f3'))
+    # the newest parents, which capping left without the truth
+    particle_filter.remember(store_of(played('e2e4', 'd7d5', 'g1f3')))
+
+    rebuilt = particle_filter.rejuvenate(sensed(chess.E5, chess.C6, chess.F3))
+    # the knight is on f3 only if our move was replayed on the older parents
+    assert fens(rebuilt) == [canonical_fen(played('e2e4', 'e7e5', 'g1f3', 'b8c6'))]
+    assert np.isclose(rebuilt.weights.sum(), 1)
+
+
+def test_rejuvenate_prefers_the_newest_consistent_parents():
+    particle_filter = ParticleFilter(max_particles=50)
+    particle_filter.remember(store_of(played('e2e4')))
+    particle_filter.observe(sensed(chess.E4))
+    particle_filter.observe(push('g1f3'))
+    particle_filter.remember(store_of(played('e2e4', 'e7e5', 'g1f3'), played('e2e4', 'd7d5', 'g1f3')))
+    rebuild = []
+
+    def counted(store):
+        rebuild.append(len(store))
+        return sensed(chess.E5, chess.C6)(store)
+
+    rebuilt = particle_filter.rejuvenate(counted)
+    assert fens(rebuilt) == [canonical_fen(played('e2e4', 'e7e5', 'g1f3', 'b8c6'))]
+    # the older parents were not needed
+    assert rebuild == [2]
+
+
+def test_rejuvenate_falls_back_on_the_newest_parents():
+    particle_filter = ParticleFilter(max_particles=50)
+    particle_filter.remember(store_of(played('e2e4')))
+    newest = store_of(played('e2e4', 'e7e5', 'g1f3'))
+    particle_filter.remember(newest)
+    nothing = lambda store: store.select(np.zeros(len(store), dtype=bool))
+
+    assert not particle_filter.rejuvenate(nothing)
+    rebuilt = particle_filter.rejuvenate(nothing, fallback=lambda store: store.push(None))
+    assert fens(rebuilt) == fens(newest.push(None))
+    assert not ParticleFilter(max_particles=50).rejuvenate(nothing, fallback=lambda store: store)
+
+
+def play_capped_game(seed, max_beliefs=10, turn_limit=40):
+    """
+    Plays a fixed-seed game of a capped RandomSensing against the random bot,
+    checking after each of its moves that every belief has our pieces where
+    they are.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = RandomSensing(max_beliefs=max_beliefs)
+    agent.particle_filter.rng = np.random.default_rng(seed)
+    game = LocalGame(full_turn_limit=turn_limit)
+    handle_move_result = agent.handle_move_result
+
+    def checked_handle_move_result(*args, **kwargs):
+        handle_move_result(*args, **kwargs)
+        mine = np.uint64(game.board.occupied_co[agent.color])
+        assert len(agent.beliefs) and (agent.beliefs.occupied_co(agent.color) == mine).all()
+
+    agent.handle_move_result = checked_handle_move_result
+    if seed % 2:
+        play_local_game(MyAgent(), agent, game=game)
+    else:
+        play_local_game(agent, MyAgent(), game=game)
+
+
+def test_capped_game_keeps_our_pieces(monkeypatch):
+    monkeypatch.setenv(ENGINE_ENV_VAR, 'builtin')
+    monkeypatch.setenv(EVAL_CACHE_ENV_VAR, '')
+    # pondering runs on a thread, without it the games are the same every run
+    monkeypatch.setenv(PONDER_ENV_VAR, '0')
+    for seed in (0, 1):
+        play_capped_game(seed)
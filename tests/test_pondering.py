@@ -0,0 +1,43 @@
+import chess
+import numpy as np
+from reconchess.utilities import move_actions
+from belief_store import BeliefStore
+from eval_cache import analysis_key
+from fallback_evaluator import FallbackEvaluator
+from move_scoring import choose_by_score
+from pondering import PonderTask
+from time_manager import TimeManager
+
+
+class RecordingEvaluator(FallbackEvaluator):
+    """The built-in evaluator, keeping the boards it analyses and the cache key of every analysis."""
+
+    size = 2
+
+    def __init__(self):
+        super().__init__()
+        self.boards = []
+        self.keys = []
+
+    def analyse_many(self, boards, limit=None, multipv=1, root_moves=None, deadline=None):
+        self.boards.extend(boards)
+        self.keys.extend(analysis_key(board, limit, multipv, moves) for board, moves in zip(boards, root_moves))
+        return super().analyse_many(boards, limit, multipv, root_moves, deadline)
+
+
+def test_warm_up_analyses_have_the_keys_of_choose_move():
+    np.random.seed(2025)
+    board = chess.Board()
+    board.push_uci('e2e4')
+    search = TimeManager().next_budget(900, 500, RecordingEvaluator.size)
+    warming = RecordingEvaluator()
+    task = PonderTask(BeliefStore.from_boards([board]), chess.WHITE, warming, search)
+    task.run()
+    assert task.ready.is_set() and len(warming.keys) == search.samples
+
+    # choose_move sampling the same beliefs, with the move actions the game gives it after 1... e5
+    truth = board.copy()
+    truth.push_uci('e7e5')
+    moving = RecordingEvaluator()
+    choose_by_score(moving, warming.boards, search.search, move_actions(truth))
+    assert sorted(moving.keys) == sorted(warming.keys)
@@ -0,0 +1,35 @@
+import chess
+import pytest
+import rbc_cli
+
+START = chess.STARTING_FEN
+AFTER_E4 = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_reads_every_multi_line_record(tmp_path, capsys, workers):
+    path = tmp_path / 'moves.txt'
+    path.write_text('\n'.join([START, 'e2e4', '', START, 'e2e5', AFTER_E4, 'e7e5', '', START]) + '\n')
+    rbc_cli.main(['execute', '--batch', '--input', str(path), '--workers', str(workers), '--chunk-size', '2'])
+    after_e5 = chess.Board(AFTER_E4)
+    after_e5.push_uci('e7e5')
+    assert capsys.readouterr().out.split('\n') == [
+        AFTER_E4, '',
+        'Illegal move', '',
+        after_e5.fen(), '',
+        'error: truncated execute record at end of input', '',
+        '',
+    ]
+
+
+def test_batch_reports_each_unreadable_record(tmp_path, capsys):
+    path = tmp_path / 'windows.txt'
+    path.write_text('\n'.join(['2', START, AFTER_E4, 'e4:?', 'two', '1', START, 'e2:P', '1', START]) + '\n')
+    rbc_cli.main(['filter-window', '--batch', '--input', str(path), '--workers', '1'])
+    assert capsys.readouterr().out.split('\n') == [
+        START, '',
+        "error: bad filter-window record: invalid literal for int() with base 10: 'two\\n'", '',
+        START, '',
+        'error: truncated filter-window record at end of input', '',
+        '',
+    ]
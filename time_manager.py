@@ -0,0 +1,90 @@
+import math
+import chess.engine
+
+# seconds kept in hand for the turns the budget did not foresee
+RESERVE_SECONDS = 10.0
+# expected number of our turns in a game, and the fewest assumed to be left at any point
+EXPECTED_TURNS = 45
+MIN_TURNS_LEFT = 12
+# most wall time spent on one turn however much clock is left
+MAX_TURN_SECONDS = 5.0
+# share of a turn given to choosing the sense, and the measured cost of scoring one belief
+SENSE_SHARE = 0.2
+SENSE_SECONDS_PER_BELIEF = 3e-6
+# lengths an engine search is rounded down to, so that the evaluation cache sees few distinct limits
+SEARCH_STEPS = (0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+MIN_SEARCH_SECONDS = SEARCH_STEPS[0]
+# most beliefs searched and voted on in one turn
+MAX_SAMPLES = 8
+
+
+class TurnBudget:
+    """
+    How one turn is spent: `seconds` in all, scoring at most `sense_beliefs`
+    beliefs to choose the sense (0 to sense at random), and `samples` engine
+    searches of `search` each that must finish within `deadline` seconds
+    (0 samples to move without the engine).
+    """
+
+    def __init__(self, seconds, sense_beliefs, samples, search, deadline):
+        self.seconds = seconds
+        self.sense_beliefs = sense_beliefs
+        self.samples = samples
+        self.search = search
+        self.deadline = deadline
+
+    def __repr__(self):
+        return 'TurnBudget(seconds={:.3f}, sense_beliefs={}, samples={}, search={}, deadline={:.3f})'.format(
+            self.seconds, self.sense_beliefs, self.samples, self.search, self.deadline)
+
+
+class TimeManager:
+    """
+    Budgets every turn from the clock: what is left after the reserve is
+    shared over the turns still expected, then split between sense scoring
+    and engine searches according to the size of the belief set. As the
+    clock runs down the budget shrinks to fewer, shorter searches, sense
+    scoring on a sample, and finally random senses and no engine at all.
+    """
+
+    def __init__(self, reserve=RESERVE_SECONDS, expected_turns=EXPECTED_TURNS, min_turns_left=MIN_TURNS_LEFT,
+                 max_turn=MAX_TURN_SECONDS, max_samples=MAX_SAMPLES):
+        self.reserve = reserve
+        self.expected_turns = expected_turns
+        self.min_turns_left = min_turns_left
+        self.max_turn = max_turn
+        self.max_samples = max_samples
+        self.turn = 0
+
+    def start_turn(self, seconds_left, beliefs=1, engines=1) -> TurnBudget:
+        """Counts a new turn, called once per turn from choose_sense, and budgets it."""
+        self.turn += 1
+        return self.budget(seconds_left, beliefs, engines)
+
+    def turn_seconds(self, seconds_left, turn=None):
+        """Wall time this turn, or turn number `turn`, may use."""
+        turns_left = max(self.min_turns_left, self.expected_turns - (self.turn if turn is None else turn))
+        return min(self.max_turn, max(0.0, seconds_left - self.reserve) / turns_left)
+
+    def next_budget(self, seconds_left, beliefs=1, engines=1) -> TurnBudget:
+        """Budget the next turn will get if its clock still shows `seconds_left`, without counting the turn."""
+        return self.budget(seconds_left, beliefs, engines, self.turn + 1)
+
+    def budget(self, seconds_left, beliefs=1, engines=1, turn=None) -> TurnBudget:
+        """Budget for the rest of this turn, with `beliefs` beliefs and `engines` engines searching at once."""
+        seconds = self.turn_seconds(seconds_left, turn)
+        beliefs = max(1, beliefs)
+
+        # score the whole set if that fits in the sense share, a sample of it otherwise
+        sense = min(seconds * SENSE_SHARE, beliefs * SENSE_SECONDS_PER_BELIEF)
+        sense_beliefs = min(beliefs, int(seconds * SENSE_SHARE / SENSE_SECONDS_PER_BELIEF))
+
+        # more beliefs deserve more samples, as long as each search keeps a useful length
+        search_seconds = seconds - sense
+        samples = min(beliefs, self.max_samples, 1 + int(math.log2(beliefs)))
+        samples = min(samples, engines * int(search_seconds / MIN_SEARCH_SECONDS))
+        search = 0.0
+        if samples > 0:
+            rounds = math.ceil(samples / engines)
+            search = max((step for step in SEARCH_STEPS if step <= search_seconds / rounds), default=MIN_SEARCH_SECONDS)
+        return TurnBudget(seconds, sense_beliefs, samples, chess.engine.Limit(time=search), search_seconds)
@@ -0,0 +1,263 @@
+"""
+Round-robin tournament between Player classes, played across a pool of
+worker processes. Each worker keeps its own engines (one supervised
+Stockfish or AsyncEvaluator set per process, see engine_pool and
+async_evaluator) for all the games it plays.
+
+Each pair of agents plays --games games, alternating colors. Every
+finished game is appended to --results as one JSON line with the winner,
+the win reason, the number of turns, the clock each side used and the
+time spent in each Player callback. A rerun with the same results file
+skips the games already in it, so an interrupted overnight run picks up
+where it stopped. The standings, head-to-head scores, win reasons,
+callback times and games per hour are printed and written to --table.
+
+    python tournament.py RandomSensing ImprovedAgent TroutBot MyAgent --games 20 --workers 8
+        --results tournament.jsonl --table tournament.md
+
+Agents are named as in AGENTS, or as module:Class for any other Player.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import time
+import traceback
+from collections import Counter, defaultdict
+import numpy as np
+from reconchess import LocalGame, play_local_game
+from async_evaluator import EVAL_ENGINES_ENV_VAR
+from engine_pool import ENGINE_POOL_SIZE_ENV_VAR
+
+AGENTS = {
+    'TroutBot': 'trout_bot:TroutBot',
+    'Agent.TroutBot': 'Agent:TroutBot',
+    'ImprovedAgent.TroutBot': 'ImprovedAgent:TroutBot',
+    'RandomSensing': 'part_four_sub_one:RandomSensing',
+    'ImprovedAgent': 'part_four_sub_two:ImprovedAgent',
+    'MyAgent': 'random_bot:MyAgent',
+}
+
+SECONDS_PER_PLAYER = 900
+# seconds added to a player's clock after each of its turns, LocalGame's default
+SECONDS_INCREMENT = 5
+CALLBACKS = ('handle_game_start', 'handle_opponent_move_result', 'choose_sense', 'handle_sense_result',
+             'choose_move', 'handle_move_result', 'handle_game_end')
+COLOR_NAMES = ('black', 'white')
+
+
+def load_agent(name):
+    """The Player class for an AGENTS name or a module:Class spec."""
+    module, _, cls = AGENTS.get(name, name).partition(':')
+    if not cls:
+        raise ValueError('unknown agent {!r}, expected one of {} or module:Class'.format(name, ', '.join(AGENTS)))
+    return getattr(importlib.import_module(module), cls)
+
+
+def schedule(agents, games, seconds_per_player=SECONDS_PER_PLAYER, turn_limit=None, seed=0,
+             seconds_increment=SECONDS_INCREMENT):
+    """Every game of the round robin, colors alternating within each pairing."""
+    tasks = []
+    for i, first in enumerate(agents):
+        for second in agents[i + 1:]:
+            for game in range(games):
+                white, black = (first, second) if game % 2 == 0 else (second, first)
+                tasks.append({'id': '{}|{}|{}'.format(first, second, game), 'white': white, 'black': black,
+                              'seed': seed + len(tasks), 'seconds_per_player': seconds_per_player,
+                              'seconds_increment': seconds_increment, 'turn_limit': turn_limit})
+    return tasks
+
+
+class CallbackTimer:
+    """Wraps the callbacks of a player and totals the seconds spent in, and the calls to, each of them."""
+
+    def __init__(self, player):
+        self.seconds = Counter()
+        self.calls = Counter()
+        for name in CALLBACKS:
+            setattr(player, name, self._timed(name, getattr(player, name)))
+
+    def _timed(self, name, callback):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+        return timed
+
+    def summary(self):
+        return {name: {'seconds': self.seconds[name], 'calls': self.calls[name]} for name in CALLBACKS}
+
+
+def _init_worker():
+    # one engine per worker by default, the pool already spreads games over the cores
+    os.environ.setdefault(EVAL_ENGINES_ENV_VAR, '1')
+    os.environ.setdefault(ENGINE_POOL_SIZE_ENV_VAR, '1')
+
+
+def play_game(task):
+    """Worker side: plays one scheduled game and returns its result record. A game that raises is recorded as an error."""
+    random.seed(task['seed'])
+    np.random.seed(task['seed'] % 2 ** 32)
+    result = dict(task, pid=os.getpid())
+    start = time.perf_counter()
+    try:
+        white, black = load_agent(task['white'])(), load_agent(task['black'])()
+        timers = {'white': CallbackTimer(white), 'black': CallbackTimer(black)}
+        game = LocalGame(seconds_per_player=task['seconds_per_player'], seconds_increment=task['seconds_increment'],
+                         full_turn_limit=task['turn_limit'])
+        winner, win_reason, history = play_local_game(white, black, game=game)
+        result.update(
+            winner=None if winner is None else COLOR_NAMES[winner],
+            win_reason=None if win_reason is None else win_reason.name,
+            turns=history.num_turns(),
+            # every turn a player took ended with the increment added to its clock
+            clock_used={COLOR_NAMES[color]: task['seconds_per_player'] + task['seconds_increment'] *
+                        history.num_turns(color) - game.seconds_left_by_color[color] for color in (True, False)},
+            callbacks={color: timer.summary() for color, timer in timers.items()},
+        )
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def read_results(path):
+    """Result records already in a results file, by game id. Errored games are left out so that they are replayed."""
+    results = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if 'error' not in record:
+                        results[record['id']] = record
+    return results
+
+
+def run(tasks, workers=None, results_path=None, log=print):
+    """Plays the tasks not yet in the results file. Returns (every result record, games played now, wall seconds)."""
+    results = read_results(results_path)
+    pending = [task for task in tasks if task['id'] not in results]
+    if results:
+        log('{} of {} games already played'.format(len(tasks) - len(pending), len(tasks)))
+    workers = min(workers or os.cpu_count() or 1, max(len(pending), 1))
+
+    out = open(results_path, 'a') if results_path else None
+    start = time.perf_counter()
+    played = []
+    try:
+        with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+            # one game per task so that long games do not hold back a batch
+            for record in pool.imap_unordered(play_game, pending, chunksize=1):
+                played.append(record)
+                if out is not None:
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                if 'error' in record:
+                    outcome = 'error: ' + record['error'].strip().splitlines()[-1]
+                elif record['winner'] is None:
+                    outcome = 'draw by {} in {} turns'.format(record['win_reason'], record['turns'])
+                else:
+                    outcome = '{} wins by {} in {} turns'.format(
+                        record[record['winner']], record['win_reason'], record['turns'])
+                log('[{}/{}] {} vs {}: {} ({:.0f}s)'.format(
+                    len(played), len(pending), record['white'], record['black'], outcome, record['seconds']))
+    finally:
+        if out is not None:
+            out.close()
+    wall = time.perf_counter() - start
+
+    for record in played:
+        if 'error' not in record:
+            results[record['id']] = record
+    return [results[task['id']] for task in tasks if task['id'] in results], played, wall
+
+
+def summarize(agents, results, played, wall, workers):
+    """Markdown tables of the standings, head-to-head scores, win reasons, callback times and throughput."""
+    wins, losses, draws = Counter(), Counter(), Counter()
+    score = defaultdict(float)
+    reasons = defaultdict(Counter)
+    seconds, calls = defaultdict(Counter), defaultdict(Counter)
+    for record in results:
+        for color in COLOR_NAMES:
+            agent, opponent = record[color], record['black' if color == 'white' else 'white']
+            if record['winner'] is None:
+                draws[agent] += 1
+                score[agent, opponent] += 0.5
+            elif record['winner'] == color:
+                wins[agent] += 1
+                score[agent, opponent] += 1
+                reasons[agent][record['win_reason']] += 1
+            else:
+                losses[agent] += 1
+            for name, timing in record['callbacks'][color].items():
+                seconds[agent][name] += timing['seconds']
+                calls[agent][name] += timing['calls']
+
+    lines = ['| Agent | Games | Wins | Losses | Draws | Score |', '|---|---|---|---|---|---|']
+    for agent in sorted(agents, key=lambda agent: -(wins[agent] + 0.5 * draws[agent])):
+        games = wins[agent] + losses[agent] + draws[agent]
+        lines.append('| {} | {} | {} | {} | {} | {:.1%} |'.format(
+            agent, games, wins[agent], losses[agent], draws[agent],
+            (wins[agent] + 0.5 * draws[agent]) / games if games else 0))
+
+    lines += ['', '| Score vs | ' + ' | '.join(agents) + ' |', '|---|' + '---|' * len(agents)]
+    for agent in agents:
+        lines.append('| {} | '.format(agent) + ' | '.join(
+            '-' if agent == opponent else '{:g}'.format(score[agent, opponent]) for opponent in agents) + ' |')
+
+    lines += ['', '| Agent | Wins by reason |', '|---|---|']
+    for agent in agents:
+        lines.append('| {} | {} |'.format(agent, ', '.join(
+            '{} {}'.format(reason, count) for reason, count in reasons[agent].most_common()) or '-'))
+
+    lines += ['', '| Mean ms per call | ' + ' | '.join(CALLBACKS) + ' |', '|---|' + '---|' * len(CALLBACKS)]
+    for agent in agents:
+        lines.append('| {} | '.format(agent) + ' | '.join(
+            '{:.1f}'.format(1000 * seconds[agent][name] / calls[agent][name]) if calls[agent][name] else '-'
+            for name in CALLBACKS) + ' |')
+
+    errors = sum('error' in record for record in played)
+    lines += ['', '{} games played in {:.0f}s on {} workers: {:.0f} games/hour, {:.0f}s per game, {} errors'.format(
+        len(played), wall, workers, len(played) / wall * 3600 if wall else 0,
+        sum(record['seconds'] for record in played) / len(played) if played else 0, errors)]
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Round-robin tournament between RBC agents.')
+    parser.add_argument('agents', nargs='+', help='agent names ({}) or module:Class'.format(', '.join(AGENTS)))
+    parser.add_argument('--games', type=int, default=2, help='games per pairing, colors alternating')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--seconds', type=float, default=SECONDS_PER_PLAYER, help='clock of each player')
+    parser.add_argument('--increment', type=float, default=SECONDS_INCREMENT,
+                        help='seconds added to a clock after each turn')
+    parser.add_argument('--turn-limit', type=int, default=None, help='full turns before a game is drawn')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--results', help='JSON-lines file of game results, appended to and resumed from')
+    parser.add_argument('--table', help='write the summary tables to this Markdown file')
+    args = parser.parse_args(argv)
+
+    if len(args.agents) < 2:
+        parser.error('a tournament needs at least two agents')
+    for agent in args.agents:
+        load_agent(agent)
+
+    tasks = schedule(args.agents, args.games, args.seconds, args.turn_limit, args.seed, args.increment)
+    workers = args.workers or os.cpu_count() or 1
+    results, played, wall = run(tasks, workers, args.results)
+    table = summarize(args.agents, results, played, wall, min(workers, max(len(played), 1)))
+    print(table)
+    if args.table:
+        with open(args.table, 'w') as f:
+            f.write(table)
+
+
+if __name__ == '__main__':
+    main()